@@ -0,0 +1,32 @@
+from lxml import etree
+
+
+class AnalysisContext:
+    """ Parses a document's XML once, so that a number of analysis steps (such as linking references, finding terms
+    and marking up italics) can be run against the same XML tree. The changed XML is written back to the document
+    once, at the end.
+
+    Use it as a context manager, which writes the XML back to the document if the block completes without error:
+
+        with AnalysisContext(document) as context:
+            markup_refs(context)
+            markup_italics(context)
+    """
+
+    def __init__(self, document):
+        self.document = document
+        # we need to use etree, not objectify, so we can't use document.doc.root, we have to re-parse it
+        self.root = etree.fromstring(document.content.encode('utf-8'))
+        self.frbr_uri = document.doc.frbr_uri
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.save()
+
+    def save(self):
+        """ Write the XML back to the document.
+        """
+        self.document.content = etree.tostring(self.root, encoding='unicode')
@@ -1,10 +1,20 @@
 from lxml import etree
 import re
 
+from indigo.analysis.context import AnalysisContext
 from indigo.analysis.markup import TextPatternMarker
 from indigo.plugins import LocaleBasedMatcher, plugins
 
 
+def markup_italics(context):
+    """ Mark up the italics terms for the document's country in the XML of an AnalysisContext.
+    """
+    italics_terms_finder = plugins.for_document('italics-terms', context.document)
+    italics_terms = context.document.work.country.italics_terms
+    if italics_terms_finder and italics_terms:
+        italics_terms_finder.mark_up_italics_in_context(context, italics_terms)
+
+
 @plugins.register('italics-terms')
 class BaseItalicsFinder(LocaleBasedMatcher, TextPatternMarker):
     """ Italicises terms in a document.
@@ -14,14 +24,16 @@ class BaseItalicsFinder(LocaleBasedMatcher, TextPatternMarker):
     def mark_up_italics_in_document(self, document, italics_terms):
         """ Find and italicise terms in +document+, which is an Indigo Document object.
         """
-        # we need to use etree, not objectify, so we can't use document.doc.root,
-        # we have to re-parse it
-        root = etree.fromstring(document.content.encode('utf-8'))
+        with AnalysisContext(document) as context:
+            self.mark_up_italics_in_context(context, italics_terms)
+
+    def mark_up_italics_in_context(self, context, italics_terms):
+        """ Find and italicise terms in the XML of an AnalysisContext.
+        """
         self.setup_candidate_xpath(italics_terms)
         self.setup_pattern_re(italics_terms)
-        self.setup(root)
-        self.markup_patterns(root)
-        document.content = etree.tostring(root, encoding='unicode')
+        self.setup(context.root)
+        self.markup_patterns(context.root)
 
     def setup_candidate_xpath(self, terms):
         xpath_contains = ' or '.join([f'contains(., "{term}")' for term in [partial for t in terms for partial in t.split('"')]])
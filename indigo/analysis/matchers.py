@@ -1,5 +1,4 @@
-from lxml import etree
-
+from indigo.analysis.context import AnalysisContext
 from indigo.plugins import LocaleBasedMatcher
 
 
@@ -10,7 +9,10 @@ class DocumentPatternMatcherMixin(LocaleBasedMatcher):
     def markup_document_matches(self, document):
         """ Markup matches in an Indigo document object and update the XML in place.
         """
-        # we need to use etree, not objectify, so we can't use document.doc.root, we have to re-parse it
-        root = etree.fromstring(document.content.encode('utf-8'))
-        self.markup_xml_matches(document.doc.frbr_uri, root)
-        document.content = etree.tostring(root, encoding='unicode')
+        with AnalysisContext(document) as context:
+            self.markup_context_matches(context)
+
+    def markup_context_matches(self, context):
+        """ Markup matches in the XML of an AnalysisContext.
+        """
+        self.markup_xml_matches(context.frbr_uri, context.root)
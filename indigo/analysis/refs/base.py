@@ -5,6 +5,7 @@ from django.conf import settings
 
 from docpipe.citations import ActNoOfYearMatcher, ActYearNumberMatcher
 from docpipe.matchers import CitationMatcher, ExtractedMatch
+from indigo.analysis.context import AnalysisContext
 from indigo.analysis.markup import TextPatternMarker
 from indigo.analysis.matchers import DocumentPatternMatcherMixin
 from indigo.plugins import LocaleBasedMatcher, plugins
@@ -12,16 +13,23 @@ from indigo_api.models import Subtype, Work, Country
 
 
 def markup_document_refs(document):
+    with AnalysisContext(document) as context:
+        markup_refs(context)
+
+
+def markup_refs(context):
+    """ Run all the reference-linking plugins against the XML of an AnalysisContext.
+    """
     # TODO: this is old and should be retired
-    finder = plugins.for_document('refs', document)
+    finder = plugins.for_document('refs', context.document)
     if finder:
-        finder.find_references_in_document(document)
+        finder.find_references_in_context(context)
 
     # new mechanism for calling locale-based matchers based on DocumentPatternMatcher
     for plugin_type in settings.INDIGO['LINK_REFERENCES_PLUGINS']:
-        matcher = plugins.for_document(plugin_type, document)
+        matcher = plugins.for_document(plugin_type, context.document)
         if matcher:
-            matcher.markup_document_matches(document)
+            matcher.markup_context_matches(context)
 
 
 class BaseRefsFinder(LocaleBasedMatcher, TextPatternMarker):
@@ -32,14 +40,16 @@ class BaseRefsFinder(LocaleBasedMatcher, TextPatternMarker):
     def find_references_in_document(self, document):
         """ Find references in +document+, which is an Indigo Document object.
         """
-        # we need to use etree, not objectify, so we can't use document.doc.root,
-        # we have to re-parse it
-        root = etree.fromstring(document.content.encode('utf-8'))
-        self.document = document
-        self.frbr_uri = document.doc.frbr_uri
-        self.setup(root)
-        self.markup_patterns(root)
-        document.content = etree.tostring(root, encoding='unicode')
+        with AnalysisContext(document) as context:
+            self.find_references_in_context(context)
+
+    def find_references_in_context(self, context):
+        """ Find references in the XML of an AnalysisContext.
+        """
+        self.document = context.document
+        self.frbr_uri = context.frbr_uri
+        self.setup(context.root)
+        self.markup_patterns(context.root)
 
     def is_valid(self, node, match):
         if self.make_href(match) != self.frbr_uri.work_uri():
@@ -1,4 +1,6 @@
 import re
+import threading
+from collections import OrderedDict
 
 from django.db.models import Q
 
@@ -10,6 +12,51 @@ from indigo_api.models import Country, Work, WorkAlias
 from indigo_api.models.citations import CitationAlias
 
 
+class CitationMatcherCache:
+    """ Process-local cache of the (compiled) data that citation matchers load from the database, such as work titles
+    and aliases for a place. All entries are discarded when the citations cache version changes, which happens when
+    a work, work alias or citation alias is changed (see CitationAlias.invalidate_citations_cache).
+    """
+
+    def __init__(self, size=128):
+        self.size = size
+        self.version = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, build):
+        """ Get the cached value for key, calling build() to create it if necessary.
+        """
+        version = CitationAlias.cache_version()
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = build()
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = value
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return value
+
+    @staticmethod
+    def key(matcher, frbr_uri):
+        """ Cache key for a matcher and the document it's running against. Matchers only load works published
+        on or before the year of the document's expression date, so that is part of the key.
+        """
+        date = frbr_uri.expression_date
+        year = date[1:5] if date and date.startswith('@') else None
+        return matcher.__class__, frbr_uri.place, year
+
+
+citation_matcher_cache = CitationMatcherCache()
+
+
 class CommonTitlesCitationMatcher(DocumentPatternMatcherMixin, CitationMatcher):
     """Finds references to works based "the XXX Act" patterns. """
     # only supports English
@@ -61,6 +108,11 @@ class CommonTitlesCitationMatcher(DocumentPatternMatcherMixin, CitationMatcher):
 @plugins.register('refs-act-names')
 class WorkTitlesCitationMatcher(CommonTitlesCitationMatcher):
     def setup_titles(self, frbr_uri):
+        self.titles = citation_matcher_cache.get(
+            citation_matcher_cache.key(self, frbr_uri),
+            lambda: self.load_titles(frbr_uri))
+
+    def load_titles(self, frbr_uri):
         self.titles = {}
 
         country = Country.objects.filter(country__pk=frbr_uri.country.upper()).first()
@@ -79,6 +131,8 @@ class WorkTitlesCitationMatcher(CommonTitlesCitationMatcher):
             for w in qs:
                 self.titles[w["title"]] = w["frbr_uri"]
 
+        return self.titles
+
     def get_queryset(self, frbr_uri, country, locality):
         # load titles for Works in this country and/or locality
         qs = (
@@ -117,16 +171,21 @@ class AliasCitationMatcher(DocumentPatternMatcherMixin, CitationMatcher):
 
         # setup patterns based on the aliases
         if self.aliases:
-            # sort longest first
-            titles = sorted(self.aliases.keys(), key=lambda x: -len(x))
-            self.pattern_re = re.compile(r"\b(" + "|".join(titles) + r")\b")
-
+            self.pattern_re, patterns = self.compile_aliases()
             if self.candidate_xpath:
-                patterns = ' or '.join([f"contains(., '{title}')" for title in titles])
                 self.candidate_xpath = self.candidate_xpath.replace('ALIASES', patterns)
 
         super().setup(frbr_uri, text, root)
 
+    def compile_aliases(self):
+        """ Build the regex and the xpath condition for matching the aliases. Returns a (pattern_re, xpath) tuple.
+        """
+        # sort longest first
+        titles = sorted(self.aliases.keys(), key=lambda x: -len(x))
+        pattern_re = re.compile(r"\b(" + "|".join(titles) + r")\b")
+        patterns = ' or '.join([f"contains(., '{title}')" for title in titles])
+        return pattern_re, patterns
+
     def setup_aliases(self, frbr_uri):
         self.aliases = self.aliases.get(frbr_uri.place) or self.aliases.get(frbr_uri.country) or {}
 
@@ -149,10 +208,21 @@ class DBAliasMatcher(AliasCitationMatcher):
     * indigo Work aliases
     * explicit citator alias (CitationAlias)
     """
+    compiled_aliases = None
+
     def setup_aliases(self, frbr_uri):
+        self.aliases, self.compiled_aliases = citation_matcher_cache.get(
+            citation_matcher_cache.key(self, frbr_uri),
+            lambda: self.load_aliases(frbr_uri))
+
+    def load_aliases(self, frbr_uri):
         self.aliases = {}
         self.setup_work_aliases(frbr_uri)
         self.setup_citation_aliases(frbr_uri)
+        return self.aliases, super().compile_aliases() if self.aliases else None
+
+    def compile_aliases(self):
+        return self.compiled_aliases
 
     def setup_work_aliases(self, frbr_uri):
         country = Country.objects.filter(country__pk=frbr_uri.country.upper()).first()
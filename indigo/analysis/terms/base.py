@@ -6,12 +6,85 @@ from itertools import chain
 from lxml import etree
 
 from cobalt.schemas import AkomaNtoso30
+from indigo.analysis.context import AnalysisContext
 from indigo.plugins import LocaleBasedMatcher
 from indigo_api.data_migrations import DefinitionsIntoBlockContainers
 
 log = logging.getLogger(__name__)
 
 
+def is_word_char(c):
+    # the same as the \w regex class for unicode strings
+    return c.isalnum() or c == '_'
+
+
+class TermMatch:
+    """ A match of a term in a string, with a similar interface to re.Match.
+    """
+    def __init__(self, string, start, end):
+        self.string = string
+        self._start = start
+        self._end = end
+
+    def group(self, n=0):
+        # the term is both the full match and group 1
+        return self.string[self._start:self._end]
+
+    def start(self, n=0):
+        return self._start
+
+    def end(self, n=0):
+        return self._end
+
+
+class TermsMatcher:
+    r""" Finds non-overlapping matches of a set of terms in text, preferring the longest term at each position and
+    only matching on word boundaries. This is equivalent to finditer() with a regex of the form \b(term1|term2|...)\b
+    with the terms sorted longest first, but it uses a trie of the terms so that the cost of matching doesn't grow
+    with the number of terms.
+    """
+    # marks the end of a term in the trie
+    END = ''
+
+    def __init__(self, terms):
+        self.trie = {}
+        for term in terms:
+            if term:
+                node = self.trie
+                for c in term:
+                    node = node.setdefault(c, {})
+                node[self.END] = True
+
+    def finditer(self, text):
+        n = len(text)
+        i = 0
+        while i < n:
+            end = self.match_at(text, i) if text[i] in self.trie and self.is_boundary(text, i) else None
+            if end:
+                yield TermMatch(text, i, end)
+                i = end
+            else:
+                i += 1
+
+    def match_at(self, text, start):
+        """ Return the end of the longest term that starts at start and ends on a word boundary, or None.
+        """
+        longest = None
+        node = self.trie
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if self.END in node and self.is_boundary(text, i + 1):
+                longest = i + 1
+        return longest
+
+    def is_boundary(self, text, i):
+        before = i > 0 and is_word_char(text[i - 1])
+        after = i < len(text) and is_word_char(text[i])
+        return before != after
+
+
 class BaseTermsFinder(LocaleBasedMatcher):
     """ Finds references to defined terms in documents.
 
@@ -38,14 +111,16 @@ class BaseTermsFinder(LocaleBasedMatcher):
     def find_terms_in_document(self, document):
         """ Find defined terms in +document+, which is an Indigo Document object.
         """
-        # we need to use etree, not objectify, so we can't use document.doc.root,
-        # we have to re-parse it
-        root = etree.fromstring(document.content.encode('utf-8'))
-        self.find_terms(root)
-        document.content = etree.tostring(root, encoding='unicode')
+        with AnalysisContext(document) as context:
+            self.find_terms_in_context(context)
+
+    def find_terms_in_context(self, context):
+        """ Find defined terms in the XML of an AnalysisContext.
+        """
+        self.find_terms(context.root)
         # migrate definitions into blockContainers as the final step
         migration = DefinitionsIntoBlockContainers()
-        migration.migrate_document(document)
+        migration.migrate_root(context.root)
 
     def find_terms(self, doc):
         self.setup(doc)
@@ -224,9 +299,14 @@ class BaseTermsFinder(LocaleBasedMatcher):
         # term to term id
         term_lookup = self.make_term_index(terms)
 
-        # big regex of all the terms, longest first
-        terms = sorted(term_lookup.keys(), key=lambda t: -len(t))
-        terms_re = re.compile(r'\b(%s)\b' % '|'.join(re.escape(t) for t in terms))
+        # matches all the terms, longest first
+        terms_matcher = TermsMatcher(term_lookup.keys())
+
+        # elements which are, or are inside, elements which must not be checked for references to terms
+        no_markup = set()
+        for elem in doc.iter(*self.no_term_markup):
+            no_markup.add(elem)
+            no_markup.update(elem.iterdescendants())
 
         def make_term(match):
             term_id = term_lookup[match.group(1)]
@@ -250,12 +330,12 @@ class BaseTermsFinder(LocaleBasedMatcher):
             node = candidate.getparent()
 
             # skip if we're already inside a def or term element
-            if node.tag in self.no_term_markup or len(list(node.iterancestors(self.no_term_markup))) > 0:
+            if node in no_markup:
                 continue
 
             if not candidate.is_tail:
                 # text directly inside a node
-                for match in terms_re.finditer(node.text):
+                for match in terms_matcher.finditer(node.text):
                     log.debug("Matched " + match.group(1))
                     if in_own_defn(node, match):
                         log.debug("In own definition")
@@ -271,7 +351,7 @@ class BaseTermsFinder(LocaleBasedMatcher):
                     break
 
             while node is not None and node.tail:
-                for match in terms_re.finditer(node.tail):
+                for match in terms_matcher.finditer(node.tail):
                     log.debug("Matched " + match.group(1))
                     if in_own_defn(node, match):
                         log.debug("In own definition")
@@ -518,6 +518,16 @@ class TOCElement(object):
             'heading': self.heading,
         }
 
+    @classmethod
+    def from_dict(cls, data):
+        """ Build an element (without its XML element) from a dict created by `as_dict`.
+        """
+        item = cls(None, data['component'], data['type'], heading=data.get('heading'), id_=data.get('id'),
+                   num=data.get('num'), children=[cls.from_dict(c) for c in data.get('children') or []],
+                   basic_unit=data.get('basic_unit', False))
+        item.title = data.get('title')
+        return item
+
 
 class BeautifulElement:
     def __init__(self, toc_element):
@@ -1,4 +1,5 @@
 from indigo.plugins import plugins
+from indigo.xmlutils import eid_index
 
 
 class ResolvedAnchor(object):
@@ -28,15 +29,14 @@ class ResolvedAnchor(object):
         self.exact_match = True
 
         while anchor_id:
-            escaped = anchor_id.replace("'", "\\'")
-            elems = component.xpath(f".//a:*[@eId='{escaped}']", namespaces={'a': self.document.doc.namespace})
-            if len(elems):
-                self.resolve_element(elems[0])
+            elem = eid_index(self.document.doc).get(anchor_id, component)
+            if elem is not None:
+                self.resolve_element(elem)
                 break
             elif anchor_id in ['preface', 'preamble']:
                 # HACK HACK HACK
                 # We sometimes use 'preamble' and 'preface' even though they aren't IDs
-                elems = component.xpath(f".//a:{escaped}", namespaces={'a': self.document.doc.namespace})
+                elems = component.xpath(f".//a:{anchor_id}", namespaces={'a': self.document.doc.namespace})
                 if len(elems):
                     self.resolve_element(elems[0])
                     break
@@ -11,7 +11,7 @@ from bluebell.parser import AkomaNtosoParser
 from docpipe.html import ParseHtml
 from docpipe.pipeline import Stage
 from docpipe.xmlutils import unwrap_element
-from indigo.xmlutils import parse_html_str
+from indigo.xmlutils import parse_html_str, compiled_xslt
 
 
 def chomp_left(elem, count):
@@ -124,7 +124,7 @@ class HtmlToBluebellText(Stage):
     xsl_fname = os.path.join(os.path.dirname(__file__), 'xsl/html-to-bluebell-text.xsl')
 
     def __call__(self, context):
-        xslt = etree.XSLT(etree.parse(self.xsl_fname))
+        xslt = compiled_xslt(self.xsl_fname)
         # do a deepcopy, otherwise the XSLT seems to modify the context.html
         context.text = str(xslt(deepcopy(context.html)))
 
@@ -137,7 +137,7 @@ class SimplifyHtml(Stage):
     xsl_fname = os.path.join(os.path.dirname(__file__), 'xsl/html-clean.xsl')
 
     def __call__(self, context):
-        xslt = etree.XSLT(etree.parse(self.xsl_fname))
+        xslt = compiled_xslt(self.xsl_fname)
         # When context.html is a root div element, the xslt ignores the div and produces a bunch of standalone p tags.
         # So, turn into text and re-parse, and then ensure there's a single container root
         context.html = parse_html_str(str(xslt(context.html)))
@@ -141,6 +141,15 @@ INDIGO = {
     'PRUNE_DOCUMENT_VERSIONS_DAYS': 90,
     # ... but keep this number of most recent ones
     'PRUNE_DOCUMENT_VERSIONS_KEEP': 5,
+    # store document versions as periodic full snapshots with compact deltas in between (see
+    # indigo_api.version_storage). Existing versions can be converted with the convert_document_versions command.
+    'DOCUMENT_VERSION_DELTAS': {
+        'ENABLED': os.environ.get('INDIGO_DOCUMENT_VERSION_DELTAS', 'false') == 'true',
+        # store a full snapshot after this many versions
+        'SNAPSHOT_EVERY': int(os.environ.get('INDIGO_DOCUMENT_VERSION_SNAPSHOT_EVERY', 25)),
+        # store a full snapshot if a delta is larger than this fraction of the full XML
+        'MAX_DELTA_RATIO': 0.25,
+    },
 
     # Key-value pairs for custom properties, per place code.
     'WORK_PROPERTIES': {},
@@ -163,7 +172,10 @@ INDIGO = {
         'URLCONF': {
             'v2': 'indigo_content_api.v2.urls_api',
             'v3': 'indigo_content_api.v3.urls_api',
-        }
+        },
+        # seconds for which clients and shared caches (CDNs) may cache published documents without revalidating;
+        # only enable this if shared caches in front of Indigo honour the Vary header, see configuration docs
+        'CACHE_MAX_AGE': int(os.environ.get('INDIGO_CONTENT_API_CACHE_MAX_AGE', 0)),
     },
 
     # namespaces to look for translation packs for javascript translation via i18next
@@ -177,6 +189,45 @@ INDIGO = {
 
     # should we use pyodide to parse documents on the client?
     'USE_PYODIDE': True,
+
+    # number of parsed documents to keep in each process's in-memory cache. Set to 0 to disable.
+    'PARSED_DOCUMENT_CACHE_SIZE': int(os.environ.get('INDIGO_PARSED_DOCUMENT_CACHE_SIZE', 50)),
+
+    # pre-render PDF, ePUB and HTML for published documents in the background when they're saved?
+    'PRERENDER_ARTEFACTS': os.environ.get('INDIGO_PRERENDER_ARTEFACTS', 'true') == 'true',
+
+    # number of background tasks that link references for a bulk link references job in parallel
+    'LINK_REFERENCES_WORKERS': int(os.environ.get('INDIGO_LINK_REFERENCES_WORKERS', 4)),
+
+    # number of documents to render concurrently when building multi-document ePUBs
+    'EPUB_RENDER_WORKERS': int(os.environ.get('INDIGO_EPUB_RENDER_WORKERS', 1 if DEBUG else 4)),
+
+    # pool of worker processes for diffing HTML
+    'DIFF_POOL': {
+        # maximum number of workers per process
+        'SIZE': int(os.environ.get('INDIGO_DIFF_POOL_SIZE', 2)),
+        # seconds a single diff may take before its worker is killed
+        'TIMEOUT': int(os.environ.get('INDIGO_DIFF_POOL_TIMEOUT', 60)),
+        # maximum bytes of memory per worker; 0 means no limit
+        'MAX_MEMORY': int(os.environ.get('INDIGO_DIFF_POOL_MAX_MEMORY', 1024 ** 3)),
+        # number of diffs after which a worker is replaced
+        'MAX_JOBS': int(os.environ.get('INDIGO_DIFF_POOL_MAX_JOBS', 100)),
+    },
+
+    # cache for PDFs and ePUBs rendered on request
+    'ARTEFACT_CACHE': {
+        # local directory, shared by all processes on a node
+        'LOCATION': os.environ.get('INDIGO_ARTEFACT_CACHE_DIR', '/var/tmp/indigo_artefacts'),
+        # size budget for the local directory; 0 disables the local cache
+        'MAX_BYTES': 0 if DEBUG else int(os.environ.get('INDIGO_ARTEFACT_CACHE_MAX_BYTES', 2 * 1024 ** 3)),
+        # name of a storage in STORAGES for a cache shared by all nodes, if any
+        'SHARED_STORAGE': os.environ.get('INDIGO_ARTEFACT_CACHE_STORAGE') or None,
+    },
+}
+
+# serialization format for compact document versions, see INDIGO['DOCUMENT_VERSION_DELTAS']
+SERIALIZATION_MODULES = {
+    'indigo_delta': 'indigo_api.version_storage',
 }
 
 # Database
@@ -589,6 +640,16 @@ if not DEBUG and SENTRY_DSN:
 FOP_CMD = os.environ.get("FOP_CMD", "fop")
 FOP_CONFIG = os.environ.get("FOP_CONFIG")
 FOP_FONT_PATH = os.environ.get("FOP_FONT_PATH")
+# maximum number of FOP jobs to run at once, per process
+FOP_POOL_SIZE = int(os.environ.get("FOP_POOL_SIZE", 2))
+# seconds a FOP job may run for, and may wait for a free slot in the pool
+FOP_TIMEOUT = int(os.environ.get("FOP_TIMEOUT", 300))
+FOP_QUEUE_TIMEOUT = int(os.environ.get("FOP_QUEUE_TIMEOUT", 300))
+# optional command for running FOP in a long-lived JVM, eg. "ng org.apache.fop.cli.Main"
+FOP_SERVER_CMD = os.environ.get("FOP_SERVER_CMD")
+# optional command that starts that JVM, which Indigo then supervises; see docs/running/configuration.rst
+FOP_SERVER_START_CMD = os.environ.get("FOP_SERVER_START_CMD")
+FOP_SERVER_STARTUP_TIMEOUT = int(os.environ.get("FOP_SERVER_STARTUP_TIMEOUT", 30))
 
 # allow injection of a custom test runner for github actions
 TEST_RUNNER = os.environ.get('TEST_RUNNER', 'django.test.runner.DiscoverRunner')
@@ -4,7 +4,8 @@ from cobalt import FrbrUri
 from docpipe.matchers import ExtractedCitation
 from lxml import etree, html as lxml_html
 
-from indigo.analysis.refs.works import AliasCitationMatcher
+from indigo.analysis.refs.works import AliasCitationMatcher, DBAliasMatcher
+from indigo_api.models import Work, WorkAlias, CitationAlias
 
 
 class AliasCitationMatcherTestCase(TestCase):
@@ -91,3 +92,26 @@ case is penal code important
         self.assertEqual([], self.matcher.citations)
 
 
+class DBAliasMatcherTestCase(TestCase):
+    fixtures = ['languages_data', 'countries', 'user', 'taxonomy_topics', 'work']
+
+    def test_aliases_cached_until_changed(self):
+        work = Work.objects.get(pk=1)
+        frbr_uri = FrbrUri.parse("/akn/za/act/2020/1")
+        WorkAlias.objects.create(work=work, alias="Test Act")
+
+        matcher = DBAliasMatcher()
+        matcher.setup(frbr_uri)
+        self.assertEqual("/akn/za/act/2014/10", matcher.aliases["Test Act"])
+
+        # cached
+        with self.assertNumQueries(0):
+            DBAliasMatcher().setup(frbr_uri)
+
+        # changing aliases invalidates the cache
+        CitationAlias.objects.create(place="za", frbr_uri="/akn/za/act/2009/1", aliases="Penal Code")
+        matcher = DBAliasMatcher()
+        matcher.setup(frbr_uri)
+        self.assertEqual("/akn/za/act/2014/10", matcher.aliases["Test Act"])
+        self.assertEqual("/akn/za/act/2009/1", matcher.aliases["Penal Code"])
+        self.assertIsNotNone(matcher.pattern_re.search("the Penal Code"))
@@ -3,6 +3,7 @@ from lxml import etree
 
 from django.test import TestCase
 
+from indigo.analysis.context import AnalysisContext
 from indigo.analysis.italics_terms import BaseItalicsFinder
 from indigo_api.models import Document, Work
 from indigo_api.tests.fixtures import document_fixture
@@ -100,3 +101,29 @@ class ItalicsMarkupTestCase(TestCase):
         root = etree.fromstring(expected.content.encode('utf-8'))
         expected.content = etree.tostring(root, encoding='utf-8').decode('utf-8')
         self.assertEqual(expected.content, document.content)
+
+    def test_italics_in_context(self):
+        """ Changes made in an analysis context are only written to the document at the end.
+        """
+        document = Document(
+            work=self.work,
+            document_xml=document_fixture(
+                xml="""
+        <section id="section-1">
+          <num>1.</num>
+          <heading>Application of Act</heading>
+          <content>
+            <p>In the Gazette it says that habeus corpus is XYZ.</p>
+          </content>
+        </section>
+                """
+            )
+        )
+        original = document.content
+
+        with AnalysisContext(document) as context:
+            self.italics_terms_finder.mark_up_italics_in_context(context, ['Gazette'])
+            BaseItalicsFinder().mark_up_italics_in_context(context, ['habeus corpus'])
+            self.assertEqual(original, document.content)
+
+        self.assertIn('<p>In the <i>Gazette</i> it says that <i>habeus corpus</i> is XYZ.</p>', document.content)
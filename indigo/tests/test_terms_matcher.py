@@ -0,0 +1,25 @@
+from django.test import TestCase
+
+from indigo.analysis.terms.base import TermsMatcher
+
+
+class TermsMatcherTestCase(TestCase):
+    def find(self, terms, text):
+        return [m.group(1) for m in TermsMatcher(terms).finditer(text)]
+
+    def test_longest_match(self):
+        self.assertEqual(
+            ['Minister of Health', 'Minister'],
+            self.find(['Minister', 'Minister of Health'], 'The Minister of Health and the Minister.'))
+
+    def test_word_boundaries(self):
+        self.assertEqual(['court'], self.find(['court'], 'the courthouse and the court_ and the court'))
+        self.assertEqual([], self.find(['act'], 'enacted, actor, reacts'))
+
+    def test_non_overlapping(self):
+        self.assertEqual(['land owner'], self.find(['land owner', 'owner of land'], 'the land owner of land'))
+
+    def test_match_positions(self):
+        match = next(TermsMatcher(['board']).finditer('the board means'))
+        self.assertEqual((4, 9), (match.start(), match.end()))
+        self.assertEqual('board', match.group())
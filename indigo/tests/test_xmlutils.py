@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+from django.test import TestCase
+from lxml import etree
+
+from indigo.xmlutils import compiled_xslt
+
+
+class CompiledXsltTestCase(TestCase):
+    def write_xslt(self, fname, text, mtime):
+        with open(fname, 'w') as f:
+            f.write(f"""<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+  <xsl:output method="text"/>
+  <xsl:template match="/">{text}</xsl:template>
+</xsl:stylesheet>""")
+        os.utime(fname, (mtime, mtime))
+
+    def test_cached_until_changed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.xsl')
+            self.write_xslt(fname, 'one', 1000)
+
+            xslt = compiled_xslt(fname)
+            self.assertIs(xslt, compiled_xslt(fname))
+
+            self.write_xslt(fname, 'two', 2000)
+            xslt2 = compiled_xslt(fname)
+            self.assertIsNot(xslt, xslt2)
+            self.assertEqual('two', str(xslt2(etree.fromstring('<a/>'))))
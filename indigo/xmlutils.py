@@ -1,9 +1,13 @@
 from collections import defaultdict
 
 import lxml.html
+import os
 import re
+import threading
 from itertools import chain
 
+from lxml import etree
+
 from cobalt import FrbrUri
 
 
@@ -80,3 +84,88 @@ def rewrite_all_attachment_work_components(xml_doc):
                     'a:FRBRManifestation': lambda: frbr_uri.manifestation_uri(),
                 }[part]()
     return counter
+
+
+class EidIndex:
+    """ Lazily-built index from eId to the elements with that eId in an XML tree.
+
+    Looking up an element by eId with XPath scans the entire document, which adds up when many lookups are done on
+    the same document. The index is built on first use. Stale entries (elements that have been removed from the tree
+    or had their eId changed) are detected on lookup and cause the index to be rebuilt. Callers that add new eIds to
+    the tree should call invalidate().
+    """
+
+    def __init__(self, root, namespace):
+        self.root = root
+        self.namespace = namespace
+        self._index = None
+
+    def invalidate(self):
+        self._index = None
+
+    def build(self):
+        index = defaultdict(list)
+        for elem in self.root.iterdescendants(f'{{{self.namespace}}}*'):
+            eid = elem.get('eId')
+            if eid:
+                index[eid].append(elem)
+        self._index = index
+
+    def get(self, eid, within=None):
+        """ Get the first element (in document order) with this eId, optionally a descendant of the `within` element.
+        Returns None if there is no such element.
+        """
+        for _ in range(2):
+            if self._index is None:
+                self.build()
+
+            elems = self._index.get(eid, [])
+            if all(self.is_current(e, eid) for e in elems):
+                break
+            self.invalidate()
+
+        for elem in elems:
+            if within is None or any(a is within for a in elem.iterancestors()):
+                return elem
+
+    def is_current(self, elem, eid):
+        """ Is this element still in the tree with the same eId?
+        """
+        if elem.get('eId') != eid:
+            return False
+        # removed elements still belong to the same lxml document, so check that the element is still attached
+        top = elem
+        for top in elem.iterancestors():
+            pass
+        return top is self.root
+
+
+def eid_index(xml_doc):
+    """ Get the (cached) EidIndex for a cobalt document.
+    """
+    index = getattr(xml_doc, '_eid_index', None)
+    if index is None or index.root is not xml_doc.root:
+        index = xml_doc._eid_index = EidIndex(xml_doc.root, xml_doc.namespace)
+    return index
+
+
+_xslt_cache = threading.local()
+
+
+def compiled_xslt(fname):
+    """ Get a compiled XSLT stylesheet for the file, re-using a previously compiled one if the file hasn't changed.
+
+    Stylesheets are cached per thread, since lxml XSLT objects shouldn't be shared between threads.
+    """
+    if not hasattr(_xslt_cache, 'stylesheets'):
+        _xslt_cache.stylesheets = {}
+
+    fname = os.path.abspath(fname)
+    mtime = os.path.getmtime(fname)
+    cached = _xslt_cache.stylesheets.get(fname)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    xslt = etree.XSLT(etree.parse(fname))
+    _xslt_cache.stylesheets[fname] = (mtime, xslt)
+    return xslt
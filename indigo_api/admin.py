@@ -13,7 +13,7 @@ from treebeard.forms import MoveNodeForm, movenodeform_factory
 from background_task.admin import TaskAdmin
 
 from .models import Document, Subtype, Colophon, Work, TaskLabel, TaxonomyTopic, CitationAlias, SavedSearch,\
-    AccentedTerms, CommonAnnotation
+    AccentedTerms, CommonAnnotation, LinkReferencesJob, EPUBBundleJob
 
 
 admin.site.register(Subtype)
@@ -118,6 +118,20 @@ class CommonAnnotationAdmin(admin.ModelAdmin):
     list_filter = ('language',)
 
 
+@admin.register(LinkReferencesJob)
+class LinkReferencesJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'place', 'state', 'n_done', 'n_changed', 'n_failed', 'created_by_user', 'created_at',)
+    list_filter = ('state', 'place',)
+    readonly_fields = ('document_ids',)
+
+
+@admin.register(EPUBBundleJob)
+class EPUBBundleJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'place', 'state', 'file', 'created_by_user', 'created_at',)
+    list_filter = ('state', 'place',)
+    readonly_fields = ('document_ids',)
+
+
 def run_now(modeladmin, request, queryset):
     queryset.update(run_at=now())
     messages.success(request, _("Updated run time to now for selected tasks."))
@@ -0,0 +1,335 @@
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+from indigo.plugins import plugins
+from indigo_api.exporters import HTMLExporter, EPUBExporter
+
+log = logging.getLogger(__name__)
+
+
+class DocumentArtefacts:
+    """ Pre-rendered artefacts (PDF, ePUB and standalone HTML) for published documents, kept in the storage backend
+    so that they're shared by all nodes.
+
+    Artefacts are rendered in the background when a published document is saved, and are stored under a path that
+    includes the document's `updated_at` timestamp. An artefact is only served if it matches the document's current
+    timestamp, otherwise the document must be rendered inline.
+
+    Only the default rendering of the whole document is stored for each format; renderings with other parameters
+    (such as a different resolver) are always rendered inline.
+    """
+    prefix = 'artefacts'
+
+    # the artefacts to render for each published document
+    names = ['pdf', 'epub', 'html', 'html-akn']
+
+    def __init__(self, storage=None):
+        self._storage = storage
+
+    @property
+    def storage(self):
+        return self._storage or storages['default']
+
+    def document_dir(self, document):
+        return posixpath.join(self.prefix, str(document.pk))
+
+    def version_dir(self, document):
+        return posixpath.join(self.document_dir(document), document.updated_at.strftime('%Y%m%dT%H%M%S%f'))
+
+    def path(self, document, name):
+        return posixpath.join(self.version_dir(document), name)
+
+    def get(self, document, name):
+        """ Return the stored artefact for the current version of this document, or None.
+        """
+        if document.pk is None or document.draft:
+            return None
+
+        path = self.path(document, name)
+        try:
+            with self.storage.open(path, 'rb') as f:
+                return f.read()
+        except Exception as e:
+            # storage backends raise different errors for missing files
+            log.debug(f"Couldn't load artefact {path}: {e}")
+            return None
+
+    def put(self, document, name, content):
+        path = self.path(document, name)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        if self.storage.exists(path):
+            self.storage.delete(path)
+        self.storage.save(path, ContentFile(content))
+
+    def render(self, document, name):
+        """ Render an artefact for a document, using the same defaults as the renderers.
+        """
+        if name == 'pdf':
+            exporter = plugins.for_locale('pdf-exporter')
+            exporter.resolver = settings.RESOLVER_URL
+            return exporter.render(document)
+
+        if name == 'epub':
+            return EPUBExporter(resolver=settings.RESOLVER_URL).render(document)
+
+        if name in ['html', 'html-akn']:
+            exporter = HTMLExporter(coverpage=True, standalone=True, resolver=settings.RESOLVER_URL,
+                                    media_resolver_use_akn_prefix=name == 'html-akn')
+            return exporter.render(document)
+
+        raise ValueError(f"Unknown artefact: {name}")
+
+    def render_all(self, document_id):
+        """ Render and store all artefacts for the current version of a published document, and delete
+        artefacts for older versions.
+        """
+        from indigo_api.models import Document
+
+        for name in self.names:
+            # exporters may change the document's XML, so load it afresh each time
+            document = Document.objects.undeleted().published().filter(pk=document_id).first()
+            if not document:
+                return
+
+            if self.storage.exists(self.path(document, name)):
+                continue
+
+            log.info(f"Rendering {name} artefact for document {document.pk} ({document.expression_frbr_uri})")
+            self.put(document, name, self.render(document, name))
+
+        self.delete_stale(document)
+
+    def delete_stale(self, document):
+        """ Delete stored artefacts for all but the current version of this document.
+        """
+        current = posixpath.basename(self.version_dir(document))
+        try:
+            dirs, _ = self.storage.listdir(self.document_dir(document))
+        except FileNotFoundError:
+            return
+
+        for version in dirs:
+            if version != current:
+                self.delete_dir(posixpath.join(self.document_dir(document), version))
+
+    def delete_dir(self, path):
+        dirs, files = self.storage.listdir(path)
+        for fname in files:
+            self.storage.delete(posixpath.join(path, fname))
+        for dname in dirs:
+            self.delete_dir(posixpath.join(path, dname))
+
+
+document_artefacts = DocumentArtefacts()
+
+
+class LocalArtefactCache:
+    """ Rendered artefacts cached on local disk, within a budget of `max_bytes`. The directory can be shared by all
+    processes on a node.
+
+    Reading a file touches it, so modification times record when each file was last used. When the cache grows
+    past its budget, the least recently used files are evicted.
+    """
+    def __init__(self, location, max_bytes):
+        self.location = location
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.location, key[:2], key)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def set(self, key, content):
+        if len(content) > self.max_bytes:
+            return
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write and then rename, so that other processes never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self.entries())
+            else:
+                self._size += len(content)
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        """ Yields (last used time, size, path) for each cached file. """
+        for dirpath, _, fnames in os.walk(self.location):
+            for fname in fnames:
+                if fname.startswith('.tmp-'):
+                    continue
+                path = os.path.join(dirpath, fname)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        """ Delete the least recently used files until the cache is comfortably within its budget. Other processes
+        add and evict files too, so this checks what is actually on disk.
+        """
+        entries = sorted(self.entries())
+        size = sum(size for _, size, _ in entries)
+        # leave some headroom, so that we don't evict on every write
+        target = self.max_bytes * 0.9
+
+        for _, fsize, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= fsize
+
+        self._size = size
+
+
+class SharedArtefactCache:
+    """ Rendered artefacts cached in a storage backend (such as S3), shared by all nodes. Nothing is evicted, so the
+    storage should expire old files itself, such as with a bucket lifecycle rule on the prefix.
+    """
+    prefix = 'artefact-cache'
+
+    def __init__(self, storage_name='default', storage=None):
+        self.storage_name = storage_name
+        self._storage = storage
+
+    @property
+    def storage(self):
+        return self._storage or storages[self.storage_name]
+
+    def path(self, key):
+        return posixpath.join(self.prefix, key[:2], key)
+
+    def get(self, key):
+        try:
+            with self.storage.open(self.path(key), 'rb') as f:
+                return f.read()
+        except Exception as e:
+            # storage backends raise different errors for missing files
+            log.debug(f"Couldn't load cached artefact {key}: {e}")
+            return None
+
+    def set(self, key, content):
+        path = self.path(key)
+        if not self.storage.exists(path):
+            self.storage.save(path, ContentFile(content))
+
+
+class ArtefactCache:
+    """ Cache for rendered artefacts (such as PDFs and ePUBs), with a local disk tier and an optional shared tier.
+
+    Artefacts are looked up locally first, and then in the shared tier, and artefacts found in the shared tier are
+    copied locally. Failures in either tier are logged and treated as misses, so that rendering still succeeds.
+
+    Counts of hits, misses and bytes served are kept for each process, and are logged every `log_every` lookups.
+    """
+    log_every = 100
+
+    def __init__(self, local=None, shared=None):
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @classmethod
+    def from_settings(cls, config):
+        local = shared = None
+        if config.get('MAX_BYTES'):
+            local = LocalArtefactCache(config['LOCATION'], config['MAX_BYTES'])
+        if config.get('SHARED_STORAGE'):
+            shared = SharedArtefactCache(config['SHARED_STORAGE'])
+        return cls(local, shared)
+
+    def hash_key(self, key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Get the cached artefact for this key, or None. """
+        key = self.hash_key(key)
+        content = tier = None
+
+        for tier in [t for t in [self.local, self.shared] if t]:
+            content = self.call(tier.get, key)
+            if content is not None:
+                break
+
+        if content is not None and tier is self.shared and self.local:
+            self.call(self.local.set, key, content)
+
+        self.record(tier if content is not None else None, content)
+        return content
+
+    def set(self, key, content):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        key = self.hash_key(key)
+        for tier in [self.local, self.shared]:
+            if tier:
+                self.call(tier.set, key, content)
+
+    def call(self, method, *args):
+        try:
+            return method(*args)
+        except Exception as e:
+            log.warning(f"Error using artefact cache: {e}", exc_info=e)
+
+    def record(self, tier, content):
+        with self._lock:
+            if tier is None:
+                self.misses += 1
+            else:
+                if tier is self.local:
+                    self.local_hits += 1
+                else:
+                    self.shared_hits += 1
+                self.bytes_served += len(content)
+
+            lookups = self.local_hits + self.shared_hits + self.misses
+            if lookups % self.log_every == 0:
+                log.info(f"Artefact cache stats: {self.stats()}")
+
+    def reset_stats(self):
+        self.local_hits = self.shared_hits = self.misses = self.bytes_served = 0
+
+    def stats(self):
+        hits = self.local_hits + self.shared_hits
+        lookups = hits + self.misses
+        return {
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'bytes_served': self.bytes_served,
+        }
+
+
+artefact_cache = ArtefactCache.from_settings(settings.INDIGO.get('ARTEFACT_CACHE', {}))
@@ -1,30 +1,58 @@
-import json
 import logging
 import re
 
 from django.utils.encoding import force_str
 from lxml import etree
+from reversion.models import Version
 
 from bluebell.xml import IdGenerator
 from cobalt.akn import get_maker
-from cobalt.schemas import validate
+from cobalt.schemas import validate, validate_xml, get_schema
 from docpipe.xmlutils import unwrap_element
 from indigo.xmlutils import rewrite_ids
+from indigo_api import version_storage
 
 log = logging.getLogger(__name__)
 
 
 class DataMigration:
     def migrate_document_version(self, version):
-        data = json.loads(force_str(version.serialized_data.encode("utf8")))[0]
+        """ Migrate the XML of a document version. If it changed, the version's data is updated and True is
+        returned. The caller must save the version.
+
+        Versions stored as deltas against this one (see indigo_api.version_storage) are re-stored and saved
+        immediately, so that they are unchanged. Because of this, a delta version's data is always re-read from
+        the database before it is migrated. To migrate all the versions of a document, prefer
+        migrate_document_versions.
+        """
+        if version.format == version_storage.FORMAT and version_storage.delta_base_id(version.serialized_data):
+            version.serialized_data = Version.objects\
+                .filter(pk=version.pk)\
+                .values_list('serialized_data', flat=True)\
+                .get()
+
+        data = version_storage.loads(force_str(version.serialized_data.encode("utf8")))[0]
+        if self.migrate_version_data(data):
+            version_storage.replace_data(version, [data])
+            return True
+
+    def migrate_document_versions(self, versions):
+        """ Migrate the XML of all the versions of a single document, oldest first, saving those that changed.
+        Returns the number of versions that changed.
+        """
+        return version_storage.migrate_versions(versions, lambda objects: self.migrate_version_data(objects[0]))
+
+    def migrate_version_data(self, data):
+        """ Migrate the XML of a deserialized document version in place, returning True if it changed.
+        """
         fields = data['fields']
         if fields.get('document_xml'):
             xml = etree.fromstring(fields['document_xml'])
             changed, xml = self.migrate_xml(xml)
             if changed:
                 fields['document_xml'] = etree.tostring(xml, encoding='unicode')
-                version.serialized_data = json.dumps([data])
                 return True
+        return False
 
     def migrate_document_xml(self, document):
         """ Migrate the raw document XML. This is useful in migrations where
@@ -194,10 +222,13 @@ class DefinitionsIntoBlockContainers(DataMigration):
     maker = None
     id_generator = None
 
-    def migrate_document(self, document):
-        self.ns = document.doc.namespace
+    def setup(self, ns):
+        self.ns = ns
         self.maker = get_maker()
         self.id_generator = IdGenerator()
+
+    def migrate_document(self, document):
+        self.setup(document.doc.namespace)
         xml = etree.fromstring(document.document_xml)
         changed, xml = self.migrate_xml(xml)
         if changed:
@@ -207,6 +238,17 @@ class DefinitionsIntoBlockContainers(DataMigration):
                 log.warning(errors)
             return True
 
+    def migrate_root(self, root):
+        """ Migrate a parsed XML tree in place, returning True if it changed.
+        """
+        self.setup(root.nsmap[None])
+        changed, root = self.migrate_xml(root)
+        if changed:
+            validates, errors = validate_xml(root, get_schema(self.ns, False))
+            if not validates:
+                log.warning(errors)
+        return changed
+
     def migrate_xml(self, xml):
         changed = False
 
@@ -1,5 +1,7 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
+import copy
 import datetime
 import logging
 import math
@@ -7,10 +9,13 @@ import os
 import re
 import shutil
 import tempfile
+from functools import lru_cache
+from itertools import repeat
 from django.conf import settings
 from django.contrib.staticfiles.finders import find as find_static
+from django.db import connections
 from django.template.loader import render_to_string, get_template
-from django.utils.translation import override, gettext_lazy as _
+from django.utils.translation import override, get_language, gettext_lazy as _
 from ebooklib import epub
 from languages_plus.models import Language
 from lxml import etree
@@ -21,7 +26,7 @@ from urllib.parse import parse_qsl, quote, unquote, urlencode, urlparse, urlunpa
 from docpipe.xmlutils import wrap_text
 from indigo.analysis.toc.base import descend_toc_pre_order
 from indigo.plugins import plugins, LocaleBasedMatcher
-from indigo.xmlutils import parse_html_str
+from indigo.xmlutils import parse_html_str, compiled_xslt
 from indigo_api.models import Colophon
 from indigo_api.pdf import run_fop
 from indigo_api.utils import filename_candidates, find_best_template, find_best_static
@@ -29,6 +34,21 @@ from indigo_api.utils import filename_candidates, find_best_template, find_best_
 log = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1024)
+def cached_best_template(candidates):
+    """ Memoised find_best_template for a tuple of candidates, since the available templates don't change
+    while the process is running.
+    """
+    return find_best_template(candidates)
+
+
+@lru_cache(maxsize=1024)
+def cached_best_static(candidates):
+    """ Memoised find_best_static for a tuple of candidates.
+    """
+    return find_best_static(candidates)
+
+
 class HTMLExporter:
     """ Export (render) AKN documents as as HTML.
     """
@@ -111,7 +131,7 @@ class HTMLExporter:
         found is used.
         """
         candidates = filename_candidates(document, prefix='indigo_api/akn/' + prefix, suffix=suffix)
-        best = find_best_template(candidates)
+        best = cached_best_template(tuple(candidates))
         if not best:
             raise ValueError("Couldn't find an HTML template to use for %s, tried: %s" % (document, candidates))
         return best
@@ -123,7 +143,7 @@ class HTMLExporter:
         found is used.
         """
         candidates = filename_candidates(document, prefix='xsl/html_', suffix='.xsl')
-        best = find_best_static(candidates)
+        best = cached_best_static(tuple(candidates))
         if not best:
             raise ValueError("Couldn't find XSLT file to use for %s, tried: %s" % (document, candidates))
         return best
@@ -220,7 +240,7 @@ class PDFExporter(HTMLExporter, LocaleBasedMatcher):
     def html_to_xml(self, html_string):
         """ Convert an HTML string into an XML string.
         """
-        xslt = etree.XSLT(etree.parse(find_static('xsl/html_to_xml.xsl')))
+        xslt = compiled_xslt(find_static('xsl/html_to_xml.xsl'))
         # apply xslt
         xml = str(xslt(parse_html_str(html_string)))
         # turn string into bytes and parse into xml
@@ -707,6 +727,8 @@ class EPUBExporter(HTMLExporter):
     def __init__(self, colophon=True, *args, **kwargs):
         super(EPUBExporter, self).__init__(*args, **kwargs)
         self.colophon = colophon
+        # number of documents to render concurrently in render_many
+        self.workers = settings.INDIGO.get('EPUB_RENDER_WORKERS', 1)
 
     def render(self, document, element=None):
         self.create_book()
@@ -740,11 +762,52 @@ class EPUBExporter(HTMLExporter):
             self.add_colophon(documents=documents)
         self.book.spine.append('nav')
 
-        for d in documents:
-            self.add_document(d)
+        for part in self.render_parts(documents):
+            self.add_part(part)
 
         return self.to_epub()
 
+    def render_parts(self, documents):
+        """ Render each document into a book of its own, using a pool of threads. Most of the work is parsing
+        and transforming XML, which lxml does without holding the GIL. Yields the books in document order.
+        """
+        workers = min(self.workers, len(documents))
+        if workers <= 1:
+            yield from (self.render_part(d) for d in documents)
+        else:
+            # the active language is per-thread, so pass it on to the pool threads
+            language = get_language()
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='epub') as pool:
+                yield from pool.map(self.render_part_in_thread, documents, repeat(language))
+
+    def render_part(self, document):
+        exporter = copy.copy(self)
+        exporter.create_book()
+        exporter.add_document(document)
+        return exporter.book
+
+    def render_part_in_thread(self, document, language):
+        try:
+            with override(language):
+                return self.render_part(document)
+        finally:
+            # database connections are per-thread, and aren't closed when the thread ends
+            connections.close_all()
+
+    def add_part(self, part):
+        """ Add the contents of a book rendered by render_part to this book.
+        """
+        for item in part.items:
+            if isinstance(item, (epub.EpubNcx, epub.EpubNav)):
+                continue
+            if isinstance(item, epub.EpubImage):
+                # images are numbered by the book they're added to
+                item.id = None
+            self.book.add_item(item)
+
+        self.book.spine.extend(part.spine)
+        self.book.toc.extend(part.toc)
+
     def create_book(self):
         self.book = epub.EpubBook()
         self.book.add_item(epub.EpubNcx())
@@ -940,7 +1003,7 @@ class XSLTRenderer(object):
     """
 
     def __init__(self, xslt_filename, xslt_params=None):
-        self.xslt = ET.XSLT(ET.parse(xslt_filename))
+        self.xslt = compiled_xslt(xslt_filename)
         self.xslt_params = xslt_params or {}
 
     def render(self, node):
@@ -12,7 +12,9 @@ import indigo.pipelines.html as html
 import indigo.pipelines.pdf as pdf
 import indigo.pipelines.text as text
 import indigo.pipelines.xml as xml
-from indigo.analysis.refs.base import markup_document_refs
+from indigo.analysis.context import AnalysisContext
+from indigo.analysis.italics_terms import markup_italics
+from indigo.analysis.refs.base import markup_refs
 from indigo.pipelines import DoctypePipeline
 from indigo.pipelines.base import HtmlToBluebellText, ParseBluebellText, SimplifyHtml, RemoveInlines, \
     CleanTableStyles, WrapAnnotations
@@ -238,12 +240,10 @@ class Importer(LocaleBasedMatcher):
     def analyse_after_import(self, doc):
         """ Run analysis after first import.
         """
-        markup_document_refs(doc)
-
-        italics_terms_finder = plugins.for_document('italics-terms', doc)
-        italics_terms = doc.work.country.italics_terms
-        if italics_terms_finder and italics_terms:
-            italics_terms_finder.mark_up_italics_in_document(doc, italics_terms)
+        # parse the document once for all analysis steps
+        with AnalysisContext(doc) as context:
+            markup_refs(context)
+            markup_italics(context)
 
     def import_from_pdf(self, upload, doc):
         context = ImportContext(pipeline=self.pdf_pipeline)
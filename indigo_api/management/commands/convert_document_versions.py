@@ -0,0 +1,46 @@
+import logging
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reversion.models import Version
+
+from indigo_api import version_storage
+from indigo_api.models import Document
+
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Convert the stored versions of documents to full snapshots with compact deltas in between, ' \
+           'or back to plain JSON with --decompress. See INDIGO["DOCUMENT_VERSION_DELTAS"].'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--decompress', action='store_true',
+                            help="Store every version in full, such as before disabling DOCUMENT_VERSION_DELTAS")
+        parser.add_argument('--document', type=int, action='append', dest='documents',
+                            help="Only convert this document (may be repeated)")
+
+    def handle(self, *args, **options):
+        content_type = ContentType.objects.get_for_model(Document)
+        versions = Version.objects.filter(content_type=content_type)
+        if options['documents']:
+            versions = versions.filter(object_id__in=[str(d) for d in options['documents']])
+
+        object_ids = versions.order_by('object_id').values_list('object_id', flat=True).distinct()
+        compressed = not options['decompress']
+        total = 0
+
+        for object_id in object_ids.iterator():
+            # each document's history is converted in one go, oldest first
+            with transaction.atomic():
+                changed = version_storage.convert_versions(
+                    versions.filter(object_id=object_id).order_by('pk').iterator(chunk_size=50),
+                    compressed=compressed,
+                )
+            if changed:
+                log.info(f"Converted {changed} versions of document {object_id}")
+            total += changed
+
+        log.info(f"Converted {total} document versions")
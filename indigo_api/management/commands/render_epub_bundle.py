@@ -0,0 +1,40 @@
+import logging
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from indigo_api.models import Country, Document, EPUBBundleJob
+
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Render an ePUB of the latest published expressions of all works in a place, in the background. ' \
+           'The ePUB is saved to storage and linked from the ePUB bundle job in the admin area.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('place', help='Place code, such as za or za-cpt')
+        parser.add_argument('--now', action='store_true', help="Render the ePUB now, rather than in the background")
+
+    def handle(self, *args, **options):
+        try:
+            country, locality = Country.get_country_locality(options['place'])
+        except ObjectDoesNotExist:
+            raise CommandError(f"Unknown place: {options['place']}")
+
+        documents = Document.objects.undeleted().published().no_xml()\
+            .latest_expression()\
+            .filter(work__country=country, work__locality=locality)
+
+        job = EPUBBundleJob.objects.create(
+            place=(locality or country).place_code,
+            document_ids=[d.pk for d in documents],
+        )
+
+        if options['now']:
+            job.run()
+            log.info(f"Saved ePUB bundle to {job.file.name}")
+        else:
+            job.queue()
+            log.info(f"Queued ePUB bundle job {job.pk} for {job.n_total} documents")
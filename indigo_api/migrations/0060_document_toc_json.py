@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0059_alter_annotation_created_by_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='toc_json',
+            field=models.JSONField(blank=True, null=True, verbose_name='table of contents'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 10:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0060_document_toc_json'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkReferencesJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.CharField(db_index=True, max_length=100, verbose_name='place')),
+                ('document_ids', models.JSONField(default=list, verbose_name='document ids')),
+                ('unlink', models.BooleanField(default=False, help_text='Remove existing references first', verbose_name='unlink')),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='state')),
+                ('n_done', models.IntegerField(default=0, verbose_name='documents done')),
+                ('n_changed', models.IntegerField(default=0, verbose_name='documents changed')),
+                ('n_failed', models.IntegerField(default=0, verbose_name='documents failed')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('created_by_user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+            ],
+            options={
+                'verbose_name': 'link references job',
+                'verbose_name_plural': 'link references jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0061_linkreferencesjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpressionChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event', models.CharField(choices=[('published', 'Published'), ('updated', 'Updated'), ('unpublished', 'Unpublished'), ('deleted', 'Deleted')], max_length=20, verbose_name='event')),
+                ('document_id', models.IntegerField(verbose_name='document id')),
+                ('frbr_uri', models.CharField(max_length=512, verbose_name='work FRBR URI')),
+                ('expression_frbr_uri', models.CharField(max_length=512, verbose_name='expression FRBR URI')),
+                ('place', models.CharField(db_index=True, max_length=100, verbose_name='place')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'expression change',
+                'verbose_name_plural': 'expression changes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
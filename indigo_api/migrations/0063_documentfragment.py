@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0062_expressionchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentFragment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('component', models.CharField(max_length=512, verbose_name='component')),
+                ('portion', models.CharField(blank=True, help_text='eId or portion name, or blank for the entire component', max_length=1024, verbose_name='portion')),
+                ('position', models.IntegerField(verbose_name='position')),
+                ('xml', models.TextField(verbose_name='XML')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragments', to='indigo_api.document', verbose_name='document')),
+            ],
+            options={
+                'verbose_name': 'document fragment',
+                'verbose_name_plural': 'document fragments',
+                'ordering': ('position',),
+                'indexes': [models.Index(fields=['document', 'portion'], name='indigo_api__documen_6ef54b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-18 12:40
+
+import django.db.models.deletion
+import indigo_api.models.jobs
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0063_documentfragment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EPUBBundleJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.CharField(db_index=True, max_length=100, verbose_name='place')),
+                ('document_ids', models.JSONField(default=list, verbose_name='document ids')),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='state')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('file', models.FileField(blank=True, null=True, upload_to=indigo_api.models.jobs.bundle_filename, verbose_name='file')),
+                ('created_by_user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+            ],
+            options={
+                'verbose_name': 'ePUB bundle job',
+                'verbose_name_plural': 'ePUB bundle jobs',
+                'ordering': ['-created_at'],
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0064_epubbundlejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkTimeline',
+            fields=[
+                ('work', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stored_timeline', serialize=False, to='indigo_api.work', verbose_name='work')),
+                ('language', models.CharField(max_length=20, verbose_name='language')),
+                ('timeline', models.JSONField(verbose_name='timeline')),
+                ('approved_timeline', models.JSONField(verbose_name='approved timeline')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'work timeline',
+                'verbose_name_plural': 'work timelines',
+            },
+        ),
+    ]
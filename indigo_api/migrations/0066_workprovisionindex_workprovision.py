@@ -0,0 +1,51 @@
+# Generated by Django 5.0 on 2026-10-18 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0065_worktimeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkProvisionIndex',
+            fields=[
+                ('work', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='provision_index', serialize=False, to='indigo_api.work', verbose_name='work')),
+                ('earliest_date', models.DateField(null=True, verbose_name='earliest expression date')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'work provision index',
+                'verbose_name_plural': 'work provision indexes',
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkProvision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='position')),
+                ('depth', models.PositiveSmallIntegerField(verbose_name='depth')),
+                ('eid', models.CharField(blank=True, max_length=1024, verbose_name='eId')),
+                ('parent_eid', models.CharField(blank=True, max_length=1024, verbose_name='parent eId')),
+                ('type', models.CharField(max_length=256, verbose_name='type')),
+                ('num', models.CharField(blank=True, max_length=1024, null=True, verbose_name='num')),
+                ('heading', models.TextField(blank=True, null=True, verbose_name='heading')),
+                ('title', models.TextField(blank=True, null=True, verbose_name='title')),
+                ('basic_unit', models.BooleanField(default=False, verbose_name='basic unit')),
+                ('first_seen', models.DateField(verbose_name='first seen')),
+                ('last_seen', models.DateField(verbose_name='last seen')),
+                ('work', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commenceable_provisions', to='indigo_api.work', verbose_name='work')),
+            ],
+            options={
+                'verbose_name': 'work provision',
+                'verbose_name_plural': 'work provisions',
+                'ordering': ['work', 'position'],
+                'indexes': [models.Index(fields=['work', 'first_seen'], name='indigo_api__work_id_8ae241_idx')],
+                'constraints': [models.UniqueConstraint(fields=('work', 'position'), name='unique_work_provision_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0066_workprovisionindex_workprovision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkreferencesjob',
+            name='chunks_claimed',
+            field=models.JSONField(default=dict, help_text='When each chunk was claimed, by chunk index', verbose_name='chunks claimed'),
+        ),
+        migrations.AddField(
+            model_name='linkreferencesjob',
+            name='chunks_done',
+            field=models.JSONField(default=list, verbose_name='chunks done'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_api', '0067_linkreferencesjob_chunks'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='linkreferencesjob',
+            name='chunks_done',
+        ),
+        migrations.AddField(
+            model_name='linkreferencesjob',
+            name='chunks_progress',
+            field=models.JSONField(default=dict, help_text='Number of documents done in each chunk, by chunk index', verbose_name='chunks progress'),
+        ),
+        migrations.AlterField(
+            model_name='linkreferencesjob',
+            name='chunks_claimed',
+            field=models.JSONField(default=dict, help_text='When each chunk was claimed or last made progress, by chunk index', verbose_name='chunks claimed'),
+        ),
+    ]
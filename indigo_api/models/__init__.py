@@ -5,3 +5,7 @@ from .works import *
 from .documents import *
 from .saved_searches import *
 from .tasks import *
+from .jobs import *
+from .changes import *
+from .timelines import *
+from .provisions import *
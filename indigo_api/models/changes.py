@@ -0,0 +1,119 @@
+from django.db import connection, models, transaction
+from django.db.models import signals
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+
+from indigo_api.models.documents import Document
+from indigo_api.models.works import Work
+
+
+# serialises inserts into the change log, see record_changes
+CHANGE_LOG_LOCK = 0x1d16c4a9
+
+
+class ExpressionChange(models.Model):
+    """ A log of changes to published expressions, for consumers of the content API that mirror
+    published documents. The id is a monotonic cursor: consumers ask for changes after the last id they've seen.
+
+    Changes must be recorded with `record_changes`, so that ids are committed in order.
+    """
+    PUBLISHED = 'published'
+    UPDATED = 'updated'
+    UNPUBLISHED = 'unpublished'
+    DELETED = 'deleted'
+    EVENTS = [
+        (PUBLISHED, _('Published')),
+        (UPDATED, _('Updated')),
+        (UNPUBLISHED, _('Unpublished')),
+        (DELETED, _('Deleted')),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    event = models.CharField(_("event"), max_length=20, choices=EVENTS)
+    # not a foreign key, so that changes outlive deleted documents
+    document_id = models.IntegerField(_("document id"))
+    frbr_uri = models.CharField(_("work FRBR URI"), max_length=512)
+    expression_frbr_uri = models.CharField(_("expression FRBR URI"), max_length=512)
+    place = models.CharField(_("place"), max_length=100, db_index=True)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = _("expression change")
+        verbose_name_plural = _("expression changes")
+
+    def __str__(self):
+        return f"ExpressionChange<{self.id} {self.event} {self.expression_frbr_uri}>"
+
+    @classmethod
+    def for_document(cls, document, event):
+        return cls(
+            event=event,
+            document_id=document.pk,
+            frbr_uri=document.frbr_uri,
+            expression_frbr_uri=document.expression_frbr_uri,
+            place=document.work.place.place_code,
+        )
+
+
+def record_changes(changes):
+    """ Record a list of unsaved ExpressionChange objects once the current transaction commits.
+
+    Ids are allocated when rows are inserted, not when they are committed, so a long transaction could commit a
+    change with a lower id after a consumer has already seen a higher one, and the consumer would miss it. To
+    prevent this, changes are inserted in their own short transaction that holds a lock until it commits, so
+    that ids are committed in the order they are allocated. Changes are only recorded if the change they
+    describe is committed.
+    """
+    if not changes:
+        return
+
+    def insert():
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CHANGE_LOG_LOCK])
+            ExpressionChange.objects.bulk_create(changes)
+
+    transaction.on_commit(insert)
+
+
+def expression_change_event(document):
+    """ Determine the change event for a document that has just been saved, based on whether it was
+    publicly visible when it was loaded, and whether it is now. Returns None if there is nothing to record.
+    """
+    was_visible = document.was_visible()
+    is_visible = not document.draft and not document.deleted
+
+    if is_visible:
+        return ExpressionChange.UPDATED if was_visible else ExpressionChange.PUBLISHED
+
+    if was_visible:
+        return ExpressionChange.DELETED if document.deleted else ExpressionChange.UNPUBLISHED
+
+
+@receiver(signals.post_save, sender=Document)
+def record_document_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    event = expression_change_event(instance)
+    if event:
+        record_changes([ExpressionChange.for_document(instance, event)])
+
+
+@receiver(signals.pre_delete, sender=Document)
+def record_document_delete(sender, instance, **kwargs):
+    # this is checked before the document is deleted, in case its visibility must be loaded
+    if instance.was_visible():
+        record_changes([ExpressionChange.for_document(instance, ExpressionChange.DELETED)])
+
+
+@receiver(signals.post_save, sender=Work)
+def record_work_change(sender, instance, created, raw=False, **kwargs):
+    """ Published expressions include details of their work, so they change when the work's details change.
+    """
+    if not created and not raw and instance.published_fields_changed():
+        record_changes([
+            ExpressionChange.for_document(doc, ExpressionChange.UPDATED)
+            for doc in instance.expressions().published().no_xml()
+            .select_related('work__country__country', 'work__locality', 'language__language')
+        ])
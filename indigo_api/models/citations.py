@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import signals
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
 
@@ -16,6 +19,11 @@ def validate_frbr_uri(value):
 
 class CitationAlias(models.Model):
     """ An explicit alias for a work used by the citator."""
+    CACHE_VERSION_KEY = "indigo-citations:v"
+    # also bumped immediately in this process, so that changes are visible before the transaction commits,
+    # and when the shared cache isn't available (eg. a dummy cache)
+    _local_version = 0
+
     place = models.CharField(_("place"), max_length=1024, help_text=_("Two letter country code, with optional locality code"))
     frbr_uri = models.CharField(_("FRBR URI"), max_length=1024, validators=[validate_frbr_uri])
     aliases = models.TextField(_("aliases"), help_text=_("Aliases, one per line"))
@@ -32,6 +40,25 @@ class CitationAlias(models.Model):
     def __str__(self):
         return f'<CitationAlias #{self.pk}: {self.place} - {self.frbr_uri}>'
 
+    @classmethod
+    def cache_version(cls):
+        """ Version of the data that citation matchers are built from (works, work aliases and citation aliases).
+        """
+        return cls._local_version, cache.get(cls.CACHE_VERSION_KEY, 0)
+
+    @classmethod
+    def invalidate_citations_cache(cls):
+        """Increment the local version and the shared version in the global cache."""
+        cls._local_version += 1
+
+        def _incr():
+            try:
+                cache.incr(cls.CACHE_VERSION_KEY)
+            except ValueError:
+                cache.add(cls.CACHE_VERSION_KEY, 1)
+        # avoid race conditions and do it at the end of the transaction
+        transaction.on_commit(_incr)
+
     @classmethod
     def aliases_for_frbr_uri(cls, frbr_uri):
         aliases = cls.objects.filter(place__in=[frbr_uri.place, frbr_uri.country])
@@ -41,3 +68,8 @@ class CitationAlias(models.Model):
             for alias in a.aliases.splitlines()
             if alias
         }
+
+
+@receiver([signals.post_save, signals.post_delete], sender=CitationAlias)
+def invalidate_citations_cache(sender, instance, **kwargs):
+    CitationAlias.invalidate_citations_cache()
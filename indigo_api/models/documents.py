@@ -1,13 +1,17 @@
 import os
+import copy
 import logging
 import datetime
+import threading
+from collections import OrderedDict
+from itertools import groupby
 
 from actstream import action
 from django.conf import settings
-from django.db import models, connection
+from django.db import models, connection, transaction
 from django.db.models import signals
 from django.contrib.auth.models import User
-from django.db.models import JSONField, Case, When, Value, F
+from django.db.models import JSONField, Case, When, Value, F, Prefetch, prefetch_related_objects
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
@@ -22,15 +26,81 @@ from lxml import etree
 
 from bluebell.xml import XmlGenerator
 
+from indigo_api import version_storage
 from indigo_api.models.amendments import AmendmentInstruction
 from indigo.analysis.toc.base import descend_toc_pre_order
 from indigo.plugins import plugins
 from indigo.documents import ResolvedAnchor
-from indigo.xmlutils import rewrite_all_attachment_work_components
+from indigo.xmlutils import rewrite_all_attachment_work_components, eid_index
 
 log = logging.getLogger(__name__)
 
 
+class ParsedDocumentCache:
+    """ Process-local, size-bounded LRU cache of parsed cobalt documents, keyed by ``(pk, updated_at)``.
+
+    Parsing large documents is expensive and the same document is often parsed many times in a process
+    (eg. rendering, TOC, portions). Cached documents are never handed out directly: callers always get
+    a copy of the cached tree, so that callers that mutate the document (such as the PDF exporter inserting a
+    coverpage) don't change the cached version.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, xml):
+        """ Get a copy of the cached document for this key, or None. The cached entry is only used if
+            its XML matches +xml+, which guards against document_xml being changed directly on the model.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != xml:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self.copy_doc(entry[1])
+
+    def put(self, key, xml, doc):
+        """ Cache a copy of +doc+, which was parsed from +xml+.
+        """
+        if self.size <= 0:
+            return
+        doc = self.copy_doc(doc)
+        with self._lock:
+            self._entries[key] = (xml, doc)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {'size': len(self._entries), 'max_size': self.size, 'hits': self.hits, 'misses': self.misses}
+
+    @classmethod
+    def copy_doc(cls, doc):
+        """ Copy a cobalt document by copying its XML tree, which is much cheaper than re-parsing it.
+        """
+        clone = copy.copy(doc)
+        clone.root = copy.deepcopy(doc.root)
+        clone.__dict__.pop('_eid_index', None)
+        # cobalt aliases the main and main content elements (eg. .act and .body) as instance attributes
+        setattr(clone, clone.document_type, clone.main)
+        setattr(clone, clone.main_content_tag, clone.main_content)
+        return clone
+
+
+parsed_document_cache = ParsedDocumentCache(settings.INDIGO.get('PARSED_DOCUMENT_CACHE_SIZE', 50))
+
+
 class DocumentManager(models.Manager):
     def get_queryset(self):
         # defer expensive or unnecessary fields
@@ -47,7 +117,8 @@ class DocumentQuerySet(models.QuerySet):
         return self.filter(draft=False)
 
     def no_xml(self):
-        return self.defer('document_xml')
+        # the stored table of contents is large too, and is only needed by a handful of views
+        return self.defer('document_xml', 'toc_json')
 
     def for_rendering(self):
         """ Prepare a queryset for rendering documents, by prefetching related data.
@@ -64,6 +135,35 @@ class DocumentQuerySet(models.QuerySet):
             )
         )
 
+    def for_listing(self):
+        """ Prepare a queryset for listing published documents in the content API, by prefetching everything
+        the serializer needs in a fixed number of queries, rather than a number of queries per document.
+        """
+        from indigo_api.models import Work
+
+        return (
+            self.prefetch_related(None)
+            .prefetch_related(
+                'language__language',
+                Prefetch('work', queryset=Work.objects.select_related('locality__country__country')),
+                'work__country__place_settings',
+                'work__locality__place_settings',
+                'work__parent_work',
+                'work__repealed_by',
+                'work__aliases',
+                'work__chapter_numbers',
+                'work__taxonomy_topics',
+                'work__amendments__amending_work__chapter_numbers',
+                'work__commencements__commencing_work',
+                Prefetch(
+                    'work__document_set',
+                    queryset=Document.objects.undeleted().published().no_xml()
+                    .select_related('language__language').order_by('expression_date'),
+                    to_attr='published_expressions',
+                ),
+            )
+        )
+
     def latest_expression(self):
         """ Select only the most recent expression for documents with the same frbr_uri.
         """
@@ -134,6 +234,62 @@ class DocumentQuerySet(models.QuerySet):
 
         return obj
 
+    def for_frbr_uris(self, frbr_uris):
+        """ Find the documents matching each of a list of FRBR URIs (strings or FrbrUri objects), using a single
+        query. Documents are matched in the same way as get_for_frbr_uri.
+
+        Returns a list with the matching document, or None, for each FRBR URI.
+        """
+        parsed = []
+        for frbr_uri in frbr_uris:
+            try:
+                parsed.append(frbr_uri if isinstance(frbr_uri, FrbrUri) else FrbrUri.parse(frbr_uri))
+            except ValueError:
+                parsed.append(None)
+
+        candidates = {}
+        work_uris = set(u.work_uri(work_component=False) for u in parsed if u)
+        for doc in self.filter(frbr_uri__in=work_uris).order_by('pk'):
+            candidates.setdefault(doc.frbr_uri, []).append(doc)
+
+        return [
+            self.match_frbr_uri(u, candidates.get(u.work_uri(work_component=False), [])) if u else None
+            for u in parsed
+        ]
+
+    @staticmethod
+    def match_frbr_uri(frbr_uri, documents):
+        """ Pick the document matching the FRBR URI from a list of documents of the same work, in pk order.
+        """
+        if frbr_uri.language:
+            documents = [d for d in documents if d.language.code == frbr_uri.language]
+
+        expr_date = frbr_uri.expression_date
+        if not expr_date:
+            # no expression date is equivalent to the "current" version, at time of retrieval
+            expr_date = ':' + datetime.date.today().strftime("%Y-%m-%d")
+
+        try:
+            if expr_date == '@':
+                # earliest document, undated documents last
+                dated = [d for d in documents if d.expression_date]
+                if dated:
+                    return min(dated, key=lambda d: d.expression_date)
+                return documents[0] if documents else None
+
+            date = parse_date(expr_date[1:]).date()
+            if expr_date[0] == '@':
+                # document at this date
+                return next((d for d in documents if d.expression_date == date), None)
+
+            if expr_date[0] == ':':
+                # latest document at or before this date
+                documents = [d for d in documents if d.expression_date and d.expression_date <= date]
+                return max(documents, key=lambda d: d.expression_date, default=None)
+
+        except ParseError:
+            pass
+
 
 class DocumentMixin(object):
     """ Support methods that define behaviour for a document, independent of the database model.
@@ -164,18 +320,24 @@ class DocumentMixin(object):
     def get_subcomponent(self, component, subcomponent):
         """ Get the named subcomponent in this document, such as `chapter/2` or 'section/13A'.
         :class:`lxml.objectify.ObjectifiedElement` or `None`.
+
+        Subcomponents are named by type and number, not by eId, so the eId is found in the (stored) table of
+        contents and the element is then looked up in the eId index.
         """
         def search_toc(items):
             for item in items:
-                if item.component == component and item.subcomponent == subcomponent:
-                    return item.element
+                name = '/'.join(x for x in [item['type'], (item['num'] or '').rstrip('.')] if x)
+                if item['component'] == component and name == subcomponent:
+                    return item['id']
 
-                if item.children:
-                    found = search_toc(item.children)
-                    if found:
-                        return found
+                found = search_toc(item['children'])
+                if found:
+                    return found
 
-        return search_toc(self.table_of_contents())
+        eid = search_toc(self.table_of_contents_json())
+        within = self.doc.components().get(component)
+        if eid and within is not None:
+            return eid_index(self.doc).get(eid, within)
 
     def table_of_contents(self):
         if not hasattr(self, '_toc'):
@@ -358,6 +520,9 @@ class Document(DocumentMixin, models.Model):
     document_xml = models.TextField(_("document XML"), null=True, blank=True)
     """ Raw XML content of the entire document """
 
+    toc_json = JSONField(_("table of contents"), null=True, blank=True)
+    """ Table of contents of the document, as a list of TOCElement dicts. Refreshed when document_xml changes. """
+
     # Date from the FRBRExpression element. This is either the publication date or the date of the last
     # amendment. This is used to identify this particular version of this work, so is stored in the DB.
     expression_date = models.DateField(_("expression date"), null=False, blank=False,
@@ -396,7 +561,7 @@ class Document(DocumentMixin, models.Model):
     def doc(self):
         """ The wrapped `an.act.Act` that this document works with. """
         if not getattr(self, '_doc', None):
-            self._doc = self._make_doc(self.document_xml)
+            self._doc = self._make_cached_doc()
         return self._doc
 
     @property
@@ -411,6 +576,16 @@ class Document(DocumentMixin, models.Model):
         self.reset_xml(value, from_model=False)
 
     def amendments(self, approved_only=False):
+        if self.expression_date and 'amendments' in getattr(self.work, '_prefetched_objects_cache', {}):
+            # use the prefetched amendments, rather than querying for each document in a listing
+            amendments = list(self.work.amendments.all())
+            # not all querysets that prefetch amendments also prefetch these; this is a no-op for those that do
+            prefetch_related_objects(amendments, 'amending_work', 'amending_work__chapter_numbers')
+            return [
+                a for a in amendments
+                if a.date <= self.expression_date and not (
+                    approved_only and (a.amending_work.work_in_progress or self.work.work_in_progress))
+            ]
         if self.expression_date:
             amendments = self.work.amendments
             if approved_only:
@@ -490,9 +665,69 @@ class Document(DocumentMixin, models.Model):
     def publication_date(self):
         return self.work.publication_date
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keep track of the XML as loaded, so that we know if it has changed when saving;
+        # if it is deferred, this is done when it's loaded, see refresh_from_db
+        if 'document_xml' in instance.__dict__:
+            instance._loaded_document_xml = instance.document_xml
+        # keep track of whether it was publicly visible, for recording changes to published expressions;
+        # if those fields are deferred, this is loaded when it's needed, see was_visible
+        if 'draft' in instance.__dict__ and 'deleted' in instance.__dict__:
+            instance._loaded_visible = not instance.draft and not instance.deleted
+        # keep track of the details that the work's commenceable provisions depend on
+        instance._loaded_expression = tuple(instance.__dict__.get(f) for f in ('expression_date', 'language_id', 'deleted'))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        # this is also how deferred fields are loaded
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'document_xml' in fields:
+            self._loaded_document_xml = self.__dict__.get('document_xml')
+
+    def xml_changed(self):
+        """ Whether the XML has changed since it was loaded. XML that was deferred and never loaded hasn't changed.
+        """
+        if 'document_xml' not in self.__dict__:
+            return False
+        return self.document_xml != getattr(self, '_loaded_document_xml', None)
+
+    def was_visible(self):
+        """ Whether this document was publicly visible when it was loaded or last saved.
+        """
+        if not hasattr(self, '_loaded_visible'):
+            loaded = Document.objects.filter(pk=self.pk).values('draft', 'deleted').first() if self.pk else None
+            self._loaded_visible = bool(loaded) and not loaded['draft'] and not loaded['deleted']
+        return self._loaded_visible
+
     def save(self, *args, **kwargs):
         self.copy_attributes()
-        return super(Document, self).save(*args, **kwargs)
+        was_visible = self.was_visible()
+        xml_changed = self.xml_changed()
+        update_fields = kwargs.get('update_fields')
+        if (self.toc_json is None and 'toc_json' not in self.get_deferred_fields()) or xml_changed:
+            self.refresh_toc()
+            # the stored table of contents must be saved along with the XML
+            if update_fields is not None and 'document_xml' in update_fields and 'toc_json' not in update_fields:
+                kwargs['update_fields'] = list(update_fields) + ['toc_json']
+        expression = (self.expression_date, self.language_id, self.deleted)
+        # tells the work's provision index whether it needs to be rebuilt, see WorkProvisionIndex
+        self._provisions_changed = xml_changed or expression != getattr(self, '_loaded_expression', None)
+        result = super(Document, self).save(*args, **kwargs)
+
+        # fragments are only kept for published documents
+        visible = not self.draft and not self.deleted
+        if visible and (xml_changed or not was_visible):
+            self.refresh_fragments()
+        elif xml_changed:
+            self.fragments.all().delete()
+
+        if 'document_xml' in self.__dict__:
+            self._loaded_document_xml = self.document_xml
+        self._loaded_visible = visible
+        self._loaded_expression = expression
+        return result
 
     def save_with_revision(self, user, comment=None):
         """ Save this document and create a new revision at the same time.
@@ -549,6 +784,57 @@ class Document(DocumentMixin, models.Model):
     def refresh_xml(self):
         self.document_xml = self.doc.to_xml().decode('utf-8')
 
+    def refresh_toc(self):
+        """ Rebuild the stored table of contents from the XML.
+        """
+        if hasattr(self, '_toc'):
+            del self._toc
+        self.toc_json = [t.as_dict() for t in self.table_of_contents()]
+
+    def table_of_contents_json(self):
+        """ The table of contents as a list of dicts (see TOCElement.as_dict), using the stored copy if it's
+            available, which avoids parsing the XML.
+        """
+        if self.toc_json is None:
+            return [t.as_dict() for t in self.table_of_contents()]
+        # callers may change the entries
+        return copy.deepcopy(self.toc_json)
+
+    def refresh_fragments(self):
+        """ Rebuild the stored fragments of the XML: one for each component (other than the main component), and
+            one for each provision in the table of contents. These can be served without parsing the whole document.
+        """
+        components = self.doc.components()
+        non_eid_portions = self.doc.non_eid_portions
+        fragments = OrderedDict(((name, ''), element) for name, element in components.items() if name != 'main')
+
+        for item in descend_toc_pre_order(self.table_of_contents()):
+            portion = item.type if item.type in non_eid_portions else item.id
+            key = (item.component, portion)
+            if portion and key not in fragments:
+                element = self.get_portion_element(portion, components.get(item.component))
+                if element is not None:
+                    fragments[key] = element
+
+        with transaction.atomic():
+            self.fragments.all().delete()
+            DocumentFragment.objects.bulk_create([
+                DocumentFragment(document=self, component=component, portion=portion, position=i,
+                                 xml=etree.tostring(element, encoding='unicode', with_tail=False))
+                for i, ((component, portion), element) in enumerate(fragments.items())
+            ])
+
+    def get_stored_fragment(self, portion, component=None):
+        """ Get the element for a stored fragment of the XML (see refresh_fragments), or None if there isn't one.
+            The portion may be blank, for an entire component.
+        """
+        fragments = self.fragments.filter(portion=portion or '')
+        if component:
+            fragments = fragments.filter(component=component)
+        fragment = fragments.first()
+        if fragment:
+            return fragment.element
+
     def reset_xml(self, xml, from_model=False):
         """ Completely reset the document XML to a new value. If from_model is False,
         also refresh database attributes from the new XML document. """
@@ -557,6 +843,8 @@ class Document(DocumentMixin, models.Model):
 
         # now update ourselves
         self._doc = doc
+        if hasattr(self, '_toc'):
+            del self._toc
         self.copy_attributes(from_model)
 
     def versions(self):
@@ -579,8 +867,21 @@ class Document(DocumentMixin, models.Model):
             self.expression_date = new_date
             self.save_with_revision(user, comment=comment)
 
+    def get_portion_element(self, portion, component=None):
+        """ Get a single portion element of this document, optionally inside the component element. This
+            is the same as cobalt's get_portion_element but uses the document's eId index.
+        """
+        if portion in self.doc.non_eid_portions:
+            return self.doc.get_portion_element(portion, component)
+        return self.get_element_by_eid(portion, component)
+
+    def get_element_by_eid(self, eid, within=None):
+        """ Get the first element with this eId, optionally inside the `within` element, or None.
+        """
+        return eid_index(self.doc).get(eid, within)
+
     def get_portion(self, provision_eid):
-        provision_xml = self.doc.get_portion_element(provision_eid)
+        provision_xml = self.get_portion_element(provision_eid)
         if provision_xml is None:
             return None
         portion = StructuredDocument.for_document_type('portion')()
@@ -613,16 +914,30 @@ class Document(DocumentMixin, models.Model):
         xml = etree.fromstring(provision_xml)
         # portionBody will always have exactly one child
         updated_provision = xml.xpath('a:portion/a:portionBody/a:*', namespaces={'a': self.doc.namespace})[0]
-        old_provision = self.doc.get_portion_element(provision_eid)
+        old_provision = self.get_portion_element(provision_eid)
         old_provision.getparent().replace(old_provision, updated_provision)
         generator = XmlGenerator(self.frbr_uri)
         generator.generate_eids(self.doc.root)
+        eid_index(self.doc).invalidate()
         rewrite_all_attachment_work_components(self.doc)
         self.reset_xml(self.doc.to_xml(encoding='unicode'), from_model=True)
 
     def _make_doc(self, xml):
         return self.cobalt_class(xml)
 
+    def _make_cached_doc(self):
+        """ Make the cobalt document for the saved XML, using the parsed document cache when possible.
+        """
+        if not self.pk or not self.updated_at or not self.document_xml:
+            return self._make_doc(self.document_xml)
+
+        key = (self.pk, self.updated_at)
+        doc = parsed_document_cache.get(key, self.document_xml)
+        if doc is None:
+            doc = self._make_doc(self.document_xml)
+            parsed_document_cache.put(key, self.document_xml, doc)
+        return doc
+
     @property
     def cobalt_class(self):
         """ Dynamically lookup the cobalt document type to use, based on the FRBR URI.
@@ -702,6 +1017,20 @@ class Document(DocumentMixin, models.Model):
         """
 
         with connection.cursor() as cursor:
+            # Step 0: versions stored as deltas against versions that are about to be deleted must be re-stored
+            cursor.execute(to_delete_sql + """
+                SELECT v.id
+                FROM reversion_version v
+                WHERE v.format = %s
+                  AND v.revision_id NOT IN (SELECT revision_id FROM to_delete)
+                  AND substring(v.serialized_data from %s)::integer IN (
+                      SELECT id FROM reversion_version WHERE revision_id IN (SELECT revision_id FROM to_delete)
+                  );
+            """, [f'{days} days', keep, version_storage.FORMAT, version_storage.DELTA_BASE_SQL_RE])
+            orphans = Version.objects.filter(pk__in=[row[0] for row in cursor.fetchall()]).order_by('content_type_id', 'object_id', 'pk')
+            for _key, versions in groupby(orphans, key=lambda v: (v.content_type_id, v.object_id)):
+                version_storage.convert_versions(versions)
+
             # Step 1: Delete from reversion_version
             cursor.execute(to_delete_sql + """
                 DELETE FROM reversion_version
@@ -718,7 +1047,7 @@ class Document(DocumentMixin, models.Model):
 
 
 # version tracking
-reversion.revisions.register(Document)
+reversion.revisions.register(Document, format=version_storage.FORMAT if version_storage.is_enabled() else 'json')
 
 
 @receiver(signals.post_save, sender=Document)
@@ -733,6 +1062,10 @@ def post_save_document(sender, instance, **kwargs):
         action.send(instance.updated_by_user, verb='updated', action_object=instance,
                     place_code=instance.work.place.place_code)
 
+    if settings.INDIGO.get('PRERENDER_ARTEFACTS') and not instance.draft and not instance.deleted:
+        from indigo_api.tasks import render_document_artefacts
+        transaction.on_commit(lambda: render_document_artefacts(instance.pk))
+
 
 def attachment_filename(instance, filename):
     """ Make S3 attachment filenames relative to the document,
@@ -782,6 +1115,30 @@ def delete_attachment(sender, instance, **kwargs):
     instance.file.delete()
 
 
+class DocumentFragment(models.Model):
+    """ A fragment of a published document's XML, either a provision or a component (such as a schedule), stored
+    separately so that it can be served without loading and parsing the whole document. These are rebuilt whenever
+    the document is saved.
+    """
+    document = models.ForeignKey(Document, related_name='fragments', on_delete=models.CASCADE,
+                                 verbose_name=_("document"))
+    component = models.CharField(_("component"), max_length=512)
+    portion = models.CharField(_("portion"), max_length=1024, blank=True,
+                               help_text=_("eId or portion name, or blank for the entire component"))
+    position = models.IntegerField(_("position"))
+    xml = models.TextField(_("XML"))
+
+    class Meta:
+        ordering = ('position',)
+        verbose_name = _("document fragment")
+        verbose_name_plural = _("document fragments")
+        indexes = [models.Index(fields=['document', 'portion'])]
+
+    @property
+    def element(self):
+        return etree.fromstring(self.xml)
+
+
 class Colophon(models.Model):
     """ A colophon is the chunk of text included at the
     start of the PDF and standalone HTML files. It includes
@@ -0,0 +1,281 @@
+import datetime
+import logging
+import math
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+log = logging.getLogger(__name__)
+
+
+class BackgroundJob(models.Model):
+    """ Base class for work done by a background task, which tracks the state of the work.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATES = [
+        (PENDING, _('Pending')),
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+    ]
+
+    place = models.CharField(_("place"), max_length=100, db_index=True)
+    document_ids = models.JSONField(_("document ids"), default=list)
+    state = models.CharField(_("state"), max_length=20, choices=STATES, default=PENDING)
+    error = models.TextField(_("error"), null=True, blank=True)
+
+    created_by_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True,
+                                        verbose_name=_("created by"))
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-created_at']
+
+    @property
+    def n_total(self):
+        return len(self.document_ids)
+
+    @property
+    def is_finished(self):
+        return self.state in [self.DONE, self.FAILED]
+
+    def fail(self, error):
+        self.state = self.FAILED
+        self.error = error
+        self.save(update_fields=['state', 'error', 'updated_at'])
+
+
+class LinkReferencesJob(BackgroundJob):
+    """ A background job that (re-)links references in a batch of documents.
+
+    Documents are processed in chunks, which are spread across several background tasks that run in parallel
+    (see settings.INDIGO['LINK_REFERENCES_WORKERS']). Each task claims the next chunk while holding a lock on the
+    job, so no two tasks process the same chunk, and records progress after each document. A chunk whose task died
+    can be claimed again once it has made no progress for CLAIM_TIMEOUT, and is resumed from its last completed
+    document, so that each document is only counted once.
+    """
+    CHUNK_SIZE = 20
+    """ Number of documents in each chunk. """
+    CLAIM_TIMEOUT = datetime.timedelta(hours=1)
+    """ How long after a chunk last made progress before another task may claim it. """
+
+    unlink = models.BooleanField(_("unlink"), default=False, help_text=_("Remove existing references first"))
+    n_done = models.IntegerField(_("documents done"), default=0)
+    n_changed = models.IntegerField(_("documents changed"), default=0)
+    n_failed = models.IntegerField(_("documents failed"), default=0)
+    chunks_claimed = models.JSONField(_("chunks claimed"), default=dict,
+                                      help_text=_("When each chunk was claimed or last made progress, by chunk index"))
+    chunks_progress = models.JSONField(_("chunks progress"), default=dict,
+                                       help_text=_("Number of documents done in each chunk, by chunk index"))
+
+    class Meta(BackgroundJob.Meta):
+        verbose_name = _("link references job")
+        verbose_name_plural = _("link references jobs")
+
+    def __str__(self):
+        return f"LinkReferencesJob<{self.pk} {self.place} {self.state} {self.n_done}/{self.n_total}>"
+
+    @property
+    def progress(self):
+        """ Percentage of documents processed. """
+        if not self.n_total:
+            return 100
+        return int(100 * self.n_done / self.n_total)
+
+    @property
+    def n_chunks(self):
+        return math.ceil(self.n_total / self.CHUNK_SIZE)
+
+    def chunk_document_ids(self, chunk):
+        return self.document_ids[chunk * self.CHUNK_SIZE:(chunk + 1) * self.CHUNK_SIZE]
+
+    def chunk_done(self, chunk):
+        return self.chunks_progress.get(str(chunk), 0) >= len(self.chunk_document_ids(chunk))
+
+    def queue(self):
+        """ Queue the background tasks to process this job. """
+        from indigo_api.tasks import link_references
+        workers = max(1, min(settings.INDIGO.get('LINK_REFERENCES_WORKERS', 1), self.n_chunks))
+
+        def queue_tasks():
+            for _i in range(workers):
+                link_references(self.pk)
+
+        transaction.on_commit(queue_tasks)
+
+    def lock(self):
+        """ Reload this job's progress and lock its row until the end of the current transaction. """
+        job = type(self).objects.select_for_update().get(pk=self.pk)
+        for field in ['state', 'n_done', 'n_changed', 'n_failed', 'chunks_claimed', 'chunks_progress']:
+            setattr(self, field, getattr(job, field))
+
+    def next_chunk(self):
+        """ The index of the next chunk that can be claimed, or None. The job must be locked. """
+        stale = (timezone.now() - self.CLAIM_TIMEOUT).isoformat()
+        for chunk in range(self.n_chunks):
+            claimed = self.chunks_claimed.get(str(chunk))
+            if not self.chunk_done(chunk) and (not claimed or claimed < stale):
+                return chunk
+
+    def next_run(self):
+        """ The number of seconds after which a task should run again to continue this job, or None if it is
+        finished. Chunks that are claimed but not done are retried once their claims go stale, in case the tasks
+        that claimed them have died. The job must be locked.
+        """
+        if self.is_finished:
+            return None
+        if self.next_chunk() is not None:
+            return 0
+        claims = [
+            datetime.datetime.fromisoformat(self.chunks_claimed[str(chunk)])
+            for chunk in range(self.n_chunks)
+            if not self.chunk_done(chunk)
+        ]
+        if not claims:
+            return 0
+        stale_at = min(claims) + self.CLAIM_TIMEOUT
+        return max(0, math.ceil((stale_at - timezone.now()).total_seconds()))
+
+    def claim_chunk(self):
+        """ Claim the next chunk to process, returning its index, or None if there are none that can be claimed.
+        """
+        with transaction.atomic():
+            self.lock()
+            if self.is_finished:
+                return None
+
+            if all(self.chunk_done(chunk) for chunk in range(self.n_chunks)):
+                self.state = self.DONE
+                self.save(update_fields=['state', 'updated_at'])
+                return None
+
+            chunk = self.next_chunk()
+            if chunk is not None:
+                self.state = self.RUNNING
+                self.chunks_claimed[str(chunk)] = timezone.now().isoformat()
+                self.save(update_fields=['state', 'chunks_claimed', 'updated_at'])
+            return chunk
+
+    def finish_document(self, chunk, position, changed, failed):
+        """ Record the result of processing the document at `position` in a chunk, which also renews the claim
+        on the chunk.
+        """
+        with transaction.atomic():
+            self.lock()
+            # a chunk may be processed again if its claim went stale, but each document is only counted once
+            if self.chunks_progress.get(str(chunk), 0) == position:
+                self.chunks_progress[str(chunk)] = position + 1
+                self.n_done += 1
+                self.n_changed += int(changed)
+                self.n_failed += int(failed)
+            self.chunks_claimed[str(chunk)] = timezone.now().isoformat()
+            if not self.is_finished and all(self.chunk_done(c) for c in range(self.n_chunks)):
+                self.state = self.DONE
+            self.save(update_fields=['state', 'n_done', 'n_changed', 'n_failed', 'chunks_claimed',
+                                     'chunks_progress', 'updated_at'])
+
+    def run_chunk(self):
+        """ Claim and process the next chunk of documents, resuming from where an earlier attempt at the chunk
+        left off. Returns the number of seconds after which a task should run again to continue the job (see
+        next_run), or None if the job is finished.
+
+        Each document is processed and saved in its own transaction.
+        """
+        chunk = self.claim_chunk()
+        if chunk is not None:
+            document_ids = self.chunk_document_ids(chunk)
+            for position in range(self.chunks_progress.get(str(chunk), 0), len(document_ids)):
+                doc_id = document_ids[position]
+                changed = failed = False
+                try:
+                    with transaction.atomic():
+                        changed = self.link_document(doc_id)
+                except Exception as e:
+                    log.error(f"Error linking references for document {doc_id}: {e}", exc_info=e)
+                    failed = True
+                self.finish_document(chunk, position, changed, failed)
+
+        with transaction.atomic():
+            self.lock()
+            return self.next_run()
+
+    def link_document(self, doc_id):
+        """ Link references in a single document, saving a new revision if it changed. Returns True if the
+        document changed.
+        """
+        from docpipe.xmlutils import unwrap_element
+        from indigo.analysis.context import AnalysisContext
+        from indigo.analysis.refs.base import markup_refs
+        from indigo_api.models import Document
+
+        doc = Document.objects.undeleted().filter(pk=doc_id).first()
+        if not doc:
+            return False
+
+        old_content = doc.content
+        with AnalysisContext(doc) as context:
+            if self.unlink:
+                # remove existing refs
+                for ref in context.root.xpath('.//a:ref[starts-with(@href, "/") or starts-with(@href, "#")]',
+                                              namespaces={'a': doc.doc.namespace}):
+                    unwrap_element(ref)
+
+            markup_refs(context)
+
+        if doc.content != old_content:
+            doc.save_with_revision(user=self.created_by_user, comment='Re-link refs')
+            return True
+
+        return False
+
+
+def bundle_filename(instance, filename):
+    return f'bundles/{instance.pk}/{filename}'
+
+
+class EPUBBundleJob(BackgroundJob):
+    """ A background job that renders a batch of documents (such as all the works in a place) into a single ePUB,
+    and saves it to storage.
+    """
+    file = models.FileField(_("file"), upload_to=bundle_filename, null=True, blank=True)
+
+    class Meta(BackgroundJob.Meta):
+        verbose_name = _("ePUB bundle job")
+        verbose_name_plural = _("ePUB bundle jobs")
+
+    def __str__(self):
+        return f"EPUBBundleJob<{self.pk} {self.place} {self.state} {self.n_total}>"
+
+    def queue(self):
+        """ Queue the background task to process this job. """
+        from indigo_api.tasks import render_epub_bundle
+        transaction.on_commit(lambda: render_epub_bundle(self.pk))
+
+    def run(self):
+        """ Render the ePUB and save it. """
+        from indigo_api.exporters import EPUBExporter
+        from indigo_api.models import Document
+
+        self.state = self.RUNNING
+        self.save(update_fields=['state', 'updated_at'])
+
+        documents = sorted(
+            Document.objects.undeleted().published().no_xml()
+            .select_related('work', 'work__country', 'work__locality', 'language__language')
+            .filter(pk__in=self.document_ids),
+            key=lambda d: d.title,
+        )
+        log.info(f"Rendering ePUB bundle of {len(documents)} documents for {self.place}")
+        content = EPUBExporter(resolver=settings.RESOLVER_URL).render_many(documents)
+
+        self.file.save(f'{self.place}.epub', ContentFile(content), save=False)
+        self.state = self.DONE
+        self.save(update_fields=['file', 'state', 'updated_at'])
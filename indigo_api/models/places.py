@@ -100,6 +100,8 @@ class Country(models.Model):
     def settings(self):
         """ PlaceSettings object for this country.
         """
+        if 'place_settings' in getattr(self, '_prefetched_objects_cache', {}):
+            return next((s for s in self.place_settings.all() if s.locality_id is None), None)
         return self.place_settings.filter(locality=None).first()
 
     def as_json(self):
@@ -231,6 +233,8 @@ class Locality(models.Model):
     def settings(self):
         """ PlaceSettings object for this place.
         """
+        if 'place_settings' in getattr(self, '_prefetched_objects_cache', {}):
+            return next(iter(self.place_settings.all()), None)
         return self.place_settings.first()
 
     def __str__(self):
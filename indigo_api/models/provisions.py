@@ -0,0 +1,235 @@
+from django.db import models, transaction
+from django.db.models import signals
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+
+from indigo.analysis.toc.base import TOCElement, descend_toc_pre_order, remove_toc_elements
+from indigo.plugins import plugins
+from indigo_api.models.amendments import Amendment
+from indigo_api.models.documents import Document
+from indigo_api.models.works import Work
+
+
+class WorkProvisionIndex(models.Model):
+    """ Records that the commenceable provisions of a work have been stored (as WorkProvision objects), so that
+    they don't have to be rebuilt from the tables of contents of all its expressions each time they're used.
+
+    The index is deleted whenever an expression's table of contents, date or language changes, or an amendment
+    changes, and is rebuilt the next time it's needed. Both happen while holding a lock on the work, so that an
+    index built from older data can't overwrite an invalidation that happened while it was being built.
+    """
+    work = models.OneToOneField(Work, on_delete=models.CASCADE, primary_key=True, related_name='provision_index',
+                                verbose_name=_("work"))
+    earliest_date = models.DateField(_("earliest expression date"), null=True)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("work provision index")
+        verbose_name_plural = _("work provision indexes")
+
+    def __str__(self):
+        return f"WorkProvisionIndex<{self.work_id}>"
+
+    def provisions(self, date=None):
+        """ A queryset of the work's commenceable provisions, in table of contents order. If `date` is provided,
+        only provisions in expressions up to and including that date are included, or those in the earliest
+        expression if the date is before it.
+        """
+        provisions = WorkProvision.objects.filter(work_id=self.work_id)
+        if date and self.earliest_date:
+            provisions = provisions.filter(first_seen__lte=max(date, self.earliest_date))
+        return provisions.order_by('position')
+
+    @classmethod
+    def for_work(cls, work):
+        """ Get the provision index for this work, building it if necessary. """
+        index = cls.objects.filter(work=work).first()
+        if index:
+            return index
+
+        with transaction.atomic():
+            Work.objects.filter(pk=work.pk).lock()
+            # it may have been built while we waited for the lock
+            return cls.objects.filter(work=work).first() or cls.build(work)
+
+    @classmethod
+    def build(cls, work):
+        """ Store the commenceable provisions of all the work's expressions, replacing any already stored.
+
+        Provisions are built up from each expression in turn, in ascending date order, so that provisions that
+        have been removed from later expressions are still included. Tables of contents are loaded from the
+        stored copy on each expression, where possible.
+        """
+        with transaction.atomic():
+            Work.objects.filter(pk=work.pk).lock()
+            rows, earliest_date = cls.build_provisions(work)
+            WorkProvision.objects.filter(work=work).delete()
+            WorkProvision.objects.bulk_create(rows, batch_size=500)
+            index, _ = cls.objects.update_or_create(work=work, defaults={'earliest_date': earliest_date})
+
+        return index
+
+    @classmethod
+    def build_provisions(cls, work):
+        """ Build the (unsaved) WorkProvision objects for a work, returning a tuple of (provisions, earliest
+        expression date).
+        """
+        documents = list(
+            work.expressions()
+            .order_by('expression_date')
+            .values('id', 'language_id', 'expression_date', 'toc_json'))
+        earliest_date = documents[0]['expression_date'] if documents else None
+
+        missing = [d['id'] for d in documents if d['toc_json'] is None]
+        if missing:
+            tocs = {
+                doc.id: doc.table_of_contents_json()
+                for doc in work.expressions().defer(None).filter(pk__in=missing)
+                .select_related('work', 'work__locality', 'work__country', 'work__country__country')
+            }
+            for d in documents:
+                if d['toc_json'] is None:
+                    d['toc_json'] = tocs[d['id']]
+
+        # within the ascending expression date order, consider primary language documents first
+        documents.sort(key=lambda d: 0 if d['language_id'] == work.country.primary_language_id else 1)
+
+        locality = work.locality.code if work.locality else None
+        plugin = plugins.for_locale('toc', country=work.country.code, locality=locality,
+                                    language=work.country.primary_language.code)
+
+        provisions = []
+        id_set = set()
+        # the date each provision (element) was added, and the earliest and latest dates of each eId
+        added = {}
+        seen = {}
+
+        if plugin:
+            for doc in documents:
+                date = doc['expression_date']
+                # explicitly exclude definitions from commenceable provisions
+                toc = remove_toc_elements([TOCElement.from_dict(t) for t in doc['toc_json']], elements=['definition'])
+
+                for item in descend_toc_pre_order(plugin.commenceable_items(toc)):
+                    if item.id:
+                        first, last = seen.get(item.id, (date, date))
+                        seen[item.id] = (min(first, date), max(last, date))
+
+                plugin.insert_commenceable_provisions(toc, provisions, id_set)
+                for item in descend_toc_pre_order(provisions):
+                    added.setdefault(id(item), date)
+
+        rows = []
+
+        def add_rows(items, depth, parent, parent_first_seen):
+            for item in items:
+                first_seen = last_seen = added[id(item)]
+                if item.id in seen:
+                    first_seen = min(first_seen, seen[item.id][0])
+                    last_seen = seen[item.id][1]
+                # a provision can't be seen before its parent
+                if parent_first_seen:
+                    first_seen = max(first_seen, parent_first_seen)
+
+                rows.append(WorkProvision(
+                    work=work,
+                    position=len(rows),
+                    depth=depth,
+                    eid=item.id or '',
+                    parent_eid=(parent.id or '') if parent else '',
+                    type=item.type,
+                    num=item.num,
+                    heading=item.heading,
+                    title=item.title,
+                    basic_unit=item.basic_unit,
+                    first_seen=first_seen,
+                    last_seen=max(first_seen, last_seen),
+                ))
+                add_rows(item.children, depth + 1, item, first_seen)
+
+        add_rows(provisions, 0, None, None)
+        return rows, earliest_date
+
+    @classmethod
+    def invalidate(cls, work_ids):
+        work_ids = [w for w in work_ids if w]
+        if work_ids:
+            with transaction.atomic():
+                Work.objects.filter(pk__in=work_ids).lock()
+                cls.objects.filter(work_id__in=work_ids).delete()
+
+
+class WorkProvision(models.Model):
+    """ A commenceable provision of a work, from any of its expressions. See WorkProvisionIndex.
+
+    `first_seen` is the earliest expression date at which the provision exists, and `last_seen` the latest.
+    Provisions are stored in table of contents order (pre-order), with their depth in the tree.
+    """
+    work = models.ForeignKey(Work, on_delete=models.CASCADE, related_name='commenceable_provisions',
+                             verbose_name=_("work"))
+    position = models.PositiveIntegerField(_("position"))
+    depth = models.PositiveSmallIntegerField(_("depth"))
+    eid = models.CharField(_("eId"), max_length=1024, blank=True)
+    parent_eid = models.CharField(_("parent eId"), max_length=1024, blank=True)
+    type = models.CharField(_("type"), max_length=256)
+    num = models.CharField(_("num"), max_length=1024, null=True, blank=True)
+    heading = models.TextField(_("heading"), null=True, blank=True)
+    title = models.TextField(_("title"), null=True, blank=True)
+    basic_unit = models.BooleanField(_("basic unit"), default=False)
+    first_seen = models.DateField(_("first seen"))
+    last_seen = models.DateField(_("last seen"))
+
+    class Meta:
+        ordering = ['work', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['work', 'position'], name='unique_work_provision_position'),
+        ]
+        indexes = [
+            models.Index(fields=['work', 'first_seen']),
+        ]
+        verbose_name = _("work provision")
+        verbose_name_plural = _("work provisions")
+
+    def __str__(self):
+        return f"WorkProvision<{self.work_id}, {self.eid}>"
+
+    @classmethod
+    def as_toc(cls, provisions):
+        """ Build a tree of TOCElement objects from provisions in position order. Provisions whose parents aren't
+        included are left out.
+        """
+        toc = []
+        # the elements along the path to the current provision
+        path = []
+        for provision in provisions:
+            item = TOCElement(None, 'main', provision.type, heading=provision.heading, id_=provision.eid or None,
+                              num=provision.num, basic_unit=provision.basic_unit)
+            item.title = provision.title
+
+            if provision.depth == 0:
+                toc.append(item)
+            elif provision.depth <= len(path):
+                path[provision.depth - 1].children.append(item)
+            else:
+                continue
+
+            path[provision.depth:] = [item]
+
+        return toc
+
+
+@receiver(signals.post_save, sender=Document)
+@receiver(signals.post_delete, sender=Document)
+def invalidate_provisions_for_document(sender, instance, raw=False, **kwargs):
+    """ Documents set `_provisions_changed` when saved, if their table of contents, date, language or deleted
+    status changed.
+    """
+    if not raw and getattr(instance, '_provisions_changed', True):
+        WorkProvisionIndex.invalidate([instance.work_id])
+
+
+@receiver(signals.post_save, sender=Amendment)
+@receiver(signals.post_delete, sender=Amendment)
+def invalidate_provisions_for_amendment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        WorkProvisionIndex.invalidate([instance.amended_work_id])
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q, signals
+from django.dispatch import receiver
+from django.utils import translation
+from django.utils.translation import gettext_lazy as _
+
+from indigo_api.models.amendments import Amendment
+from indigo_api.models.works import Work, Commencement, ArbitraryExpressionDate, ChapterNumber
+from indigo_api.timeline import get_timeline
+
+
+class WorkTimeline(models.Model):
+    """ The serialized timeline of a work, both with all events (internal) and with only approved events (for
+    publication), so that it doesn't have to be recomputed each time it's used.
+
+    Timelines are deleted whenever something they depend on changes, and are rebuilt the next time they're needed.
+    Both happen while holding a lock on the work, so that a timeline built from older data can't overwrite an
+    invalidation that happened while it was being built.
+    Descriptions are translated, so timelines are stored in the default language only.
+    """
+    work = models.OneToOneField(Work, on_delete=models.CASCADE, primary_key=True, related_name='stored_timeline',
+                                verbose_name=_("work"))
+    language = models.CharField(_("language"), max_length=20)
+    timeline = models.JSONField(_("timeline"))
+    approved_timeline = models.JSONField(_("approved timeline"))
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("work timeline")
+        verbose_name_plural = _("work timelines")
+
+    def __str__(self):
+        return f"WorkTimeline<{self.work_id}>"
+
+    @classmethod
+    def stored_language(cls):
+        """ The language timelines are stored in: the default language, as activated for requests. For example,
+        requests activate 'en' when the default language is 'en-us' and only 'en' is supported.
+        """
+        return translation.get_supported_language_variant(settings.LANGUAGE_CODE)
+
+    @classmethod
+    def is_stored_language(cls, language):
+        """ Whether timelines in this language can be served from the stored timelines. """
+        if not language:
+            return False
+        try:
+            return translation.get_supported_language_variant(language) == cls.stored_language()
+        except LookupError:
+            return False
+
+    @classmethod
+    def for_work(cls, work):
+        """ Get the stored timeline for this work, building and storing it if necessary. """
+        language = cls.stored_language()
+        stored = cls.objects.filter(work=work, language=language).first()
+        if stored:
+            return stored
+
+        with transaction.atomic():
+            Work.objects.filter(pk=work.pk).lock()
+            # it may have been built while we waited for the lock
+            stored = cls.objects.filter(work=work, language=language).first()
+            if not stored:
+                with translation.override(language):
+                    stored, _ = cls.objects.update_or_create(work=work, defaults={
+                        'language': language,
+                        'timeline': [e.serialized() for e in get_timeline(work)],
+                        'approved_timeline': [e.serialized() for e in get_timeline(work, only_approved_events=True)],
+                    })
+        return stored
+
+    @classmethod
+    def invalidate(cls, work_ids):
+        work_ids = [w for w in work_ids if w]
+        if work_ids:
+            with transaction.atomic():
+                Work.objects.filter(pk__in=work_ids).lock()
+                cls.objects.filter(work_id__in=work_ids).delete()
+
+
+@receiver(signals.post_save, sender=Work)
+@receiver(signals.pre_delete, sender=Work)
+def invalidate_timelines_for_work(sender, instance, raw=False, **kwargs):
+    """ A work's timeline includes details of the works that amend, commence and repeal it, so changes to a work
+    change its own timeline and the timelines of the works it amends, commences and repeals.
+    """
+    if raw or kwargs.get('created'):
+        return
+    work_ids = [instance.pk]
+    # this also runs before a work is deleted, so that the works it repealed can still be found
+    work_ids.extend(
+        Work.objects
+        .filter(Q(amendments__amending_work=instance)
+                | Q(commencements__commencing_work=instance)
+                | Q(repealed_by=instance))
+        .values_list('pk', flat=True)
+        .distinct()
+    )
+    WorkTimeline.invalidate(work_ids)
+
+
+@receiver(signals.post_save, sender=Amendment)
+@receiver(signals.post_delete, sender=Amendment)
+def invalidate_timeline_for_amendment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        WorkTimeline.invalidate([instance.amended_work_id])
+
+
+@receiver(signals.post_save, sender=Commencement)
+@receiver(signals.post_delete, sender=Commencement)
+def invalidate_timeline_for_commencement(sender, instance, raw=False, **kwargs):
+    if not raw:
+        WorkTimeline.invalidate([instance.commenced_work_id])
+
+
+@receiver(signals.post_save, sender=ArbitraryExpressionDate)
+@receiver(signals.post_delete, sender=ArbitraryExpressionDate)
+@receiver(signals.post_save, sender=ChapterNumber)
+@receiver(signals.post_delete, sender=ChapterNumber)
+def invalidate_timeline_for_work_date(sender, instance, raw=False, **kwargs):
+    if not raw:
+        WorkTimeline.invalidate([instance.work_id])
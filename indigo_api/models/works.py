@@ -1,4 +1,3 @@
-from copy import deepcopy
 import logging
 
 from actstream import action
@@ -12,6 +11,7 @@ from django.contrib.auth.models import User
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.functional import cached_property
+from django.utils import translation
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 import reversion.revisions
@@ -22,6 +22,7 @@ import requests
 
 from indigo.plugins import plugins
 from indigo_api.models import Amendment
+from indigo_api.models.citations import CitationAlias
 from indigo_api.signals import work_approved, work_unapproved
 from indigo_api.timeline import TimelineCommencementEvent, describe_single_commencement, get_serialized_timeline, describe_repeal
 
@@ -36,6 +37,12 @@ class WorkQuerySet(models.QuerySet):
             raise ValueError(_("Work for FRBR URI '%(uri)s' doesn't exist") % {"uri": frbr_uri})
         return work
 
+    def lock(self):
+        """ Lock the rows of these works until the end of the current transaction, which must be atomic.
+        Rows are locked in id order, to avoid deadlocks.
+        """
+        return list(self.select_for_update(of=('self',)).order_by('pk').values_list('pk', flat=True))
+
 
 class WorkManager(models.Manager):
     use_for_related_fields = True
@@ -303,84 +310,17 @@ class WorkMixin(object):
         Each TOCElement object has a (potentially empty) list of `children`.
         If `date` is provided, only provisions in expressions up to and including that date are included.
 
-        This is a potentially expensive operation across multiple documents, and so intermediate and final
-        results are cached.
+        Provisions are built from all the work's expressions and stored, see WorkProvisionIndex.
         """
-        from indigo.analysis.toc.base import descend_toc_pre_order, remove_toc_elements
-
-        if getattr(self, '_provision_cache', None) is None:
-            # cache the provisions for the various documents because they are expensive to compute
-            self._provision_cache = {}
-            # cache selected details of the documents we use to build up provisions, in ascending expression date order
-            self._docs_for_provisions = list(
-                self.expressions()
-                    .values('id', 'language_id', 'expression_date')
-                    .order_by('expression_date')
-                    .all())
-
-        if date:
-            documents = [d for d in self._docs_for_provisions if d['expression_date'] <= date]
-            if not documents:
-                # get the earliest available expression when historical points in time don't exist
-                # give it in a list so that it can be sorted below, but not if it's None
-                documents = self._docs_for_provisions[:1]
-        else:
-            # use all expressions
-            documents = self._docs_for_provisions
-
-        # ids of documents we need to generate TOCs for
-        to_load = [d['id'] for d in documents if d['id'] not in self._provision_cache]
-        tocs = {}
-        if to_load:
-            docs_for_toc = self.expressions().defer(None).filter(pk__in=to_load) \
-                .select_related('work', 'work__locality', 'work__country', 'work__country__country')
-            for doc in docs_for_toc:
-                toc = doc.table_of_contents()
-                for p in descend_toc_pre_order(toc):
-                    p.element = None
-                # explicitly exclude definitions from commenceable provisions
-                toc = remove_toc_elements(toc, elements=['definition'])
-                tocs[doc.id] = toc
-
-        # within the existing ascending expression date order, sort expressions so that we consider
-        # primary language documents first
-        documents = sorted(documents, key=lambda d: 0 if d['language_id'] == self.country.primary_language_id else 1)
-
-        # return a list of all provisions to date
-        cumulative_provisions = []
-
-        # get a TOC plugin that can be shared across all these documents
-        locality = self.locality.code if self.locality else None
-        plugin = plugins.for_locale('toc', country=self.country.code, locality=locality, language=self.country.primary_language.code)
-
-        if plugin:
-            for i, doc in enumerate(documents):
-                # don't do any work if we've already cached the provisions for this doc
-                try:
-                    cumulative_provisions, cumulative_id_set = self._provision_cache[doc['id']]
-                except KeyError:
-                    # get the previous document's provisions and id set to build on
-                    previous_id = documents[i - 1]['id'] if i > 0 else None
-                    cumulative_provisions, cumulative_id_set = self._provision_cache.get(previous_id, ([], set()))
-                    # copy these because we'll change them
-                    cumulative_provisions = deepcopy(cumulative_provisions)
-                    cumulative_id_set = cumulative_id_set.copy()
-
-                    # update them based on the current toc
-                    plugin.insert_commenceable_provisions(tocs[doc['id']], cumulative_provisions, cumulative_id_set)
-
-                    # update the cache; provisions and id_set were updated in place
-                    self._provision_cache[doc['id']] = (cumulative_provisions, cumulative_id_set)
-
-        # this'll be the last document's cumulative_provisions, or []
-        return cumulative_provisions
+        from .provisions import WorkProvision, WorkProvisionIndex
+        return WorkProvision.as_toc(WorkProvisionIndex.for_work(self).provisions(date))
 
     def all_uncommenced_provision_ids(self, date=None, return_bool=False):
         """ Returns a (potentially empty) list of the ids of TOCElement objects that haven't yet commenced.
             If `date` is provided, only provisions in expressions up to and including that date are included.
             If `return_bool` is True, returns a boolean instead.
         """
-        from indigo.analysis.toc.base import descend_toc_pre_order
+        from .provisions import WorkProvisionIndex
 
         commencements = self.commencements.all()
         # common case: one commencement that covers all provisions
@@ -390,14 +330,11 @@ class WorkMixin(object):
         # commencement.provisions are lists of provision ids
         commenced = [p for c in commencements for p in c.provisions]
 
-        uncommenced = []
-        for p in descend_toc_pre_order(self.all_commenceable_provisions(date=date)):
-            if p.id not in commenced:
-                if return_bool:
-                    return True
-                uncommenced.append(p.id)
+        uncommenced = WorkProvisionIndex.for_work(self).provisions(date).exclude(eid__in=commenced)
+        if return_bool:
+            return uncommenced.exists()
 
-        return False if return_bool else uncommenced
+        return [eid or None for eid in uncommenced.values_list('eid', flat=True)]
 
     @property
     def commencements_count(self):
@@ -462,8 +399,15 @@ class WorkMixin(object):
     def repeal_description_external(self):
         return self.repeal_description(friendly_date=True)
 
-    def get_serialized_timeline(self):
-        return get_serialized_timeline(self)
+    def get_serialized_timeline(self, only_approved_events=True):
+        """ The serialized timeline, using the stored timeline if possible. Stored timelines are in the default
+        language, so timelines in other languages are computed each time.
+        """
+        from indigo_api.models import WorkTimeline
+        if self.pk and WorkTimeline.is_stored_language(translation.get_language()):
+            stored = WorkTimeline.for_work(self)
+            return stored.approved_timeline if only_approved_events else stored.timeline
+        return get_serialized_timeline(self, only_approved_events)
 
 
 class Work(WorkMixin, models.Model):
@@ -621,6 +565,29 @@ class Work(WorkMixin, models.Model):
 
         self.frbr_uri = f'{prefix}/{rest}'.lower()
 
+    # fields that aren't included in published expressions of the work
+    UNPUBLISHED_FIELDS = ('created_at', 'updated_at', 'created_by_user', 'updated_by_user')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keep track of the details as loaded, so that we know if published expressions change when saving
+        instance._loaded_published_values = instance.published_values()
+        return instance
+
+    def published_values(self):
+        """ The values of the fields that published expressions of this work include.
+        """
+        return {
+            f.attname: self.__dict__.get(f.attname)
+            for f in self._meta.concrete_fields
+            if f.name not in self.UNPUBLISHED_FIELDS
+        }
+
+    def published_fields_changed(self):
+        loaded = getattr(self, '_loaded_published_values', None)
+        return loaded is None or loaded != self.published_values()
+
     def save(self, *args, **kwargs):
         # prevent circular references
         if self.parent_work == self:
@@ -636,7 +603,9 @@ class Work(WorkMixin, models.Model):
             self.repealed_verb = self.REPEALED
 
         self.set_frbr_uri_fields()
-        return super(Work, self).save(*args, **kwargs)
+        result = super(Work, self).save(*args, **kwargs)
+        self._loaded_published_values = self.published_values()
+        return result
 
     def set_frbr_uri_fields(self):
         # extract FRBR URI fields
@@ -1108,6 +1077,13 @@ class WorkAlias(models.Model):
         return self.alias
 
 
+@receiver([signals.post_save, signals.post_delete], sender=Work)
+@receiver([signals.post_save, signals.post_delete], sender=WorkAlias)
+def invalidate_citations_cache_for_work(sender, instance, **kwargs):
+    # works and their aliases are used by the citation matchers
+    CitationAlias.invalidate_citations_cache()
+
+
 class ChapterNumber(models.Model):
     number = models.CharField(_("number"), max_length=32, null=True, blank=True, help_text=_("The Chapter number"))
     name = models.CharField(_("name"), max_length=64, null=False, blank=True, default="chapter", help_text=_("Specify if it should be anything other than 'chapter' (the default)"))
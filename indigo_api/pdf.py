@@ -1,7 +1,12 @@
+import atexit
 import logging
 import os.path
 import re
+import shlex
 import subprocess
+import tempfile
+import threading
+import time
 
 from django.conf import settings
 
@@ -12,12 +17,17 @@ FOP_CONFIG = settings.FOP_CONFIG or os.path.join(os.path.dirname(__file__), 'fop
 FOP_FONT_PATH = settings.FOP_FONT_PATH or os.path.join(os.path.dirname(__file__), 'fonts')
 
 
-def get_fop_config(dirname):
+def get_fop_config(dirname=None):
     """ Get the full path to the default fop config file, indigo_api/fop.xconf.
         Edit the file by replacing __FONT_PATH__ with the full path to the fonts folder.
         The fonts folder can be given in settings, or the default indigo_api/fonts will be used.
         Places the edited file in the given directory and returns the full filename.
+
+        If no directory is given, the edited file is written once per process and re-used.
     """
+    if dirname is None:
+        return fop_pool.config_file
+
     with open(FOP_CONFIG, 'r') as f:
         text = re.sub('__FONT_PATH__', FOP_FONT_PATH, f.read())
 
@@ -28,6 +38,192 @@ def get_fop_config(dirname):
     return fname
 
 
+class FopQueueTimeout(Exception):
+    """ Raised when a FOP job waits too long for a free slot. """
+    pass
+
+
+class FopServer:
+    """ A long-lived FOP server process, such as a Nailgun server with FOP on its classpath, that is started and
+    supervised by this process. The server is started on first use with `start_cmd`, and is considered healthy
+    if `check_cmd` (which asks the server for FOP's version) succeeds within `startup_timeout` seconds.
+
+    Several processes on a host may share one server: if another process has already started it, this process's
+    own server exits (because it can't listen on the same port) but the health check passes. If a job finds that
+    the server has failed, it's checked again before the next job, and restarted if it's not healthy. A server
+    that can't be started isn't tried again for `retry_interval` seconds.
+    """
+    def __init__(self, start_cmd, check_cmd, startup_timeout=30, retry_interval=60):
+        self.start_cmd = shlex.split(start_cmd)
+        self.check_cmd = check_cmd
+        self.startup_timeout = startup_timeout
+        self.retry_interval = retry_interval
+        self.process = None
+        self.healthy = False
+        self.retry_at = 0
+        self.lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def ensure_running(self):
+        """ Ensure that the server is running, starting it if necessary. Returns True if it's healthy. """
+        if self.healthy:
+            return True
+
+        with self.lock:
+            if self.healthy or time.monotonic() < self.retry_at:
+                return self.healthy
+
+            if not self.check():
+                if self.process is None or self.process.poll() is not None:
+                    self.start()
+                self.healthy = self.wait_until_healthy()
+            else:
+                self.healthy = True
+
+            if not self.healthy:
+                log.warning(f"FOP server isn't healthy, retrying in {self.retry_interval} seconds")
+                self.retry_at = time.monotonic() + self.retry_interval
+            return self.healthy
+
+    def failed(self):
+        """ Record that a job found the server to have failed, so that it's checked before the next job. """
+        self.healthy = False
+
+    def start(self):
+        log.info(f"Starting FOP server: {self.start_cmd}")
+        try:
+            self.process = subprocess.Popen(self.start_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL)
+        except OSError as e:
+            log.error(f"Error starting FOP server: {e}", exc_info=e)
+            self.process = None
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            log.info("Stopping FOP server")
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+        self.healthy = False
+
+    def wait_until_healthy(self):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.check():
+                return True
+            if self.process is not None and self.process.poll() is not None:
+                # it exited, so the server isn't coming up unless another process started it
+                self.process = None
+            time.sleep(1)
+        return False
+
+    def check(self):
+        """ Whether the server responds to a request for FOP's version. """
+        try:
+            subprocess.run(self.check_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, check=True, timeout=5)
+            return True
+        except (OSError, subprocess.SubprocessError):
+            return False
+
+
+class FopPool:
+    """ Runs Apache FOP jobs, with at most `size` FOP jobs running at once. Further jobs wait for a free slot
+    for up to `queue_timeout` seconds, and each job may take up to `timeout` seconds.
+
+    If `server_cmd` is set, jobs are passed to that command instead of `FOP_CMD`. This allows FOP to be run
+    in a long-lived, pre-warmed JVM (such as a Nailgun server, with `ng org.apache.fop.cli.Main`) so that
+    JVM start-up and font loading aren't paid for each PDF. The command takes the same arguments as the FOP
+    command line. If `server_start_cmd` is also set, the server is started and supervised by this process (see
+    FopServer), otherwise it must be run separately. If the server itself fails (such as when it can't be reached),
+    the job is retried with a fresh FOP process. Errors that FOP reports about the document itself are not retried.
+    """
+    # FOP reports problems with the document like this; a fresh FOP process would fail in the same way
+    FOP_ERROR_RE = re.compile(r'^SEVERE: ', re.MULTILINE)
+
+    def __init__(self, size, timeout=None, queue_timeout=None, server_cmd=None, server_start_cmd=None,
+                 server_startup_timeout=30):
+        self.size = size
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.server_cmd = shlex.split(server_cmd) if server_cmd else None
+        self.server = None
+        if self.server_cmd and server_start_cmd:
+            self.server = FopServer(server_start_cmd, self.server_cmd + ['-version'],
+                                    startup_timeout=server_startup_timeout)
+        self.slots = threading.BoundedSemaphore(size)
+        self._config_dir = None
+        self._config_file = None
+        self._config_lock = threading.Lock()
+
+    @property
+    def config_file(self):
+        """ The fop config file for this process, written on first use to a temporary directory that is removed
+        when the process exits.
+        """
+        if self._config_file is None or not os.path.exists(self._config_file):
+            with self._config_lock:
+                if self._config_file is None or not os.path.exists(self._config_file):
+                    if self._config_dir is not None:
+                        self._config_dir.cleanup()
+                    self._config_dir = tempfile.TemporaryDirectory(prefix='indigo-fop-', ignore_cleanup_errors=True)
+                    self._config_file = get_fop_config(self._config_dir.name)
+        return self._config_file
+
+    def run(self, args, cwd):
+        """ Run FOP with the given arguments (excluding the command itself) in the working directory.
+        Returns the output from FOP.
+        """
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            raise FopQueueTimeout("Timed out waiting to run fop")
+
+        try:
+            if self.server_cmd and (self.server is None or self.server.ensure_running()):
+                try:
+                    return self.run_cmd(self.server_cmd + args, cwd)
+                except subprocess.TimeoutExpired:
+                    # a fresh process is unlikely to do any better
+                    raise
+                except (OSError, subprocess.SubprocessError) as e:
+                    if not self.is_server_failure(e):
+                        raise
+                    if self.server:
+                        self.server.failed()
+                    log.warning(f"Error calling fop server, falling back to running fop directly: {e}", exc_info=e)
+
+            return self.run_cmd([FOP_CMD] + args, cwd)
+        finally:
+            self.slots.release()
+
+    def is_server_failure(self, error):
+        """ Whether an error from the server command is a failure of the server itself, rather than FOP failing
+        to render the document.
+        """
+        if isinstance(error, subprocess.CalledProcessError):
+            return not self.FOP_ERROR_RE.search(error.output or '')
+        return True
+
+    def run_cmd(self, args, cwd):
+        log.info(f"Running command in {cwd}: {args}")
+        result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True, cwd=cwd,
+                                encoding='utf-8', errors='backslashreplace', timeout=self.timeout)
+        log.debug(f"Output from fop: {result.stdout}")
+        return result.stdout
+
+
+fop_pool = FopPool(
+    settings.FOP_POOL_SIZE,
+    timeout=settings.FOP_TIMEOUT,
+    queue_timeout=settings.FOP_QUEUE_TIMEOUT,
+    server_cmd=settings.FOP_SERVER_CMD,
+    server_start_cmd=settings.FOP_SERVER_START_CMD,
+    server_startup_timeout=settings.FOP_SERVER_STARTUP_TIMEOUT,
+)
+
+
 def run_fop(outf_name, cwd, xml=None, xsl_fo=None, xml_fo=None, output_fo=False):
     """ Run Apache FOP to generate a PDF.
 
@@ -38,8 +234,7 @@ def run_fop(outf_name, cwd, xml=None, xsl_fo=None, xml_fo=None, output_fo=False)
     :param xml_fo: filename of XML-FO file (do not use with xml and xsl_fo)
     :param output_fo: should the output be the FO XML?
     """
-    args = [FOP_CMD]
-    fop_config_file = get_fop_config(cwd)
+    args = []
 
     if output_fo:
         # output XML FO, rather than pdf
@@ -47,7 +242,7 @@ def run_fop(outf_name, cwd, xml=None, xsl_fo=None, xml_fo=None, output_fo=False)
     else:
         args.extend(['-pdf', outf_name])
 
-    args.extend(['-c', fop_config_file])
+    args.extend(['-c', get_fop_config()])
 
     if xml_fo:
         # xml fo, no stylesheet
@@ -56,12 +251,11 @@ def run_fop(outf_name, cwd, xml=None, xsl_fo=None, xml_fo=None, output_fo=False)
         # xml and matching xsl to convert to fo
         args.extend(['-xsl', xsl_fo, '-xml', xml])
 
-    log.info(f"Running command in {cwd}: {args}")
-
     try:
-        result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True, cwd=cwd,
-                                encoding='utf-8', errors='backslashreplace')
-        log.debug(f"Output from fop: {result.stdout}")
+        fop_pool.run(args, cwd)
+    except subprocess.TimeoutExpired as e:
+        log.error(f"Timed out calling fop after {e.timeout} seconds", exc_info=e)
+        raise Exception("Timed out calling fop") from e
     except subprocess.CalledProcessError as e:
         log.error(f"Error calling fop. Output: \n{e.output}", exc_info=e)
         # try to get a decent exception message from the FOP output
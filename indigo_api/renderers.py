@@ -1,16 +1,16 @@
+import io
 import lxml.etree as ET
-import tempfile
 import re
 import zipfile
 import logging
 
-from django.core.cache import caches
 from django.conf import settings
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
 from rest_framework.renderers import BaseRenderer, StaticHTMLRenderer
 from rest_framework_xml.renderers import XMLRenderer
 
 from indigo.plugins import plugins
+from indigo_api.artefacts import artefact_cache, document_artefacts
 from indigo_api.exporters import HTMLExporter, PDFExporter, EPUBExporter
 from .serializers import NoopSerializer
 
@@ -30,6 +30,19 @@ def resolver_url(request, resolver):
     return settings.RESOLVER_URL
 
 
+def is_whole_document(view):
+    """ Is the view rendering a whole document, rather than a component or portion?
+    """
+    return not hasattr(view, 'component') or (view.component == 'main' and not view.portion)
+
+
+def is_default_params(request, defaults):
+    """ Does the request use only the default values for these rendering params (a dict from param to default
+    value)? If so, a pre-rendered artefact can be used.
+    """
+    return all(request.GET.get(p, default) == default for p, default in defaults.items())
+
+
 class ExporterMixin:
     """ Mixin for Indigo response renderers to make subclassing simpler.
     """
@@ -93,10 +106,19 @@ class HTMLRenderer(StaticHTMLRenderer, ExporterMixin):
             return super(HTMLRenderer, self).render(document, media_type, renderer_context)
 
         view = renderer_context['view']
+        request = renderer_context['request']
+
+        if request.GET.get('standalone') == '1' and is_whole_document(view) \
+                and is_default_params(request, {'resolver': '', 'media-url': '', 'coverpage': '1'}):
+            name = 'html-akn' if getattr(request, 'version', None) == 'v2' else 'html'
+            html = document_artefacts.get(document, name)
+            if html:
+                return html
+
         exporter = self.get_exporter()
 
-        if not hasattr(view, 'component') or (view.component == 'main' and not view.portion):
-            exporter.coverpage = renderer_context['request'].GET.get('coverpage', '1') == '1'
+        if is_whole_document(view):
+            exporter.coverpage = request.GET.get('coverpage', '1') == '1'
             return exporter.render(document)
 
         exporter.coverpage = renderer_context['request'].GET.get('coverpage') == '1'
@@ -131,7 +153,7 @@ class PDFRenderer(BaseRenderer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.cache = caches['default']
+        self.cache = artefact_cache
 
     def render(self, data, media_type=None, renderer_context=None):
         self.renderer_context = renderer_context
@@ -155,10 +177,17 @@ class PDFRenderer(BaseRenderer):
         filename = self.get_filename(data, view)
         renderer_context['response']['Content-Disposition'] = 'inline; filename=%s' % filename
         request = renderer_context['request']
+
+        # use the pre-rendered artefact, if any
+        if is_whole_document(view) and self.is_default_params(request):
+            pdf = document_artefacts.get(data, self.format)
+            if pdf:
+                return pdf
+
         exporter = self.get_exporter()
         exporter.resolver = resolver_url(request, request.GET.get('resolver'))
 
-        if not hasattr(view, 'component') or (view.component == 'main' and not view.portion):
+        if is_whole_document(view):
             # whole document
             pdf = exporter.render(data)
         else:
@@ -201,6 +230,9 @@ class PDFRenderer(BaseRenderer):
     def get_filename(self, data, view):
         return generate_filename(data, view, self.format)
 
+    def is_default_params(self, request):
+        return is_default_params(request, {p: '' for p in self.cache_key_params})
+
 
 class EPUBRenderer(ExporterMixin, PDFRenderer):
     """ Django Rest Framework ePub Renderer.
@@ -227,6 +259,12 @@ class EPUBRenderer(ExporterMixin, PDFRenderer):
         exporter = self.get_exporter()
         exporter.resolver = resolver_url(request, request.GET.get('resolver'))
 
+        # use the pre-rendered artefact, if any
+        if not isinstance(data, list) and is_whole_document(view) and self.is_default_params(request):
+            epub = document_artefacts.get(data, self.format)
+            if epub:
+                return epub
+
         # check the cache
         key = self.cache_key(data, view)
         if key:
@@ -240,7 +278,7 @@ class EPUBRenderer(ExporterMixin, PDFRenderer):
             if not data:
                 raise Http404()
             epub = exporter.render_many(data)
-        elif not hasattr(view, 'component') or (view.component == 'main' and not view.portion):
+        elif is_whole_document(view):
             # whole document
             epub = exporter.render(data)
         else:
@@ -255,11 +293,40 @@ class EPUBRenderer(ExporterMixin, PDFRenderer):
         return epub
 
 
+class ZipStream(io.RawIOBase):
+    """ A write-only, unseekable file for zipfile to write to, which holds what has been written until it is
+    collected with pop().
+    """
+    def __init__(self):
+        super().__init__()
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.buffer.extend(b)
+        self.position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.position
+
+    def pop(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
 class ZIPRenderer(BaseRenderer):
     """ Django Rest Framework zipfile renderer.
 
     Generates a zip file containing the primary document as main.xml, an all attachments
     inside a media folder.
+
+    The zip file is built on the fly, a chunk at a time, so that memory use doesn't grow with the size of
+    the archive. Use streaming_response() to stream it to the client.
     """
     media_type = 'application/zip'
     format = 'zip'
@@ -267,6 +334,7 @@ class ZIPRenderer(BaseRenderer):
     # these are used by the document download menu
     icon = 'far fa-file-archive'
     title = 'ZIP Archive'
+    chunk_size = 64 * 1024
 
     def render(self, data, media_type=None, renderer_context=None):
         self.renderer_context = renderer_context
@@ -278,23 +346,57 @@ class ZIPRenderer(BaseRenderer):
         filename = generate_filename(data, view, self.format)
         renderer_context['response']['Content-Disposition'] = 'attachment; filename=%s' % filename
 
-        with tempfile.NamedTemporaryFile(suffix='.zip') as f:
-            self.build_zipfile(data, f.name)
-            return f.read()
+        return b''.join(self.stream(data))
+
+    def streaming_response(self, data, view):
+        """ A streaming HTTP response with the zip file for the data.
+        """
+        response = StreamingHttpResponse(self.stream(data), content_type=self.media_type)
+        response['Content-Disposition'] = 'attachment; filename=%s' % generate_filename(data, view, self.format)
+        return response
 
-    def build_zipfile(self, data, fname):
+    def stream(self, data):
+        """ Generate the zip file in chunks.
+        """
         # one or many documents?
         many = isinstance(data, list)
         if not many:
             data = [data]
 
-        with zipfile.ZipFile(fname, 'w', zipfile.ZIP_DEFLATED) as zf:
+        output = ZipStream()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
             for document in data:
                 # if storing many, prefix them
                 prefix = (generate_filename(document, None) + '/') if many else ''
-                zf.writestr(prefix + "main.xml", document.document_xml.encode('utf-8'))
-                self.add_attachments(document, zf, prefix)
+                yield from self.write_file(zf, output, prefix + "main.xml", self.xml_chunks(document))
+                yield from self.add_attachments(document, zf, output, prefix)
+
+        # the central directory
+        yield output.pop()
+
+    def write_file(self, zf, output, name, chunks):
+        with zf.open(name, 'w', force_zip64=True) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                data = output.pop()
+                if data:
+                    yield data
+
+        yield output.pop()
+
+    def xml_chunks(self, document):
+        if 'document_xml' in document.__dict__ or document.pk is None:
+            xml = document.document_xml
+        else:
+            # load the XML without keeping it on the document, so that only one document's XML is held at a time
+            xml = type(document).objects.filter(pk=document.pk).values_list('document_xml', flat=True).first()
+        xml = xml or ''
+
+        for i in range(0, len(xml), self.chunk_size):
+            yield xml[i:i + self.chunk_size].encode('utf-8')
 
-    def add_attachments(self, document, zf, prefix):
+    def add_attachments(self, document, zf, output, prefix):
         for attachment in document.attachments.all():
-            zf.writestr(prefix + "media/" + attachment.filename, attachment.file.read())
+            with attachment.file.open('rb') as f:
+                yield from self.write_file(zf, output, prefix + "media/" + attachment.filename,
+                                           f.chunks(self.chunk_size))
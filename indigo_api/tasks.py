@@ -15,7 +15,7 @@ from background_task.models import Task
 from django.db.utils import OperationalError
 from django.dispatch import receiver
 
-from indigo_api.models import Document, DocumentActivity
+from indigo_api.models import Document, DocumentActivity, LinkReferencesJob, EPUBBundleJob
 from indigo_app.logging import log_context, clear_log_context
 
 # get specific task logger
@@ -127,6 +127,60 @@ def prune_document_activity():
         raise e
 
 
+@background(queue="indigo")
+def link_references(job_id):
+    """ Link references for the next chunk of documents in a LinkReferencesJob, and queue the task again
+    if there are more chunks to process. Several of these tasks may run for a job at once, see LinkReferencesJob.
+
+    If the only chunks left are claimed by other tasks, the task is queued again for when those claims go stale,
+    so that the job is finished even if those tasks die.
+    """
+    job = LinkReferencesJob.objects.filter(pk=job_id).first()
+    if not job:
+        log.warning(f"LinkReferencesJob {job_id} no longer exists")
+        return
+
+    try:
+        delay = job.run_chunk()
+    except Exception as e:
+        log.error(f"Error linking references for job {job_id}: {e}", exc_info=e)
+        job.fail(str(e))
+        raise e
+
+    if delay is not None:
+        link_references(job_id, schedule=delay)
+
+
+@background(queue="indigo", remove_existing_tasks=True)
+def render_document_artefacts(document_id):
+    """ Pre-render the PDF, ePUB and HTML artefacts for a published document.
+    """
+    from indigo_api.artefacts import document_artefacts
+
+    try:
+        document_artefacts.render_all(document_id)
+    except Exception as e:
+        log.error(f"Error rendering artefacts for document {document_id}: {e}", exc_info=e)
+        raise e
+
+
+@background(queue="indigo")
+def render_epub_bundle(job_id):
+    """ Render the ePUB for an EPUBBundleJob and save it to storage.
+    """
+    job = EPUBBundleJob.objects.filter(pk=job_id).first()
+    if not job:
+        log.warning(f"EPUBBundleJob {job_id} no longer exists")
+        return
+
+    try:
+        job.run()
+    except Exception as e:
+        log.error(f"Error rendering ePUB bundle for job {job_id}: {e}", exc_info=e)
+        job.fail(str(e))
+        raise e
+
+
 def setup_pruning():
     # schedule task to run in 12 hours time, and repeat daily
     prune_deleted_documents(schedule=timedelta(hours=11), repeat=Task.DAILY)
@@ -0,0 +1,98 @@
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+
+from indigo_api.artefacts import DocumentArtefacts, ArtefactCache, LocalArtefactCache, SharedArtefactCache
+from indigo_api.models import Document
+
+
+class DocumentArtefactsTestCase(TestCase):
+    fixtures = ['languages_data', 'countries', 'user', 'taxonomy_topics', 'work', 'published', 'drafts']
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.artefacts = DocumentArtefacts(storage=FileSystemStorage(location=self.tmpdir.name))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_and_put(self):
+        doc = Document.objects.undeleted().published().first()
+        self.assertIsNone(self.artefacts.get(doc, 'html'))
+
+        self.artefacts.put(doc, 'html', '<div>hello</div>')
+        self.assertEqual(b'<div>hello</div>', self.artefacts.get(doc, 'html'))
+
+        # a new version of the document doesn't use the old artefact
+        doc.title = doc.title + ' (changed)'
+        doc.save()
+        self.assertIsNone(self.artefacts.get(doc, 'html'))
+
+    def test_drafts_ignored(self):
+        doc = Document.objects.undeleted().filter(draft=True).first()
+        self.artefacts.put(doc, 'html', '<div>hello</div>')
+        self.assertIsNone(self.artefacts.get(doc, 'html'))
+
+    def test_render_all_deletes_stale(self):
+        doc = Document.objects.undeleted().published().first()
+        self.artefacts.names = ['html']
+        self.artefacts.put(doc, 'html', 'old')
+        old_path = self.artefacts.path(doc, 'html')
+
+        doc.title = doc.title + ' (changed)'
+        doc.save()
+        self.artefacts.render_all(doc.pk)
+
+        doc.refresh_from_db()
+        self.assertIn(b'<div', self.artefacts.get(doc, 'html'))
+        self.assertFalse(self.artefacts.storage.exists(old_path))
+
+
+class ArtefactCacheTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.local = LocalArtefactCache(os.path.join(self.tmpdir.name, 'local'), 100)
+        self.shared = SharedArtefactCache(storage=FileSystemStorage(location=os.path.join(self.tmpdir.name, 'shared')))
+        self.cache = ArtefactCache(self.local, self.shared)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get('pdf:1'))
+        self.cache.set('pdf:1', b'content')
+        self.assertEqual(b'content', self.cache.get('pdf:1'))
+
+        self.assertEqual({
+            'local_hits': 1,
+            'shared_hits': 0,
+            'misses': 1,
+            'hit_ratio': 0.5,
+            'bytes_served': 7,
+        }, self.cache.stats())
+
+    def test_shared_hits_copied_locally(self):
+        key = self.cache.hash_key('pdf:1')
+        self.shared.set(key, b'content')
+        self.assertIsNone(self.local.get(key))
+
+        self.assertEqual(b'content', self.cache.get('pdf:1'))
+        self.assertEqual(b'content', self.local.get(key))
+        self.assertEqual(1, self.cache.shared_hits)
+
+    def test_local_evicts_least_recently_used(self):
+        self.local.set('aa1', b'x' * 40)
+        self.local.set('aa2', b'x' * 40)
+        # make aa1 the least recently used
+        os.utime(self.local.path('aa1'), (0, 0))
+
+        self.local.set('aa3', b'x' * 40)
+        self.assertIsNone(self.local.get('aa1'))
+        self.assertIsNotNone(self.local.get('aa2'))
+        self.assertIsNotNone(self.local.get('aa3'))
+
+        # too big to cache
+        self.local.set('aa4', b'x' * 200)
+        self.assertIsNone(self.local.get('aa4'))
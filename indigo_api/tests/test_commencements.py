@@ -2,7 +2,7 @@ import datetime
 
 from django.test import TestCase
 
-from indigo_api.models import Work, Document
+from indigo_api.models import Work, Document, WorkProvisionIndex
 
 
 class CommencementsTestCase(TestCase):
@@ -77,3 +77,19 @@ class CommencementsTestCase(TestCase):
 
         self.assertEqual(commencements_at_publication, [4, 5, 7])
         self.assertEqual(commencements_at_later_expression_date, [4, 5, 6, 7])
+
+    def test_provision_index(self):
+        index = WorkProvisionIndex.for_work(self.work)
+        seen = {p.eid: (p.first_seen, p.last_seen) for p in index.provisions()}
+        self.assertEqual((datetime.date(2020, 1, 1), datetime.date(2022, 1, 1)), seen['sec_1'])
+        self.assertEqual((datetime.date(2020, 1, 1), datetime.date(2020, 1, 1)), seen['sec_2'])
+        self.assertEqual((datetime.date(2022, 1, 1), datetime.date(2022, 1, 1)), seen['sec_5'])
+
+        # changing an expression's provisions rebuilds the index
+        document = Document.objects.get(pk=22)
+        document.document_xml = document.document_xml.replace('sec_7', 'sec_8')
+        document.save()
+        self.assertFalse(WorkProvisionIndex.objects.filter(work=self.work).exists())
+        self.assertEqual(['sec_1', 'sec_2', 'sec_3', 'sec_4', 'sec_5', 'sec_6', 'sec_8'],
+                         [p.id for p in self.work.all_commenceable_provisions()])
+        self.assertEqual(['sec_4', 'sec_6', 'sec_8'], self.work.all_uncommenced_provision_ids())
@@ -1,7 +1,10 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from datetime import date, datetime
 
 from indigo_api.models import Document, Work, Amendment, Language, Country, User, ArbitraryExpressionDate
+from indigo_api.models.documents import parsed_document_cache
 from indigo_api.tests.fixtures import *  # noqa
 
 
@@ -194,3 +197,94 @@ class DocumentTestCase(TestCase):
         doc.content = DOCUMENT_FIXTURE % """<section eId="sec_1"><num>1</num><content><p>test</p></content></section>"""
         self.assertEqual("sec_1", doc.get_portion_eid_by_reference("section 1"))
         self.assertIsNone(doc.get_portion_eid_by_reference("section 22"))
+
+    def test_parsed_document_cache(self):
+        parsed_document_cache.clear()
+        doc = Document.objects.get(pk=1)
+        self.assertIsNotNone(doc.doc)
+        self.assertEqual(0, parsed_document_cache.hits)
+        self.assertEqual(1, parsed_document_cache.misses)
+
+        # changes to a cached document don't change the cache
+        doc.doc.title = 'Changed'
+        doc2 = Document.objects.get(pk=1)
+        self.assertNotEqual('Changed', doc2.doc.title)
+        self.assertEqual(1, parsed_document_cache.hits)
+
+        # saving changes the key
+        doc2.title = 'New title'
+        doc2.save()
+        doc3 = Document.objects.get(pk=1)
+        self.assertEqual('New title', doc3.doc.title)
+        self.assertEqual(2, parsed_document_cache.misses)
+
+        # changing the xml directly bypasses the cache
+        doc4 = Document.objects.get(pk=1)
+        doc4.document_xml = doc4.document_xml.replace('New title', 'Other title')
+        self.assertEqual('Other title', doc4.doc.title)
+        self.assertEqual(3, parsed_document_cache.misses)
+
+    def test_stored_toc(self):
+        doc = Document.objects.get(pk=1)
+        doc.content = DOCUMENT_FIXTURE % """<section eId="sec_1"><num>1</num><heading>First</heading><content><p>test</p></content></section>"""
+        doc.save()
+
+        doc = Document.objects.get(pk=1)
+        self.assertEqual(['sec_1'], [t['id'] for t in doc.toc_json])
+        self.assertEqual('1 First', doc.toc_json[0]['title'])
+        self.assertEqual(doc.toc_json, doc.table_of_contents_json())
+
+        # changing the XML refreshes the TOC
+        doc.content = DOCUMENT_FIXTURE % """<section eId="sec_2"><num>2</num><heading>Second</heading><content><p>test</p></content></section>"""
+        doc.save()
+        doc = Document.objects.get(pk=1)
+        self.assertEqual(['sec_2'], [t['id'] for t in doc.table_of_contents_json()])
+
+        # saving only the XML also saves the TOC
+        doc.content = DOCUMENT_FIXTURE % """<section eId="sec_3"><num>3</num><heading>Third</heading><content><p>test</p></content></section>"""
+        doc.save(update_fields=['document_xml'])
+        doc = Document.objects.get(pk=1)
+        self.assertEqual(['sec_3'], [t['id'] for t in doc.toc_json])
+
+    def test_save_without_xml(self):
+        doc = Document.objects.get(pk=1)
+        # the first saves update the XML's manifestation date
+        doc.save()
+        doc.save()
+
+        # a document loaded without its XML, whose XML doesn't change, doesn't refresh its TOC
+        doc = Document.objects.no_xml().get(pk=1)
+        self.assertFalse(doc.xml_changed())
+        with patch.object(Document, 'refresh_toc') as refresh_toc:
+            doc.save()
+        refresh_toc.assert_not_called()
+
+    def test_get_element_by_eid(self):
+        doc = Document(work=self.work, language=self.eng)
+        doc.content = DOCUMENT_FIXTURE % """
+<section eId="sec_1"><num>1</num><content><p>one</p></content></section>
+<section eId="sec_2"><num>2</num><content><p>two</p></content></section>
+"""
+        self.assertEqual('2', doc.get_element_by_eid('sec_2').num.text)
+        self.assertIsNone(doc.get_element_by_eid('sec_3'))
+        self.assertEqual('sec_1', doc.get_portion_element('sec_1').get('eId'))
+
+        # stale entries are detected
+        sec_2 = doc.get_element_by_eid('sec_2')
+        sec_2.getparent().remove(sec_2)
+        self.assertIsNone(doc.get_element_by_eid('sec_2'))
+        doc.get_element_by_eid('sec_1').set('eId', 'sec_x')
+        self.assertIsNone(doc.get_element_by_eid('sec_1'))
+        self.assertEqual('1', doc.get_element_by_eid('sec_x').num.text)
+
+    def test_get_subcomponent(self):
+        doc = Document(work=self.work, language=self.eng)
+        doc.content = DOCUMENT_FIXTURE % """
+<chapter eId="chp_2"><num>2</num><heading>Two</heading>
+  <section eId="chp_2__sec_13A"><num>13A.</num><content><p>thirteen A</p></content></section>
+</chapter>
+"""
+        self.assertEqual('chp_2', doc.get_subcomponent('main', 'chapter/2').get('eId'))
+        self.assertEqual('chp_2__sec_13A', doc.get_subcomponent('main', 'section/13A').get('eId'))
+        self.assertIsNone(doc.get_subcomponent('main', 'section/14'))
+        self.assertIsNone(doc.get_subcomponent('schedule', 'section/13A'))
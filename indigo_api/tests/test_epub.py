@@ -0,0 +1,58 @@
+import io
+import zipfile
+from unittest.mock import patch
+
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils.translation import get_language, override
+
+from indigo_api.exporters import EPUBExporter
+from indigo_api.models import Document, EPUBBundleJob
+from indigo_app.tests.utils import TEST_STORAGES
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class EPUBBundleJobTestCase(TestCase):
+    fixtures = ['languages_data', 'countries', 'user', 'taxonomy_topics', 'work', 'published', 'colophon']
+
+    def test_run(self):
+        docs = list(Document.objects.undeleted().published().filter(frbr_uri__startswith='/akn/za/')[:2])
+        job = EPUBBundleJob.objects.create(place='za', document_ids=[d.pk for d in docs])
+        job.run()
+
+        job.refresh_from_db()
+        self.assertEqual(EPUBBundleJob.DONE, job.state)
+        self.assertTrue(job.file.name.endswith('za.epub'))
+
+        with job.file.open('rb') as f, zipfile.ZipFile(f) as zf:
+            names = zf.namelist()
+        for doc in docs:
+            self.assertIn(f'EPUB/doc-{doc.pk}/titlepage.xhtml', names)
+        job.file.delete()
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class EPUBExporterThreadsTestCase(TransactionTestCase):
+    # the rendering threads use their own database connections, so the data must be committed
+    fixtures = ['languages_data', 'countries', 'user', 'taxonomy_topics', 'work', 'published', 'colophon']
+
+    def test_render_many_in_threads(self):
+        docs = list(Document.objects.undeleted().published().filter(frbr_uri__startswith='/akn/za/')[:2])
+        exporter = EPUBExporter()
+        exporter.workers = 2
+
+        languages = []
+        render_part = EPUBExporter.render_part
+
+        def record_language(exporter, document):
+            languages.append(get_language())
+            return render_part(exporter, document)
+
+        with patch.object(EPUBExporter, 'render_part', autospec=True, side_effect=record_language), override('fr'):
+            content = exporter.render_many(docs)
+
+        self.assertEqual(['fr'] * len(docs), languages)
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            names = zf.namelist()
+        for doc in docs:
+            self.assertIn(f'EPUB/doc-{doc.pk}/titlepage.xhtml', names)
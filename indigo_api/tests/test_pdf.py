@@ -1,5 +1,7 @@
 import os
+import subprocess
 import tempfile
+from unittest.mock import patch
 
 from django.conf import settings
 from django.test import TestCase
@@ -8,7 +10,7 @@ from lxml import etree
 from cobalt.hierarchical import Act
 from indigo_api.exporters import PDFExporter
 from indigo_api.models import Document, Work, Language
-from indigo_api.pdf import run_fop
+from indigo_api.pdf import run_fop, FopPool, FopQueueTimeout, FopServer
 
 
 class PDFExporterTestCase(TestCase):
@@ -122,3 +124,79 @@ class PDFExporterTestCase(TestCase):
 
     def test_tables_bad_spans(self):
         self.adjust_xml('bad_spans', self.exporter.resize_tables, subdirectory='tables')
+
+
+class FopPoolTestCase(TestCase):
+    def test_server_fallback(self):
+        pool = FopPool(1, timeout=60, server_cmd='/does/not/exist')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outf_name = os.path.join(tmpdir, 'out.pdf')
+            fo_file = os.path.join(tmpdir, 'in.fo')
+            with open(fo_file, 'w') as f:
+                f.write("""<fo:root xmlns:fo="http://www.w3.org/1999/XSL/Format">
+  <fo:layout-master-set><fo:simple-page-master master-name="A4"><fo:region-body/></fo:simple-page-master></fo:layout-master-set>
+  <fo:page-sequence master-reference="A4"><fo:flow flow-name="xsl-region-body"><fo:block>Hello</fo:block></fo:flow></fo:page-sequence>
+</fo:root>""")
+            pool.run(['-pdf', outf_name, '-c', pool.config_file, '-fo', fo_file], tmpdir)
+            self.assertTrue(os.path.exists(outf_name))
+
+    def test_queue_timeout(self):
+        pool = FopPool(1, queue_timeout=0)
+        pool.slots.acquire()
+        with self.assertRaises(FopQueueTimeout):
+            pool.run(['-version'], None)
+
+    def test_no_fallback_for_fop_errors(self):
+        pool = FopPool(1, server_cmd='fop-server')
+        error = subprocess.CalledProcessError(1, ['fop-server'], output='SEVERE: Exception\nInvalid FO')
+        with patch.object(pool, 'run_cmd', side_effect=error) as run_cmd:
+            with self.assertRaises(subprocess.CalledProcessError):
+                pool.run(['-version'], None)
+        # the invalid document isn't rendered again with a fresh process
+        self.assertEqual(1, run_cmd.call_count)
+
+    def test_fallback_for_server_errors(self):
+        pool = FopPool(1, server_cmd='fop-server')
+        error = subprocess.CalledProcessError(230, ['fop-server'], output='Connection refused')
+        with patch.object(pool, 'run_cmd', side_effect=[error, 'output']) as run_cmd:
+            self.assertEqual('output', pool.run(['-version'], None))
+        self.assertEqual(2, run_cmd.call_count)
+
+    def test_server_failure_checks_server(self):
+        pool = FopPool(1, server_cmd='fop-server', server_start_cmd='fop-server-start')
+        error = subprocess.CalledProcessError(230, ['fop-server'], output='Connection refused')
+        with patch.object(pool.server, 'check', return_value=True) as check, \
+                patch.object(pool, 'run_cmd', side_effect=['output', error, 'output', 'output']):
+            pool.run(['-version'], None)
+            self.assertEqual(1, check.call_count)
+            # the server is only checked again after it fails
+            pool.run(['-version'], None)
+            self.assertEqual(1, check.call_count)
+            pool.run(['-version'], None)
+            self.assertEqual(2, check.call_count)
+
+
+class FopServerTestCase(TestCase):
+    def test_already_running(self):
+        server = FopServer('sleep 60', ['true'])
+        with patch.object(server, 'start') as start:
+            self.assertTrue(server.ensure_running())
+        start.assert_not_called()
+
+    def test_start(self):
+        server = FopServer('sleep 60', ['fop-server', '-version'])
+        try:
+            with patch.object(server, 'check', side_effect=[False, False, True]), patch('time.sleep'):
+                self.assertTrue(server.ensure_running())
+            self.assertIsNone(server.process.poll())
+        finally:
+            server.stop()
+        self.assertIsNone(server.process)
+
+    def test_start_fails(self):
+        server = FopServer('/does/not/exist', ['false'], startup_timeout=0)
+        self.assertFalse(server.ensure_running())
+        # it isn't tried again until the retry interval has passed
+        with patch.object(server, 'start') as start:
+            self.assertFalse(server.ensure_running())
+        start.assert_not_called()
@@ -0,0 +1,51 @@
+import asyncio
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from indigo_api.utils import adiff_html_by_provision
+from indigo_lib.differ import AKNHTMLDiffer
+
+
+class ProvisionDiffTestCase(SimpleTestCase):
+    old_html = '<div class="akn-body"><h1>Title</h1>' \
+               '<section class="akn-section" id="sec_1"><p>one</p></section>' \
+               '<section class="akn-section" id="sec_2"><p>two</p></section></div>'
+    eids = ['sec_1', 'sec_2']
+
+    def setUp(self):
+        self.diffed = []
+
+        async def adiff_html_str(old_html, new_html):
+            self.diffed.append(old_html)
+            return AKNHTMLDiffer().diff_html_str(old_html, new_html)
+
+        patcher = patch('indigo_api.utils.adiff_html_str', adiff_html_str)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def diff(self, new_html, old_eids=None):
+        return asyncio.run(adiff_html_by_provision(self.old_html, new_html, old_eids or self.eids, self.eids))
+
+    def test_only_changed_provisions(self):
+        diff = self.diff(self.old_html.replace('two', 'three'))
+        self.assertEqual(['<section class="akn-section" id="sec_2"><p>two</p></section>'], self.diffed)
+        self.assertEqual(
+            '<div class="akn-body"><h1>Title</h1>'
+            '<section class="akn-section" id="sec_1"><p>one</p></section>'
+            '<section class="akn-section" id="sec_2"><p>t<span class="diff-pair"><del>wo</del><ins>hree</ins></span></p></section></div>',
+            diff)
+
+    def test_no_changes(self):
+        self.assertIsNone(self.diff(self.old_html))
+        self.assertEqual([], self.diffed)
+
+    def test_falls_back_to_full_diff(self):
+        # changes outside the provisions
+        self.diff(self.old_html.replace('Title', 'New title'))
+        self.assertEqual([self.old_html], self.diffed)
+
+        # different provisions
+        self.diffed.clear()
+        self.diff(self.old_html, old_eids=['sec_1'])
+        self.assertEqual([self.old_html], self.diffed)
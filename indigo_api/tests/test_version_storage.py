@@ -0,0 +1,101 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.serializers.base import DeserializationError
+from django.test import TestCase
+from lxml import etree
+
+from indigo_api import version_storage
+from indigo_api.data_migrations import DataMigration
+from indigo_api.models import Document
+from indigo_api.tests.fixtures import document_fixture
+
+
+class RewordMigration(DataMigration):
+    def migrate_xml(self, xml):
+        changed = False
+        for elem in xml.iter():
+            if elem.text and 'version' in elem.text:
+                elem.text = elem.text.replace('version', 'release')
+                changed = True
+        return changed, xml
+
+
+class VersionStorageTestCase(TestCase):
+    fixtures = ['languages_data', 'countries', 'user', 'taxonomy_topics', 'work', 'drafts']
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.document = Document.objects.get(pk=1)
+        self.xmls = []
+        for i in range(4):
+            self.document.content = document_fixture(f'version {i}')
+            self.document.save_with_revision(self.user)
+            self.xmls.append(self.document.document_xml)
+
+    def stored_xmls(self):
+        return [
+            v.field_dict['document_xml']
+            for v in Document.objects.get(pk=1).versions().order_by('pk')
+        ]
+
+    def test_convert(self):
+        call_command('convert_document_versions', documents=[1])
+
+        versions = list(self.document.versions().order_by('pk'))
+        self.assertEqual([version_storage.FORMAT] * 4, [v.format for v in versions])
+        self.assertIsNone(version_storage.delta_base_id(versions[0].serialized_data))
+        self.assertEqual([versions[0].pk] * 3, [version_storage.delta_base_id(v.serialized_data) for v in versions[1:]])
+        self.assertEqual(self.xmls, self.stored_xmls())
+
+        call_command('convert_document_versions', documents=[1], decompress=True)
+        self.assertEqual(['json'] * 4, [v.format for v in self.document.versions()])
+        self.assertEqual(self.xmls, self.stored_xmls())
+
+    def test_replace_snapshot(self):
+        call_command('convert_document_versions', documents=[1])
+        snapshot = self.document.versions().order_by('pk').first()
+
+        objects = version_storage.loads(snapshot.serialized_data)
+        objects[0]['fields']['document_xml'] = document_fixture('migrated')
+        version_storage.replace_data(snapshot, objects)
+        snapshot.save()
+
+        # the versions that depend on the snapshot are unchanged
+        self.assertEqual(self.xmls[1:], self.stored_xmls()[1:])
+        self.assertIn('migrated', self.stored_xmls()[0])
+
+    def migrated_xmls(self, migration):
+        return [
+            etree.tostring(migration.migrate_xml(etree.fromstring(xml))[1], encoding='unicode')
+            for xml in self.xmls
+        ]
+
+    def test_migrate_preloaded_versions(self):
+        call_command('convert_document_versions', documents=[1])
+        migration = RewordMigration()
+
+        # versions are loaded before any is migrated, so deltas in memory are against the old snapshot
+        for version in list(self.document.versions().order_by('pk')):
+            if migration.migrate_document_version(version):
+                version.save()
+
+        self.assertEqual(self.migrated_xmls(migration), self.stored_xmls())
+
+    def test_migrate_document_versions(self):
+        call_command('convert_document_versions', documents=[1])
+        migration = RewordMigration()
+
+        self.assertEqual(4, migration.migrate_document_versions(self.document.versions().order_by('pk')))
+        self.assertEqual(self.migrated_xmls(migration), self.stored_xmls())
+
+    def test_delta_against_changed_snapshot(self):
+        call_command('convert_document_versions', documents=[1])
+        snapshot, delta = list(self.document.versions().order_by('pk'))[:2]
+
+        objects = version_storage.loads(snapshot.serialized_data)
+        objects[0]['fields']['document_xml'] = document_fixture('migrated')
+        snapshot.serialized_data = version_storage.dumps(objects)
+        snapshot.save()
+
+        with self.assertRaises(DeserializationError):
+            version_storage.loads(delta.serialized_data)
@@ -4,7 +4,7 @@ from django.contrib.auth.models import User
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 
-from indigo_api.models import Document, Work, Country, Amendment, ArbitraryExpressionDate, Commencement
+from indigo_api.models import Document, Work, Country, Amendment, ArbitraryExpressionDate, Commencement, WorkTimeline
 
 
 class WorkTestCase(TestCase):
@@ -238,3 +238,24 @@ class WorkTestCase(TestCase):
             [amends, commences, repeals],
             sorted(Work.get_incoming_related_works([self.work]), key=lambda x: x.title)
         )
+
+    def test_stored_timeline(self):
+        timeline = self.work.get_serialized_timeline()
+        self.assertTrue(WorkTimeline.objects.filter(work=self.work).exists())
+        self.assertEqual(timeline, self.work.get_serialized_timeline())
+
+        # a new amendment changes the timeline
+        amending_work = Work.objects.get(pk=2)
+        Amendment.objects.create(amended_work=self.work, amending_work=amending_work, date='2020-09-13',
+                                 created_by_user_id=1)
+        self.assertFalse(WorkTimeline.objects.filter(work=self.work).exists())
+        internal = self.work.get_serialized_timeline(only_approved_events=False)
+        self.assertIn('2020-09-13', [e['date'] for e in internal])
+
+        # renaming the amending work changes the amended work's timeline
+        amending_work.title = 'A new title'
+        amending_work.save()
+        self.assertFalse(WorkTimeline.objects.filter(work=self.work).exists())
+        internal = self.work.get_serialized_timeline(only_approved_events=False)
+        entry = next(e for e in internal if e['date'] == '2020-09-13')
+        self.assertEqual('A new title', entry['events'][0]['by_title'])
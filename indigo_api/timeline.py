@@ -1,4 +1,6 @@
 from dataclasses import dataclass, field
+from itertools import chain
+
 from django.db.models import TextChoices
 from django.utils.formats import date_format
 from django.utils.translation import gettext as _
@@ -183,6 +185,14 @@ def describe_publication_event(work, with_date=True, friendly_date=True, placeho
         return event
 
 
+def group_by_date(items, get_date):
+    """ Group items into a dict from date to a list of items, keeping their order. """
+    grouped = {}
+    for item in items:
+        grouped.setdefault(get_date(item), []).append(item)
+    return grouped
+
+
 def get_timeline(work, only_approved_events=False):
     """ Returns a list of TimelineEvent objects, each describing a date on the timeline of a work.
     """
@@ -205,14 +215,20 @@ def get_timeline(work, only_approved_events=False):
     if only_approved_events and work.repealed_by and work.repealed_by.work_in_progress:
         repealed_date = None
 
-    amendment_dates = [c.date for c in all_amendments]
-    commencement_dates = [c.date for c in all_commencements]
-    consolidation_dates = [c.date for c in all_consolidations]
-    chapter_dates = [c.validity_start_date for c in all_chapter_numbers]
+    # group everything by date, so that each date only looks at its own events
+    amendments_by_date = group_by_date(all_amendments, lambda a: a.date)
+    commencements_by_date = group_by_date(all_commencements, lambda c: c.date)
+    consolidations_by_date = group_by_date(all_consolidations, lambda c: c.date)
+    chapter_numbers_by_date = group_by_date(all_chapter_numbers, lambda c: c.validity_start_date)
+    commencement_dates = list(commencements_by_date.keys())
+    consolidation_dates = list(consolidations_by_date.keys())
     other_dates = [work.assent_date, work.publication_date, repealed_date]
     # don't include None
-    all_dates = [e for e in amendment_dates + commencement_dates + consolidation_dates + chapter_dates + other_dates if e]
-    all_dates = set(all_dates)
+    all_dates = set(
+        d for d in chain(amendments_by_date, commencement_dates, consolidation_dates, chapter_numbers_by_date,
+                         other_dates)
+        if d
+    )
 
     # the initial date is the publication date, or the earliest of the consolidation and commencement dates, or None
     initial = work.publication_date
@@ -221,12 +237,12 @@ def get_timeline(work, only_approved_events=False):
 
     for date in all_dates:
         entry = TimelineEntry(date=date, initial=date == initial)
-        amendments = [a for a in all_amendments if a.date == date]
+        amendments = amendments_by_date.get(date, [])
         if len(amendments) > 1:
             amendments = Amendment.order_further(amendments)
-        commencements = [c for c in all_commencements if c.date == date]
-        consolidations = [c for c in all_consolidations if c.date == date]
-        chapter_numbers = [c for c in all_chapter_numbers if c.validity_start_date == date]
+        commencements = list(commencements_by_date.get(date, []))
+        consolidations = consolidations_by_date.get(date, [])
+        chapter_numbers = chapter_numbers_by_date.get(date, [])
 
         # even though the timeline is given in reverse chronological order,
         # each date on the timeline is described in regular order: assent first, repeal last
@@ -284,5 +300,5 @@ def get_timeline(work, only_approved_events=False):
     return entries
 
 
-def get_serialized_timeline(work):
-    return [entry.serialized() for entry in get_timeline(work, only_approved_events=True)]
+def get_serialized_timeline(work, only_approved_events=True):
+    return [entry.serialized() for entry in get_timeline(work, only_approved_events=only_approved_events)]
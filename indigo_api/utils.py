@@ -1,7 +1,9 @@
+import asyncio
+import base64
 import hashlib
 import logging
 from collections import defaultdict
-
+import lxml.html
 from actstream.models import Action
 from django.contrib.contenttypes.models import ContentType
 from django.template.loader import get_template, TemplateDoesNotExist
@@ -10,11 +12,16 @@ from django.contrib.postgres.search import Value, Func, SearchRank
 from django.contrib.staticfiles.finders import find as find_static
 from django.core.cache import cache
 from django.db.models import TextField, Q
+from django.utils.dateparse import parse_datetime
 
 from languages_plus.models import Language
-from rest_framework.pagination import PageNumberPagination as BasePageNumberPagination
+from rest_framework.pagination import PageNumberPagination as BasePageNumberPagination, BasePagination
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 
 from indigo.analysis.differ import AKNHTMLDiffer
+from indigo.xmlutils import parse_html_str
 
 
 log = logging.getLogger(__name__)
@@ -62,6 +69,84 @@ class SearchPagination(PageNumberPagination):
     page_size = 20
 
 
+class KeysetPagination(BasePagination):
+    """ Keyset (cursor) pagination on (updated_at, id), for paging through large listings without OFFSET
+    or COUNT queries. Each page is fetched with a range query that starts just after the last item on
+    the previous page, so paging through everything is linear.
+
+    Only forward paging is supported. The response includes a `next` link, and no count.
+    """
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    ordering = ('updated_at', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor:
+            updated_at, pk = cursor
+            queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last.updated_at, last.id))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, updated_at, pk):
+        return base64.urlsafe_b64encode(f'{updated_at.isoformat()}|{pk}'.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        """ Decode a cursor into an (updated_at, id) tuple, or None if there is no cursor.
+        """
+        if not cursor:
+            return None
+        try:
+            updated_at, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split('|', 1)
+            updated_at = parse_datetime(updated_at)
+            if updated_at:
+                return updated_at, int(pk)
+        except (ValueError, UnicodeError):
+            pass
+        raise NotFound("Invalid cursor")
+
+
 def filename_candidates(document, prefix='', suffix=''):
     """ Candidate files to use for this document.
 
@@ -164,6 +249,82 @@ async def adiff_html_str(old_html, new_html):
     return result
 
 
+def find_provisions(tree, eids):
+    """ Find the element in an HTML tree for each of the given eIds, in order. Returns None if any element is
+    missing or appears more than once, or if they aren't in document order.
+    """
+    elements = []
+    for eid in eids:
+        found = tree.xpath('//*[@id=$eid]', eid=eid)
+        if len(found) != 1:
+            return None
+        elements.append(found[0])
+
+    positions = {el: i for i, el in enumerate(tree.iter())}
+    if [positions[el] for el in elements] != sorted(positions[el] for el in elements):
+        return None
+
+    return elements
+
+
+async def adiff_html_by_provision(old_html, new_html, old_eids, new_eids):
+    """ Asynchronously compute the diff between two HTML renderings of a document, returning a string with the HTML
+    diff, or None if there are no differences.
+
+    Instead of diffing the whole document, the renderings are split into the provisions with the given eIds (such
+    as the top-level items of the table of contents), and only provisions that have changed are diffed. Unchanged
+    provisions are included as-is. Each provision's diff is cached by adiff_html_str.
+
+    If the provisions don't match up, or if anything outside of the provisions has changed, the whole document
+    is diffed.
+    """
+    if old_html == new_html:
+        return None
+
+    if not old_html or not new_html or not new_eids or list(old_eids) != list(new_eids):
+        return await adiff_html_str(old_html, new_html)
+
+    old_tree = parse_html_str(old_html)
+    new_tree = parse_html_str(new_html)
+    old_provisions = find_provisions(old_tree, old_eids)
+    new_provisions = find_provisions(new_tree, new_eids)
+    if old_provisions is None or new_provisions is None:
+        return await adiff_html_str(old_html, new_html)
+
+    # replace provisions with placeholders, so that we can compare what's left
+    old_fragments = [replace_with_placeholder(el, i) for i, el in enumerate(old_provisions)]
+    new_fragments = [replace_with_placeholder(el, i) for i, el in enumerate(new_provisions)]
+    if lxml.html.tostring(old_tree) != lxml.html.tostring(new_tree):
+        return await adiff_html_str(old_html, new_html)
+
+    changed = [i for i, (old, new) in enumerate(zip(old_fragments, new_fragments)) if old != new]
+    if not changed:
+        return None
+
+    diffs = await asyncio.gather(*(adiff_html_str(old_fragments[i], new_fragments[i]) for i in changed))
+    diffs = dict(zip(changed, diffs))
+
+    for i, placeholder in enumerate(new_tree.xpath('//*[@data-provision-placeholder]')):
+        if diffs.get(i):
+            element = lxml.html.fragment_fromstring(diffs[i], create_parent='div')
+            element = element[0] if len(element) == 1 and not element.text else element
+        else:
+            element = new_provisions[i]
+        element.tail = placeholder.tail
+        placeholder.getparent().replace(placeholder, element)
+
+    return lxml.html.tostring(new_tree, encoding='unicode')
+
+
+def replace_with_placeholder(element, i):
+    """ Replace an element with a placeholder, and return the element's HTML. """
+    placeholder = element.makeelement('div', {'data-provision-placeholder': str(i)})
+    placeholder.tail = element.tail
+    element.getparent().replace(element, placeholder)
+    element.tail = None
+    return lxml.html.tostring(element, encoding='unicode')
+
+
 def actions_for_objects(objs):
     """Get a queryset of Action objects where the given objects are the action_object."""
     groups = defaultdict(set)
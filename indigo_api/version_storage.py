@@ -0,0 +1,337 @@
+""" Compact storage for document versions.
+
+This is a Django serialization format (registered as `indigo_delta` in settings.SERIALIZATION_MODULES) that
+django-reversion uses for document versions when settings.INDIGO['DOCUMENT_VERSION_DELTAS'] is enabled.
+
+Most versions of a document differ only slightly from each other, so instead of storing the full document XML for
+each version, a version either stores the full XML (a snapshot), or a delta against the XML of the most recent
+snapshot. A new snapshot is stored every `SNAPSHOT_EVERY` versions, or when the delta grows too large. Deltas are
+always against a snapshot, never against another delta, so reconstructing a version needs at most one other version.
+
+Because reversion deserializes versions using their stored format, everything that loads versions (such as
+`version.field_dict` and `revision.revert()`) sees the full XML, and versions stored before this format was enabled
+(or after it is disabled) are unaffected.
+
+Deltas are stored at the start of the serialized data as ``[{"delta": {"base": <snapshot version id>, ...``,
+so that the snapshot a version depends on can be found without parsing the whole version. Deltas also record a
+digest of the snapshot XML they were made against, so that a delta is never applied to a snapshot that has since
+changed (such as by a data migration).
+"""
+import hashlib
+import json
+import logging
+import re
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.json import Serializer as JSONSerializer, DjangoJSONEncoder
+from django.core.serializers.python import Deserializer as PythonDeserializer
+
+log = logging.getLogger(__name__)
+
+FORMAT = 'indigo_delta'
+FIELD = 'document_xml'
+DELTA_BASE_RE = re.compile(r'^\[\{"delta": \{"base": (\d+)')
+# the same, for the database
+DELTA_BASE_SQL_RE = r'^\[\{"delta": \{"base": (\d+)'
+
+
+def tokenize(xml):
+    """ Split XML into tokens that each end with a tag, which are the units that deltas work with. """
+    return re.split(r'(?<=>)', xml)
+
+
+def make_delta(old, new):
+    """ Describe how to change `old` into `new`, as a list of [start, end, replacement] operations that replace
+    old tokens start to end with the replacement text.
+    """
+    old = tokenize(old)
+    new = tokenize(new)
+
+    # most changes are small, so only compare what's between the common start and end
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+
+    matcher = SequenceMatcher(None, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix])
+    return [
+        [prefix + i1, prefix + i2, ''.join(new[prefix + j1:prefix + j2])]
+        for op, i1, i2, j1, j2 in matcher.get_opcodes()
+        if op != 'equal'
+    ]
+
+
+def digest(xml):
+    return hashlib.md5(xml.encode('utf-8')).hexdigest()
+
+
+def apply_delta(old, ops):
+    old = tokenize(old)
+    parts = []
+    pos = 0
+    for start, end, replacement in ops:
+        parts.extend(old[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.extend(old[pos:])
+    return ''.join(parts)
+
+
+def delta_base_id(serialized_data):
+    """ The id of the snapshot version that this serialized version is a delta against, or None. """
+    match = DELTA_BASE_RE.match(serialized_data)
+    return int(match.group(1)) if match else None
+
+
+def is_enabled():
+    return bool(settings.INDIGO.get('DOCUMENT_VERSION_DELTAS', {}).get('ENABLED'))
+
+
+def get_config():
+    config = settings.INDIGO.get('DOCUMENT_VERSION_DELTAS', {})
+    return config.get('SNAPSHOT_EVERY', 25), config.get('MAX_DELTA_RATIO', 0.25)
+
+
+def snapshot_xml(version_id):
+    """ The full XML of a snapshot version, or None if it doesn't exist. """
+    from reversion.models import Version
+
+    data = Version.objects.filter(pk=version_id).values_list('serialized_data', flat=True).first()
+    if data is None:
+        return None
+    objects = json.loads(data)
+    if 'delta' in objects[0]:
+        raise ValueError(f"Version {version_id} is not a snapshot")
+    return objects[0]['fields'].get(FIELD)
+
+
+def latest_snapshot(model_label, pk):
+    """ Find the snapshot that a new version of this object should be stored against, as a tuple of
+    (snapshot version id, snapshot XML, number of deltas already stored against it), or None.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from reversion.models import Version
+
+    content_type = ContentType.objects.get_by_natural_key(*model_label.split('.'))
+    latest = Version.objects\
+        .filter(content_type=content_type, object_id=str(pk))\
+        .order_by('-pk')\
+        .values('pk', 'format', 'serialized_data')\
+        .first()
+    if not latest or latest['format'] != FORMAT:
+        return None
+
+    obj = json.loads(latest['serialized_data'])[0]
+    if 'delta' not in obj:
+        return latest['pk'], obj['fields'].get(FIELD), 0
+
+    xml = snapshot_xml(obj['delta']['base'])
+    if xml is None:
+        return None
+    return obj['delta']['base'], xml, obj['delta']['count']
+
+
+def compress(obj, base):
+    """ Store a serialized object as a delta against `base`, a tuple as returned by `latest_snapshot`, if that's
+    worthwhile. Otherwise, the object is returned unchanged, as a snapshot.
+    """
+    snapshot_every, max_ratio = get_config()
+    xml = obj['fields'].get(FIELD)
+    if not base or not base[1] or not xml or base[2] + 1 >= snapshot_every:
+        return obj
+
+    base_id, base_xml, count = base
+    ops = make_delta(base_xml, xml)
+    if len(json.dumps(ops)) > len(xml) * max_ratio:
+        return obj
+
+    fields = {k: v for k, v in obj['fields'].items() if k != FIELD}
+    # the delta must be first, see delta_base_id
+    return {
+        'delta': {'base': base_id, 'count': count + 1, 'digest': digest(base_xml), 'ops': ops},
+        **{k: v for k, v in obj.items() if k != 'fields'},
+        'fields': fields,
+    }
+
+
+def expand(obj, base_xml=None):
+    """ Reconstruct the full XML for a serialized object, if it is a delta. """
+    if 'delta' not in obj:
+        return obj
+
+    delta = obj.pop('delta')
+    if base_xml is None:
+        base_xml = snapshot_xml(delta['base'])
+        if base_xml is None:
+            raise DeserializationError(f"Snapshot version {delta['base']} is missing")
+
+    if 'digest' in delta and delta['digest'] != digest(base_xml):
+        raise DeserializationError(f"Snapshot version {delta['base']} has changed since this delta was stored")
+
+    obj['fields'][FIELD] = apply_delta(base_xml, delta['ops'])
+    return obj
+
+
+def dumps(objects):
+    return json.dumps(objects, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def loads(serialized_data):
+    """ Load serialized data in either this format or plain JSON, with the full XML for each object. """
+    return [expand(obj) for obj in json.loads(serialized_data)]
+
+
+class Serializer(JSONSerializer):
+    """ Serializes documents as JSON, storing the XML as a delta against the most recent snapshot version of
+    the document, if possible.
+
+    This only makes sense for objects that are being added as a new version, which is how reversion uses it.
+    """
+    def serialize(self, queryset, **options):
+        objects = json.loads(super().serialize(queryset, **options))
+        if len(objects) == 1 and FIELD in objects[0].get('fields', {}):
+            obj = objects[0]
+            objects = [compress(obj, latest_snapshot(obj['model'], obj['pk']))]
+        return dumps(objects)
+
+
+def Deserializer(stream_or_string, **options):
+    """ Deserialize versions stored by Serializer (or as plain JSON). """
+    if not isinstance(stream_or_string, (bytes, str)):
+        stream_or_string = stream_or_string.read()
+    if isinstance(stream_or_string, bytes):
+        stream_or_string = stream_or_string.decode()
+    try:
+        objects = loads(stream_or_string)
+        yield from PythonDeserializer(objects, **options)
+    except (GeneratorExit, DeserializationError):
+        raise
+    except Exception as exc:
+        raise DeserializationError() from exc
+
+
+def dependents(version):
+    """ The delta versions that are stored against this snapshot version. """
+    from django.db.models.functions import Substr
+    from reversion.models import Version
+
+    # only load the start of each version to find the ones that depend on this one
+    candidates = Version.objects\
+        .filter(content_type_id=version.content_type_id, object_id=version.object_id, format=FORMAT,
+                pk__gt=version.pk)\
+        .annotate(prefix=Substr('serialized_data', 1, 64))\
+        .order_by('pk')\
+        .values_list('pk', 'prefix')
+    ids = [pk for pk, prefix in candidates if delta_base_id(prefix) == version.pk]
+    return Version.objects.filter(pk__in=ids).order_by('pk')
+
+
+def replace_data(version, objects):
+    """ Replace the data stored for a version with `objects`, which have their full XML, such as when migrating
+    the XML of old versions. Versions that are deltas against this one are re-stored against the new data,
+    so that they are unchanged. The version itself is not saved.
+    """
+    if version.format != FORMAT:
+        version.serialized_data = dumps(objects)
+        return
+
+    base_id = delta_base_id(version.serialized_data)
+    if base_id:
+        # re-store the delta against the same snapshot
+        base = (base_id, snapshot_xml(base_id), json.loads(version.serialized_data)[0]['delta']['count'] - 1)
+        version.serialized_data = dumps([compress(objects[0], base)])
+        return
+
+    old_xml = json.loads(version.serialized_data)[0]['fields'].get(FIELD)
+    new_xml = objects[0]['fields'].get(FIELD)
+    for dependent in dependents(version):
+        obj = json.loads(dependent.serialized_data)[0]
+        count = obj['delta']['count']
+        obj = expand(obj, old_xml)
+        dependent.serialized_data = dumps([compress(obj, (version.pk, new_xml, count - 1))])
+        dependent.save(update_fields=['serialized_data'])
+
+    version.serialized_data = dumps(objects)
+
+
+def convert_versions(versions, compressed=True):
+    """ Re-store the versions of a single object, oldest first, either compressed with deltas (in this format)
+    or as plain JSON. Returns the number of versions that were changed.
+    """
+    changed = 0
+    base = None
+    # snapshots may be re-stored as deltas, so remember their original XML for later versions that depend on them
+    originals = {}
+    for version in versions:
+        objects = json.loads(version.serialized_data)
+        if 'delta' in objects[0]:
+            objects[0] = expand(objects[0], originals.get(objects[0]['delta']['base']))
+        else:
+            originals[version.pk] = objects[0].get('fields', {}).get(FIELD)
+
+        if compressed:
+            obj = compress(objects[0], base)
+            if 'delta' in obj:
+                base = (base[0], base[1], obj['delta']['count'])
+            else:
+                base = (version.pk, obj['fields'].get(FIELD), 0)
+            data, format = dumps([obj]), FORMAT
+        else:
+            data, format = dumps(objects), 'json'
+
+        if data != version.serialized_data or format != version.format:
+            version.serialized_data = data
+            version.format = format
+            version.save(update_fields=['serialized_data', 'format'])
+            changed += 1
+
+    return changed
+
+
+def migrate_versions(versions, migrate):
+    """ Migrate the stored data of the versions of a single object, oldest first. `migrate(objects)` is given the
+    deserialized objects of each version, with their full XML, and must change them in place and return True
+    if they changed. Returns the number of versions that were changed.
+
+    Every version is reconstructed before any is re-stored, so that deltas are never applied to a snapshot that
+    has already been migrated. Deltas against a changed snapshot are re-stored, even if they didn't change.
+    """
+    versions = list(versions)
+    expanded = []
+    originals = {}
+    for version in versions:
+        objects = json.loads(version.serialized_data)
+        if 'delta' in objects[0]:
+            objects[0] = expand(objects[0], originals.get(objects[0]['delta']['base']))
+        else:
+            originals[version.pk] = objects[0].get('fields', {}).get(FIELD)
+        expanded.append(objects)
+
+    changed = 0
+    # the new XML of snapshots that have changed
+    snapshots = {}
+    for version, objects in zip(versions, expanded):
+        migrated = migrate(objects)
+        base_id = delta_base_id(version.serialized_data) if version.format == FORMAT else None
+
+        if base_id and (migrated or base_id in snapshots):
+            # re-store the delta against the same snapshot, as it is now
+            base_xml = snapshots[base_id] if base_id in snapshots else snapshot_xml(base_id)
+            count = json.loads(version.serialized_data)[0]['delta']['count']
+            version.serialized_data = dumps([compress(objects[0], (base_id, base_xml, count - 1))])
+        elif migrated:
+            version.serialized_data = dumps(objects)
+            if version.format == FORMAT:
+                snapshots[version.pk] = objects[0]['fields'].get(FIELD)
+        else:
+            continue
+
+        version.save(update_fields=['serialized_data'])
+        changed += 1
+
+    return changed
@@ -29,6 +29,8 @@ from reversion import revisions as reversion
 
 from cobalt import StructuredDocument
 from indigo.analysis.differ import AKNHTMLDiffer
+from indigo.analysis.context import AnalysisContext
+from indigo.analysis.italics_terms import markup_italics
 from indigo.analysis.refs.base import markup_document_refs
 from indigo.plugins import plugins
 from indigo.view_mixins import AtomicWriteViewSetMixin
@@ -42,7 +44,7 @@ from ..models import Document, Annotation, DocumentActivity, Task
 from ..renderers import AkomaNtosoRenderer, PDFRenderer, EPUBRenderer, HTMLRenderer, ZIPRenderer
 from ..serializers import DocumentSerializer, RenderSerializer, ParseSerializer, DocumentAPISerializer, \
     VersionSerializer, AnnotationSerializer, DocumentActivitySerializer, TaskSerializer
-from ..utils import filename_candidates, find_best_static, adiff_html_str
+from ..utils import filename_candidates, find_best_static, adiff_html_str, adiff_html_by_provision
 
 log = logging.getLogger(__name__)
 
@@ -75,7 +77,7 @@ class DocumentViewMixin:
             self.serializer_class = self.request.accepted_renderer.serializer_class
 
     def table_of_contents(self, document, uri=None):
-        return [t.as_dict() for t in document.table_of_contents()]
+        return document.table_of_contents_json()
 
 
 # Read/write REST API
@@ -257,6 +259,11 @@ class AsyncDocumentResourceViewMixin(AsyncDispatchMixin, DocumentForRenderingRes
                     raise PermissionDenied()
 
 
+def provision_eids(document):
+    """ The eIds of the top-level provisions of a document, used to diff it provision by provision. """
+    return [t.id for t in document.table_of_contents() if t.id]
+
+
 class RevisionDiffView(AsyncDocumentResourceViewMixin, AbstractAuthedIndigoView, DetailView):
     """Handles diffs between two revisions of a document.
 
@@ -286,18 +293,20 @@ class RevisionDiffView(AsyncDocumentResourceViewMixin, AbstractAuthedIndigoView,
             old_document = old_version._object_version.object
             old_document.document_xml = differ.preprocess_xml_str(old_document.document_xml)
             old_html = old_document.to_html()
+            old_eids = provision_eids(old_document)
         else:
             old_html = ""
+            old_eids = []
 
         new_document = version._object_version.object
         new_document.document_xml = differ.preprocess_xml_str(new_document.document_xml)
         new_html = new_document.to_html()
 
-        return old_html, new_html
+        return old_html, new_html, old_eids, provision_eids(new_document)
 
     async def get(self, request, *args, **kwargs):
-        old_html, new_html = await self.prepare(request)
-        diff = await adiff_html_str(old_html, new_html)
+        old_html, new_html, old_eids, new_eids = await self.prepare(request)
+        diff = await adiff_html_by_provision(old_html, new_html, old_eids, new_eids)
         # show whole document if it hasn't changed
         diff = diff or ("<div>" + new_html + "</div>")
         return JsonResponse({
@@ -437,10 +446,8 @@ class MarkUpItalicsTermsView(ManipulateXmlView):
     """ Find and mark up italics terms.
     """
     def manipulate_xml(self):
-        italics_terms_finder = plugins.for_document('italics-terms', self.document)
-        italics_terms = self.document.work.country.italics_terms
-        if italics_terms_finder and italics_terms:
-            italics_terms_finder.mark_up_italics_in_document(self.document, italics_terms)
+        with AnalysisContext(self.document) as context:
+            markup_italics(context)
 
 
 class SentenceCaseHeadingsView(ManipulateXmlView):
@@ -509,16 +516,24 @@ class DocumentDiffView(AsyncDocumentResourceViewMixin, AbstractAuthedIndigoView,
 
             local_html = local_doc.to_html(element=local_element[0]) if len(local_element) else None
             remote_html = remote_doc.to_html(element=remote_element[0]) if len(remote_element) else None
+        elif not provision_eid:
+            # diff the whole document, provision by provision
+            local_html = local_doc.to_html()
+            remote_html = remote_doc.to_html()
+            return remote_html, local_html, provision_eids(remote_doc), provision_eids(local_doc)
+
         else:
-            # diff the whole document
             local_html = local_doc.to_html()
             remote_html = remote_doc.to_html()
 
-        return remote_html, local_html
+        return remote_html, local_html, None, None
 
     async def post(self, request, document_id):
-        remote_html, local_html = await self.prepare(request)
-        diff = await adiff_html_str(remote_html, local_html)
+        remote_html, local_html, remote_eids, local_eids = await self.prepare(request)
+        if local_eids:
+            diff = await adiff_html_by_provision(remote_html, local_html, remote_eids, local_eids)
+        else:
+            diff = await adiff_html_str(remote_html, local_html)
         # diff is None if there is no difference, in which case just return the remote HTML
         diff = diff or ("<div>" + (remote_html or '') + "</div>")
 
@@ -9,7 +9,7 @@ from indigo_api.models import Document, Language
 class DocumentForm(forms.ModelForm):
     class Meta:
         model = Document
-        exclude = ('document_xml', 'created_at', 'updated_at', 'created_by_user', 'updated_by_user',)
+        exclude = ('document_xml', 'toc_json', 'created_at', 'updated_at', 'created_by_user', 'updated_by_user',)
 
 
 class ImportDocumentForm(forms.Form):
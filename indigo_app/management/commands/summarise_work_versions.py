@@ -0,0 +1,33 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from reversion.models import Version
+
+from indigo_api.models import Work
+from indigo_app.revisions import summarise_version
+
+
+class Command(BaseCommand):
+    help = 'Store change summaries for existing work versions, so that work histories load quickly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-summarise versions that already have a summary")
+
+    def handle(self, *args, **options):
+        versions = Version.objects\
+            .filter(content_type=ContentType.objects.get_for_model(Work))\
+            .select_related('change_summary')\
+            .order_by('object_id', 'pk')
+
+        count = 0
+        previous = None
+        for version in versions.iterator(chunk_size=100):
+            if previous and previous.object_id != version.object_id:
+                previous = None
+
+            if options['all'] or not hasattr(version, 'change_summary'):
+                summarise_version(version, previous)
+                count += 1
+
+            previous = version
+
+        self.stdout.write(self.style.SUCCESS(f"Summarised {count} work versions"))
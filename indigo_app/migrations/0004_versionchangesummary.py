@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-18 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_app', '0003_models_i18n'),
+        ('reversion', '0002_add_index_on_version_for_content_type_and_db'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionChangeSummary',
+            fields=[
+                ('version', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='change_summary', serialize=False, to='reversion.version', verbose_name='version')),
+                ('previous_version_id', models.IntegerField(blank=True, null=True, verbose_name='previous version id')),
+                ('changes', models.JSONField(default=list, verbose_name='changes')),
+            ],
+            options={
+                'verbose_name': 'version change summary',
+                'verbose_name_plural': 'version change summaries',
+            },
+        ),
+    ]
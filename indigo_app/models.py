@@ -69,6 +69,22 @@ class Publication(models.Model):
         return str(self.name)
 
 
+class VersionChangeSummary(models.Model):
+    """ The field-level changes made by a version of a work, compared to the previous version of the work.
+
+    This is computed when the version is saved, so that a work's history can be shown without loading the
+    serialized data of every version. See indigo_app.revisions.
+    """
+    version = models.OneToOneField('reversion.Version', on_delete=models.CASCADE, primary_key=True,
+                                   related_name='change_summary', verbose_name=_("version"))
+    previous_version_id = models.IntegerField(_("previous version id"), null=True, blank=True)
+    changes = models.JSONField(_("changes"), default=list)
+
+    class Meta:
+        verbose_name = _("version change summary")
+        verbose_name_plural = _("version change summaries")
+
+
 @receiver(post_save, sender=User)
 def create_editor(sender, **kwargs):
     # create editor for user objects
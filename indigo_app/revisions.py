@@ -1,35 +1,87 @@
 import jsonpatch
+from django.contrib.contenttypes.models import ContentType
+from reversion.models import Version
 
 
 IGNORE_FIELDS = ('created_at', 'updated_at', 'updated_by_user', 'created_by_user', 'id')
 
 
-def decorate_versions(versions, ignore=IGNORE_FIELDS):
-    # make pretty differences
-    for curr, prev in zip(versions, list(versions[1:]) + [None]):
-        curr_d = curr.field_dict
-        prev_d = {} if prev is None else prev.field_dict
+def comparable_fields(version, ignore=IGNORE_FIELDS):
+    d = {} if version is None else dict(version.field_dict)
+
+    for fld in ignore:
+        if fld in d:
+            del d[fld]
+
+    for fld in d:
+        try:
+            d[fld] = d[fld].isoformat()
+        except AttributeError:
+            pass
+
+    return d
+
+
+def describe_changes(curr, prev, ignore=IGNORE_FIELDS):
+    """ Describe the field-level changes between two versions, as a list of dicts.
+    """
+    curr_d = comparable_fields(curr, ignore)
+    prev_d = comparable_fields(prev, ignore)
+    patch = jsonpatch.make_patch(curr_d, prev_d)
+
+    return sorted([{
+        'field': p['path'][1:].replace('_', ' '),
+        'path': p['path'],
+        'old': prev_d.get(p['path'][1:]),
+        'new': curr_d.get(p['path'][1:]),
+    } for p in patch], key=lambda x: x['field'])
+
 
-        for fld in ignore:
-            for d in [curr_d, prev_d]:
-                if fld in d:
-                    del d[fld]
+def summarise_version(version, previous=None):
+    """ Store the changes made by this version compared to the version before it, which is loaded if not given.
+    """
+    from indigo_app.models import VersionChangeSummary
 
-        for d in [curr_d, prev_d]:
-            for fld in d:
-                try:
-                    d[fld] = d[fld].isoformat()
-                except AttributeError:
-                    pass
+    if previous is None:
+        previous = Version.objects\
+            .filter(content_type_id=version.content_type_id, object_id=version.object_id, pk__lt=version.pk)\
+            .order_by('-pk')\
+            .first()
 
-        patch = jsonpatch.make_patch(curr_d, prev_d)
+    summary, _ = VersionChangeSummary.objects.update_or_create(version=version, defaults={
+        'previous_version_id': previous.pk if previous else None,
+        'changes': describe_changes(version, previous),
+    })
+    return summary
 
+
+def summarise_versions(versions):
+    """ Store change summaries for newly-saved versions of works.
+    """
+    from indigo_api.models import Work
+
+    content_type = ContentType.objects.get_for_model(Work)
+    for version in versions:
+        if version.content_type_id == content_type.pk:
+            summarise_version(version)
+
+
+def decorate_versions(versions, ignore=IGNORE_FIELDS):
+    """ Set `previous` and `changes` on each version, in a list of versions in descending order. Changes are taken
+    from each version's stored change summary, which is stored if it is missing, so versions should be loaded with
+    select_related('change_summary') and without their serialized data.
+    """
+    for curr, prev in zip(versions, list(versions[1:]) + [None]):
         curr.previous = prev
-        curr.changes = sorted([{
-            'field': p['path'][1:].replace('_', ' '),
-            'path': p['path'],
-            'old': prev_d.get(p['path'][1:]),
-            'new': curr_d.get(p['path'][1:]),
-        } for p in patch], key=lambda x: x['field'])
+
+        summary = getattr(curr, 'change_summary', None)
+        if summary is None or summary.previous_version_id != (prev.pk if prev else None):
+            if ignore == IGNORE_FIELDS:
+                summary = summarise_version(curr, prev)
+            else:
+                curr.changes = describe_changes(curr, prev, ignore)
+                continue
+
+        curr.changes = summary.changes
 
     return versions
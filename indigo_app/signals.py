@@ -3,11 +3,13 @@ from django.db.models import signals
 from django.dispatch import receiver
 
 from allauth.account.signals import user_signed_up
+from reversion.signals import post_revision_commit
 from actstream.models import Action
 from django_comments.models import Comment
 from django_comments.signals import comment_was_posted
 
 from indigo_api.models import Task, Annotation
+from indigo_app.revisions import summarise_versions
 from indigo_app.notifications import notify_task_action, notify_comment_posted, notify_new_user_signed_up, notify_annotation_reply_posted, notify_user_badge_earned
 from indigo_social.signals import badge_awarded
 
@@ -46,3 +48,10 @@ def post_annotation_reply(sender, **kwargs):
 def post_badge_earned(sender, **kwargs):
     if kwargs.get('badge_award') and not kwargs['badge_award'].can_award_manually:
         notify_user_badge_earned(kwargs['badge_award'].pk)
+
+
+@receiver(post_revision_commit)
+def revision_committed(sender, revision, versions, **kwargs):
+    """ Summarise the changes made by new work versions.
+    """
+    summarise_versions(versions)
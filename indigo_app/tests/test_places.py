@@ -1,6 +1,13 @@
+from datetime import timedelta
+from unittest.mock import patch
+
 from django.contrib.auth.models import User
 from django.test import testcases, override_settings
+from django.utils import timezone
 from django_webtest import WebTest
+
+from indigo_api import tasks
+from indigo_api.models import Document, LinkReferencesJob
 from indigo_app.tests.utils import TEST_STORAGES
 
 
@@ -49,6 +56,96 @@ class PlacesTest(testcases.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
+    def test_place_works_link_refs(self):
+        doc = Document.objects.undeleted().first()
+        response = self.client.post('/places/za/works/link-references', {
+            'works': [doc.work.pk],
+            'link_refs': '1',
+        })
+        self.assertEqual(response.status_code, 200)
+
+        job = LinkReferencesJob.objects.get()
+        self.assertEqual(job.state, LinkReferencesJob.PENDING)
+        self.assertIn(doc.pk, job.document_ids)
+
+        response = self.client.get(f'/places/za/works/link-references/{job.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'hx-trigger="every 2s"')
+
+        # run it in chunks, as the background task would
+        job.CHUNK_SIZE = 1
+        while job.run_chunk() is not None:
+            job.refresh_from_db()
+            self.assertEqual(job.state, LinkReferencesJob.RUNNING)
+        job.refresh_from_db()
+        self.assertEqual(job.state, LinkReferencesJob.DONE)
+        self.assertEqual(job.n_done, job.n_total)
+        self.assertEqual(100, job.progress)
+
+        response = self.client.get(f'/places/za/works/link-references/{job.pk}')
+        self.assertNotContains(response, 'hx-trigger="every 2s"')
+
+    def test_link_refs_job_chunks(self):
+        doc_ids = list(Document.objects.undeleted().order_by('pk').values_list('pk', flat=True)[:2])
+        job = LinkReferencesJob.objects.create(place='za', document_ids=doc_ids)
+        job.CHUNK_SIZE = 1
+        other = LinkReferencesJob.objects.get(pk=job.pk)
+        other.CHUNK_SIZE = 1
+
+        # tasks running in parallel claim different chunks
+        self.assertEqual(0, job.claim_chunk())
+        self.assertEqual(1, other.claim_chunk())
+        self.assertIsNone(job.claim_chunk())
+
+        # a document that is processed twice is only counted once
+        job.finish_document(0, 0, True, False)
+        job.finish_document(0, 0, True, False)
+        job.refresh_from_db()
+        self.assertEqual((1, 1, {'0': 1}), (job.n_done, job.n_changed, job.chunks_progress))
+        self.assertEqual(LinkReferencesJob.RUNNING, job.state)
+
+        other.finish_document(1, 0, False, False)
+        job.refresh_from_db()
+        self.assertEqual(LinkReferencesJob.DONE, job.state)
+        self.assertEqual(2, job.n_done)
+
+    def test_link_refs_job_stale_claim(self):
+        doc_ids = list(Document.objects.undeleted().order_by('pk').values_list('pk', flat=True)[:2])
+        job = LinkReferencesJob.objects.create(place='za', document_ids=doc_ids)
+
+        # a task claims the first chunk and dies without finishing it
+        dead = LinkReferencesJob.objects.get(pk=job.pk)
+        dead.CHUNK_SIZE = 1
+        self.assertEqual(0, dead.claim_chunk())
+
+        # another task finishes the other chunk, and must run again once the dead task's claim goes stale
+        run_task = tasks.link_references.task_function
+        with patch.object(LinkReferencesJob, 'CHUNK_SIZE', 1), \
+                patch.object(LinkReferencesJob, 'link_document', return_value=True), \
+                patch('indigo_api.tasks.link_references') as link_references:
+            run_task(job.pk)
+            link_references.assert_called_once()
+            self.assertEqual(job.pk, link_references.call_args.args[0])
+            delay = link_references.call_args.kwargs['schedule']
+            self.assertGreater(delay, LinkReferencesJob.CLAIM_TIMEOUT.total_seconds() - 60)
+            self.assertLessEqual(delay, LinkReferencesJob.CLAIM_TIMEOUT.total_seconds())
+
+            job.refresh_from_db()
+            self.assertEqual(LinkReferencesJob.RUNNING, job.state)
+            self.assertEqual(1, job.n_done)
+
+            # once the claim is stale, the chunk is processed again
+            stale = timezone.now() - LinkReferencesJob.CLAIM_TIMEOUT - timedelta(minutes=1)
+            job.chunks_claimed['0'] = stale.isoformat()
+            job.save()
+            link_references.reset_mock()
+            run_task(job.pk)
+            link_references.assert_not_called()
+
+        job.refresh_from_db()
+        self.assertEqual(LinkReferencesJob.DONE, job.state)
+        self.assertEqual((2, 2, 0), (job.n_done, job.n_changed, job.n_failed))
+
 
 @override_settings(STORAGES=TEST_STORAGES)
 class PlacesWebTest(WebTest):
@@ -141,6 +141,25 @@ class WorksTest(testcases.TestCase):
         response = self.client.post('/works/akn/za/act/2014/10/revisions/%s/restore' % version.id)
         self.assertEqual(response.status_code, 302)
 
+    def test_version_change_summaries(self):
+        work = Work.objects.get(pk=1)
+        with reversion.revisions.create_revision():
+            work.title = 'first title'
+            work.save()
+        with reversion.revisions.create_revision():
+            work.title = 'second title'
+            work.save()
+
+        version = work.versions().select_related('change_summary').first()
+        self.assertEqual([{
+            'field': 'title', 'path': '/title', 'old': 'first title', 'new': 'second title',
+        }], version.change_summary.changes)
+        self.assertEqual(work.versions()[1].pk, version.change_summary.previous_version_id)
+
+        response = self.client.get('/works/akn/za/act/2014/10/revisions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'second title')
+
     def test_create_new_pit_with_existing(self):
         response = self.client.post('/works/akn/za/act/2014/10/points-in-time/new', {
             'expression_date': '2019-01-01',
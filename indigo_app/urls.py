@@ -32,6 +32,7 @@ urlpatterns = [
     path('places/<str:place>/works/approve', places.WorkBulkApproveView.as_view(), name='place_works_approve'),
     path('places/<str:place>/works/unapprove', places.WorkBulkUnapproveView.as_view(), name='place_works_unapprove'),
     path('places/<str:place>/works/link-references', places.WorkBulkLinkRefsView.as_view(), name='place_works_link_refs'),
+    path('places/<str:place>/works/link-references/<int:pk>', places.WorkBulkLinkRefsStatusView.as_view(), name='place_works_link_refs_status'),
     path('places/<str:place>/works/chooser', places.WorkChooserView.as_view(), name='place_work_chooser'),
     path('places/<str:place>/works/chooser/list', cache_page(30)(places.WorkChooserListView.as_view()), name='place_work_chooser_list'),
     path('places/<str:place>/works/detail/<int:pk>', places.WorkDetailView.as_view(), name='place_works_work_detail'),
@@ -127,7 +127,7 @@ class ChooseDocumentProvisionView(DocumentDetailViewBase):
                 for descendant in descend_toc_dict(item['children']):
                     yield descendant
 
-        toc = [t.as_dict() for t in self.object.table_of_contents()]
+        toc = self.object.table_of_contents_json()
         for elem in descend_toc_dict(toc):
             elem['href'] = reverse('document_provision', kwargs={'doc_id': int(self.kwargs['doc_id']), 'eid': elem['id']})
         return json.dumps(toc)
@@ -209,7 +209,7 @@ class DocumentProvisionEmbedView(AsyncDispatchMixin, DocumentDetailViewBase):
     def get_object(self, queryset=None):
         document = super().get_object(queryset)
 
-        self.portion_element = document.doc.get_portion_element(self.kwargs['eid'])
+        self.portion_element = document.get_portion_element(self.kwargs['eid'])
         if self.portion_element is None:
             raise Http404()
 
@@ -231,7 +231,7 @@ class DocumentProvisionEmbedView(AsyncDispatchMixin, DocumentDetailViewBase):
 
             old_html = ""
             if old_document:
-                old_element = old_document.doc.get_portion_element(self.kwargs['eid'])
+                old_element = old_document.get_portion_element(self.kwargs['eid'])
                 if old_element is not None:
                     old_xml = etree.tostring(old_element, encoding='unicode')
                     old_xml = differ.preprocess_xml_str(old_xml)
@@ -8,7 +8,7 @@ from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.db.models import Count, Subquery, IntegerField, OuterRef
-from django.shortcuts import redirect
+from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
@@ -17,12 +17,10 @@ from django.views.generic.list import MultipleObjectMixin
 from django_htmx.http import push_url
 from lxml import etree
 
-from docpipe.xmlutils import unwrap_element
-from indigo.analysis.refs.base import markup_document_refs
 from indigo.plugins import plugins
 from indigo.view_mixins import AtomicPostMixin
 from indigo_api.models import Country, Task, Work, Subtype, Locality, TaskLabel, Document, TaxonomyTopic, AllPlace, \
-    SavedSearch, PlaceSettings
+    SavedSearch, PlaceSettings, LinkReferencesJob
 from indigo_api.timeline import describe_publication_event
 from indigo_app.forms import WorkFilterForm, PlaceSettingsForm, PlaceUsersForm, ExplorerForm, WorkBulkActionsForm, \
     WorkChooserForm, WorkBulkUpdateForm, WorkBulkApproveForm, WorkBulkUnapproveForm, WorkBulkLinkRefsForm
@@ -742,37 +740,37 @@ class WorkBulkLinkRefsView(WorkBulkActionBase):
 
     def form_valid(self, form):
         if form.cleaned_data.get("link_refs"):
-            n_docs = 0
-            n_changed = 0
-            for work in form.cleaned_data["works"]:
-                for doc in Document.objects.undeleted().filter(work=work):
-                    n_docs += 1
-                    old_content = doc.content
-                    root = etree.fromstring(doc.content)
-
-                    if form.cleaned_data["unlink"]:
-                        # remove existing refs
-                        for ref in root.xpath('.//a:ref[starts-with(@href, "/") or starts-with(@href, "#")]',
-                                              namespaces={'a': doc.doc.namespace}):
-                            unwrap_element(ref)
-                        doc.content = etree.tostring(root, encoding='unicode')
-
-                    markup_document_refs(doc)
-
-                    if doc.content != old_content:
-                        doc.save_with_revision(user=self.request.user, comment='Re-link refs')
-                        n_changed += 1
-
-            messages.success(
-                self.request,
-                _("Linked references for %(n_docs)s documents, with %(n_changed)s documents changed.") % {
-                    "n_docs": n_docs,
-                    "n_changed": n_changed,
-                })
-            return redirect(self.request.headers["Referer"])
+            # link references in the background, in chunks; the modal polls the job's status
+            doc_ids = Document.objects.undeleted()\
+                .filter(work__in=form.cleaned_data["works"])\
+                .order_by('pk')\
+                .values_list('pk', flat=True)
+            job = LinkReferencesJob.objects.create(
+                place=self.place.place_code,
+                document_ids=list(doc_ids),
+                unlink=bool(form.cleaned_data["unlink"]),
+                created_by_user=self.request.user,
+            )
+            job.queue()
+            return render(self.request, "indigo_app/place/_bulk_link_refs_progress.html", {
+                "job": job,
+                "place": self.place,
+            })
         return self.form_invalid(form)
 
 
+class WorkBulkLinkRefsStatusView(PlaceViewBase, DetailView):
+    """ Progress of a background LinkReferencesJob, polled by the bulk link references modal. """
+    model = LinkReferencesJob
+    context_object_name = "job"
+    template_name = "indigo_app/place/_bulk_link_refs_status.html"
+    permission_required = ('indigo_api.view_country', 'indigo_api.change_work')
+    allow_all_place = True
+
+    def get_queryset(self):
+        return super().get_queryset().filter(place=self.place.place_code, created_by_user=self.request.user)
+
+
 class WorkChooserView(PlaceViewBase, ListView):
     """This renders the filter form and the first page of results for the work chooser modal.
     HTMX reloads this view when filtering criteria are changed.
@@ -787,7 +787,7 @@ class WorkVersionsView(WorkViewBase, MultipleObjectMixin, DetailView):
         actions = actions_for_objects(
             [a for a in self.work.amendments.all()] + [c for c in self.work.commencements.all()] + [self.work]
         )
-        versions = self.work.versions().defer('serialized_data').all()
+        versions = self.work.versions().defer('serialized_data').select_related('change_summary').all()
         task_actions = self.get_task_actions()
         entries = sorted(chain(actions, versions, task_actions),
                          key=lambda x: x.revision.date_created if hasattr(x, 'revision') else x.timestamp,
@@ -1051,7 +1051,7 @@ class WorkPopupView(WorkViewBase, DetailView):
                 .first()
             )
             if doc:
-                portion = doc.doc.get_portion_element(self.frbr_uri.portion)
+                portion = doc.get_portion_element(self.frbr_uri.portion)
                 if portion:
                     context["portion_html"] = doc.element_to_html(portion)
 
@@ -1,4 +1,6 @@
+import io
 import tempfile
+import zipfile
 from datetime import date
 from unittest.mock import patch
 
@@ -7,7 +9,7 @@ from django.conf import settings
 from rest_framework.test import APITestCase
 
 from indigo_api.exporters import PDFExporter
-from indigo_api.models import Country, Language, Work
+from indigo_api.models import Country, Document, Language, Work, WorkTimeline
 from indigo_app.tests.utils import TEST_STORAGES
 from languages_plus.models import Language as MasterLanguage
 
@@ -72,6 +74,15 @@ class ContentAPIV2TestMixin:
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['type_name'], 'Act')
 
+    def test_published_shared_cache(self):
+        content_api = {**settings.INDIGO['CONTENT_API'], 'CACHE_MAX_AGE': 300}
+        with override_settings(INDIGO={**settings.INDIGO, 'CONTENT_API': content_api}):
+            response = self.client.get(self.api_path + '/akn/za/act/2014/10.xml')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=300', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
     def test_published_xml(self):
         response = self.client.get(self.api_path + '/akn/za/act/2014/10.xml')
         self.assertEqual(response.status_code, 200)
@@ -83,6 +94,36 @@ class ContentAPIV2TestMixin:
         self.assertEqual(response.accepted_media_type, 'application/xml')
         self.assertIn('<akomaNtoso', response.content.decode('utf-8'))
 
+    def test_published_conditional_get(self):
+        url = self.api_path + '/akn/za/act/2014/10.xml'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        # by default, only the client may cache the response, and must revalidate it
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(b'', response.content)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(b'', response.content)
+
+        # different formats have different etags
+        response = self.client.get(self.api_path + '/akn/za/act/2014/10.json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(etag, response['ETag'])
+
+        # changing the document changes the etag
+        doc = Document.objects.undeleted().published().filter(frbr_uri='/akn/za/act/2014/10').first()
+        doc.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(etag, response['ETag'])
+
     @patch.object(PDFExporter, 'render', return_value='pdf-content')
     def test_published_pdf(self, mock):
         response = self.client.get(self.api_path + '/akn/za/act/2014/10.pdf')
@@ -353,6 +394,23 @@ class ContentAPIV2TestMixin:
           <span class="akn-p">tester😀</span><span class="akn-p"> </span><span class="akn-p"><img class="akn-img" data-src="media/test-image.png" src="media/test-image.png"/></span>
         </span></section>''')
 
+    def test_published_portion_fragment(self):
+        # saving a published document stores its fragments
+        doc = Document.objects.undeleted().published().get(frbr_uri='/akn/za/act/2014/10')
+        doc.save()
+        self.assertEqual(['sec_1'], [f.portion for f in doc.fragments.all()])
+
+        # which are used rather than parsing the whole document
+        with patch.object(Document, 'get_portion_element', side_effect=AssertionError):
+            response = self.client.get(self.api_path + '/akn/za/act/2014/10/eng/!main~sec_1.xml')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.content.decode('utf-8').startswith(
+                '<section xmlns="http://docs.oasis-open.org/legaldocml/ns/akn/3.0" eId="sec_1"><num>1.</num>'))
+
+            response = self.client.get(self.api_path + '/akn/za/act/2014/10/eng/!main~sec_1.html')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('<section class="akn-section" id="sec_1" data-eId="sec_1">', response.content.decode('utf-8'))
+
     def test_at_expression_date(self):
         response = self.client.get(self.api_path + '/akn/za/act/2010/1/eng@2011-01-01.json')
         self.assertEqual(response.status_code, 200)
@@ -540,6 +598,13 @@ class ContentAPIV2TestMixin:
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.accepted_media_type, 'application/zip')
 
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zf:
+            names = zf.namelist()
+            self.assertTrue(names)
+            self.assertTrue(all(n.startswith('2001-') for n in names))
+            main = [n for n in names if n.endswith('/main.xml')][0]
+            self.assertIn(b'<akomaNtoso', zf.read(main))
+
     def test_published_frbr_urls(self):
         response = self.client.get(self.api_path + '/akn/za/act/2014/10/eng@2014-02-12.json')
         self.assertEqual(response.status_code, 200)
@@ -726,6 +791,19 @@ class ContentAPIV2TestMixin:
                  'note': ''}]
         }], timeline)
 
+    def test_timeline_stored(self):
+        # the first request stores the timeline, and later requests use it
+        expected = self.client.get(self.api_path + '/akn/za/act/2010/1/timeline.json').json()
+        self.assertTrue(WorkTimeline.objects.filter(work__frbr_uri='/akn/za/act/2010/1').exists())
+
+        with patch('indigo_api.timeline.get_timeline') as get_timeline, \
+                patch('indigo_api.models.timelines.get_timeline') as get_stored_timeline:
+            response = self.client.get(self.api_path + '/akn/za/act/2010/1/timeline.json')
+            get_timeline.assert_not_called()
+            get_stored_timeline.assert_not_called()
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(expected, response.json())
+
     def test_published_different_default_language(self):
         za = Country.for_code('za')
         fr, _ = Language.objects.get_or_create(language=MasterLanguage.objects.get(pk='fr'))
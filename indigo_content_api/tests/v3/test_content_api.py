@@ -1,7 +1,14 @@
-from django.test.utils import override_settings
+import json
+from datetime import date
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import override_settings, CaptureQueriesContext
 from rest_framework.test import APITestCase
 
+from indigo_api.models import Document, ExpressionChange
 from indigo_content_api.tests.v2.test_content_api import ContentAPIV2TestMixin
+from indigo_content_api.v2.views import ExpressionListMixin
 from indigo_app.tests.utils import TEST_STORAGES
 
 
@@ -76,6 +83,130 @@ class ContentAPIV3TestMixin(ContentAPIV2TestMixin):
         self.assertEqual('application/json', response.accepted_media_type)
         self.assertGreaterEqual(len(response.data['results']), 1)
 
+    def test_place_work_expressions_cursor(self):
+        expected = self.client.get(self.api_path + '/places/za/work-expressions.json').data['results']
+        self.assertGreater(len(expected), 1)
+
+        # page through one at a time
+        results = []
+        url = self.api_path + '/places/za/work-expressions.json?pagination=cursor&page_size=1'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(200, response.status_code)
+            self.assertNotIn('count', response.data)
+            self.assertEqual(1, len(response.data['results']))
+            results.extend(response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(sorted(r['url'] for r in expected), sorted(r['url'] for r in results))
+
+    def test_place_work_expressions_ndjson(self):
+        # the order in which cursor pagination pages through the expressions
+        expected = []
+        url = self.api_path + '/places/za/work-expressions.json?pagination=cursor&page_size=1'
+        while url:
+            response = self.client.get(url)
+            expected.extend(r['url'] for r in response.data['results'])
+            url = response.data['next']
+        self.assertGreater(len(expected), 1)
+
+        # stream in chunks of one, using the test database connection
+        with patch.object(ExpressionListMixin, 'ndjson_chunk_size', 1), \
+                patch.object(ExpressionListMixin, 'ndjson_database', 'default'):
+            response = self.client.get(self.api_path + '/places/za/work-expressions.json?stream=ndjson')
+            self.assertEqual(200, response.status_code)
+            self.assertEqual('application/x-ndjson', response['Content-Type'])
+            content = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertTrue(content.endswith('\n'))
+        results = [json.loads(line) for line in content.splitlines()]
+        # the stream continues through the same (updated_at, id) order as the cursor
+        self.assertEqual(expected, [r['url'] for r in results])
+
+    def test_place_work_expressions_queries(self):
+        # the number of queries mustn't grow with the number of expressions listed
+        with CaptureQueriesContext(connection) as full:
+            response = self.client.get(self.api_path + '/places/za/work-expressions.json')
+        self.assertGreater(len(response.data['results']), 1)
+
+        # adding an expression to a full listing doesn't change the number of queries
+        doc = Document.objects.get(frbr_uri='/akn/za/act/2010/1', expression_date='2012-02-02')
+        doc.pk = None
+        doc.expression_date = date(2013, 3, 3)
+        doc.save()
+
+        with CaptureQueriesContext(connection) as more:
+            response = self.client.get(self.api_path + '/places/za/work-expressions.json')
+        self.assertIn('/akn/za/act/2010/1/eng@2013-03-03', [r['expression_frbr_uri'] for r in response.data['results']])
+        self.assertEqual(len(full), len(more))
+
+    def test_expression_detail_queries(self):
+        # the number of queries mustn't grow with the number of amendments
+        with CaptureQueriesContext(connection) as one:
+            response = self.client.get(self.api_path + '/akn/za/act/2010/1/eng@2011-01-01.json')
+        self.assertEqual(1, len(response.data['amendments']))
+
+        with CaptureQueriesContext(connection) as two:
+            response = self.client.get(self.api_path + '/akn/za/act/2010/1/eng@2012-02-02.json')
+        self.assertEqual(2, len(response.data['amendments']))
+
+        self.assertEqual(len(one), len(two))
+
+    def test_work_expression_changes(self):
+        doc = Document.objects.undeleted().published().filter(frbr_uri__startswith='/akn/za/').first()
+        # changes are recorded when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            doc.draft = True
+            doc.save()
+            doc.draft = False
+            doc.save()
+
+        response = self.client.get(self.api_path + '/places/za/work-expression-changes.json')
+        self.assertEqual(200, response.status_code)
+        events = [(c['event'], c['expression_frbr_uri']) for c in response.data['results']]
+        self.assertEqual([
+            ('unpublished', doc.expression_frbr_uri),
+            ('published', doc.expression_frbr_uri),
+        ], events[-2:])
+        self.assertIsNone(response.data['results'][-2]['url'])
+        self.assertIsNotNone(response.data['results'][-1]['url'])
+
+        # nothing newer than the cursor
+        cursor = response.data['cursor']
+        response = self.client.get(self.api_path + f'/work-expression-changes.json?since={cursor}')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([], response.data['results'])
+        self.assertEqual(cursor, response.data['cursor'])
+
+        # unknown place
+        response = self.client.get(self.api_path + '/places/xx/work-expression-changes.json')
+        self.assertEqual(404, response.status_code)
+
+    def test_work_expression_changes_only_for_changes(self):
+        doc = Document.objects.undeleted().published().filter(frbr_uri__startswith='/akn/za/').first()
+        latest = ExpressionChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # saving a work without changing it doesn't change its expressions
+            doc.work.save()
+            # a document loaded without its visibility is still updated, not published
+            deferred = Document.objects.defer('draft', 'deleted').get(pk=doc.pk)
+            deferred.save()
+
+        events = list(ExpressionChange.objects.filter(id__gt=latest).values_list('event', 'document_id'))
+        self.assertEqual([('updated', doc.pk)], events)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            work = doc.work
+            work.title = work.title + ' (changed)'
+            work.save()
+        self.assertTrue(ExpressionChange.objects.filter(id__gt=latest, event='updated', document_id=doc.pk)
+                        .count() > 1)
+
+    def test_work_expressions_bad_cursor(self):
+        response = self.client.get(self.api_path + '/work-expressions.json?pagination=cursor&cursor=foo')
+        self.assertEqual(404, response.status_code)
+
 
 @override_settings(STORAGES=TEST_STORAGES)
 class ContentAPIV3Test(ContentAPIV3TestMixin, APITestCase):
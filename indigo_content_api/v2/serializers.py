@@ -267,7 +267,10 @@ class PublishedDocumentSerializer(DocumentSerializer, PublishedDocUrlMixin):
     def get_points_in_time(self, doc):
         result = []
 
-        expressions = doc.work.expressions().published()
+        # listings prefetch these, see DocumentQuerySet.for_listing
+        expressions = getattr(doc.work, 'published_expressions', None)
+        if expressions is None:
+            expressions = doc.work.expressions().published()
         for date, group in groupby(expressions, lambda e: e.expression_date):
             result.append({
                 'date': datestring(date),
@@ -292,8 +295,12 @@ class PublishedDocumentSerializer(DocumentSerializer, PublishedDocUrlMixin):
         return self.context.get('url', self.published_doc_url(doc, self.context['request']))
 
     def get_taxonomy_topics(self, doc) -> List[str]:
-        from indigo_api.serializers import WorkSerializer
-        return WorkSerializer().get_taxonomy_topics(doc.work)
+        # look up the public root topics once, rather than for each topic of each document
+        if 'public_taxonomy_root_paths' not in self.context:
+            self.context['public_taxonomy_root_paths'] = set(
+                TaxonomyTopic.get_public_root_nodes().values_list('path', flat=True))
+        roots = self.context['public_taxonomy_root_paths']
+        return [t.slug for t in doc.work.taxonomy_topics.all() if t.path[:t.steplen] in roots]
 
     @extend_schema_field(RelatedWorkSerializer)
     def get_parent_work(self, doc):
@@ -1,18 +1,25 @@
+import hashlib
+import json
 import re
 
-from django.http import Http404
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from rest_framework import mixins, viewsets, renderers
 from rest_framework.authentication import SessionAuthentication, TokenAuthentication
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Q, Max
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 from cobalt import FrbrUri
 
 from indigo_api.models import Attachment, Country, Document, TaxonomyTopic, Locality
+from indigo_api.utils import KeysetPagination
 from indigo_api.renderers import AkomaNtosoRenderer, PDFRenderer, EPUBRenderer, HTMLRenderer, ZIPRenderer
 from indigo_api.views.attachments import view_attachment
 from indigo_api.views.documents import DocumentViewMixin
@@ -55,6 +62,51 @@ class PlaceAPIBase(ContentAPIBase):
         super().check_permissions(request)
 
 
+class ExpressionListMixin:
+    """ Listing of work expressions that supports two additional modes, for syncing large numbers of expressions:
+
+    * keyset (cursor) pagination, with `?pagination=cursor`, ordered by `(updated_at, id)`
+    * streaming all results as newline-delimited JSON, with `?stream=ndjson`, ordered by `(updated_at, id)`
+
+    In all cases, the related details needed to serialize each expression are prefetched in bulk.
+    """
+    keyset_ordering = KeysetPagination.ordering
+    ndjson_chunk_size = 200
+    # the direct connection supports server-side cursors
+    ndjson_database = 'direct'
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream') == 'ndjson':
+            return self.stream_ndjson(self.filter_queryset(self.get_queryset()))
+        return super().list(request, *args, **kwargs)
+
+    def paginate_queryset(self, queryset):
+        if self.request.query_params.get('pagination') == 'cursor':
+            self._paginator = KeysetPagination()
+            queryset = self.keyset_queryset(queryset)
+        return super().paginate_queryset(queryset.for_listing())
+
+    def keyset_queryset(self, queryset):
+        """ Ordering by (updated_at, id) can't be combined with the DISTINCT ON used to select the latest
+        expressions, so select those in a subquery.
+        """
+        if queryset.query.distinct_fields:
+            queryset = self.get_keyset_base_queryset().filter(pk__in=queryset.values('pk'))
+        return queryset
+
+    def get_keyset_base_queryset(self):
+        return PublishedDocumentDetailView.queryset
+
+    def stream_ndjson(self, queryset):
+        queryset = self.keyset_queryset(queryset).order_by(*self.keyset_ordering).for_listing()
+
+        def lines():
+            for document in queryset.using(self.ndjson_database).iterator(chunk_size=self.ndjson_chunk_size):
+                yield json.dumps(self.get_serializer(document).data, cls=JSONEncoder) + '\n'
+
+        return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+
 class FrbrUriViewMixin(PlaceAPIBase):
     """ An API view that uses a frbr_uri kwarg parameter to identify a work or document.
 
@@ -147,7 +199,8 @@ open_api_frbr_uri_param = OpenApiParameter(
                         "Default: 1. Only applicable to the html format."),
     ],
 )
-class PublishedDocumentDetailView(DocumentViewMixin,
+class PublishedDocumentDetailView(ExpressionListMixin,
+                                  DocumentViewMixin,
                                   FrbrUriViewMixin,
                                   mixins.RetrieveModelMixin,
                                   mixins.ListModelMixin,
@@ -190,19 +243,32 @@ class PublishedDocumentDetailView(DocumentViewMixin,
         # these are made available to the renderer
         self.component = self.frbr_uri.work_component or 'main'
         self.portion = self.frbr_uri.portion
-        format = self.request.accepted_renderer.format
 
         # get the document
         document = self.get_document()
 
+        # return a 304 if the client's copy is still current, before doing any parsing or rendering
+        etag, last_modified = self.get_validators(document)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.retrieve_document(request, document)
+        self.set_cache_headers(response, etag, last_modified)
+        return response
+
+    def retrieve_document(self, request, document):
+        format = self.request.accepted_renderer.format
+
         if self.portion:
-            # get the component, if any, and then the portion within that component
-            component = None
-            if self.frbr_uri.work_component:
-                component = document.doc.components().get(self.frbr_uri.work_component)
-                if component is None:
-                    raise Http404
-            self.element = document.doc.get_portion_element(self.portion, component)
+            # use the stored fragment if there is one, which avoids parsing the whole document
+            self.element = document.get_stored_fragment(self.portion, self.frbr_uri.work_component)
+            if self.element is None:
+                # get the component, if any, and then the portion within that component
+                component = None
+                if self.frbr_uri.work_component:
+                    component = document.doc.components().get(self.frbr_uri.work_component)
+                    if component is None:
+                        raise Http404
+                self.element = document.get_portion_element(self.portion, component)
         else:
             # special cases of the entire document
 
@@ -216,20 +282,73 @@ class PublishedDocumentDetailView(DocumentViewMixin,
                 return Response(serializer.data)
 
             # the item we're interested in
-            self.element = document.doc.components().get(self.component)
+            self.element = None
+            if self.component != 'main':
+                self.element = document.get_stored_fragment('', self.component)
+            if self.element is None:
+                self.element = document.doc.components().get(self.component)
 
         formats = [r.format for r in self.renderer_classes]
         if self.element is not None and format in formats:
+            if format == 'zip':
+                return self.zip_response(document)
             return Response(document)
 
         raise Http404
 
+    def zip_response(self, data):
+        """ Stream a zip file of one or more documents, rather than building it in memory.
+        """
+        response = ZIPRenderer().streaming_response(data, self)
+        # match what DRF sets on its own responses
+        response.accepted_renderer = self.request.accepted_renderer
+        response.accepted_media_type = self.request.accepted_media_type
+        return response
+
+    def get_validators(self, document):
+        """ The ETag and last modified timestamp for a document in the requested format. Documents include
+        details of the work and of its other expressions (such as points in time), so they change if either of
+        those change.
+        """
+        last_modified = max(filter(None, [
+            document.updated_at,
+            document.work.updated_at,
+            Document.objects.filter(work=document.work).aggregate(Max('updated_at'))['updated_at__max'],
+        ]))
+
+        # the full path includes the API version, FRBR URI, format suffix and query parameters
+        parts = [
+            str(document.pk), last_modified.isoformat(),
+            self.request.accepted_renderer.format, self.request.get_full_path(),
+        ]
+        etag = hashlib.md5(':'.join(parts).encode('utf-8')).hexdigest()
+
+        # HTTP dates have a resolution of whole seconds
+        return quote_etag(etag), int(last_modified.timestamp())
+
+    def set_cache_headers(self, response, etag, last_modified):
+        if response.status_code not in [200, 304]:
+            return
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # responses depend on the user's permissions, so shared caches must store them per user
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+        max_age = settings.INDIGO['CONTENT_API'].get('CACHE_MAX_AGE', 0)
+        if max_age:
+            # opt-in: shared caches must honour Vary, or they'll serve restricted content to other users
+            patch_cache_control(response, public=True, max_age=max_age)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+
     def list(self, request):
         if self.request.accepted_renderer.format in ['pdf', 'epub', 'zip']:
             # NB: don't try to sort in the db, that's already sorting to
             # return the latest expression of each doc. Sort here instead.
             documents = sorted(self.filter_queryset(self.get_queryset()).all(), key=lambda d: d.title)
             # bypass pagination and serialization
+            if self.request.accepted_renderer.format == 'zip':
+                return self.zip_response(documents)
             return Response(documents)
 
         elif self.format_kwarg and self.format_kwarg != "json":
@@ -331,21 +450,24 @@ class PublishedDocumentTOCView(PublishedDocumentExtraDetailViewBase, PublishedDo
 
     def list(self, request, **kwargs):
         document = self.get_document()
-        uri = document.doc.frbr_uri
+        # use the document's URI rather than parsing the XML
+        uri = document.expression_uri.clone()
         uri.expression_date = self.frbr_uri.expression_date
         return Response({'toc': self.table_of_contents(document, uri)})
 
     def table_of_contents(self, document, uri=None):
+        # this is the stored TOC, so the XML doesn't need to be parsed
         toc = super().table_of_contents(document, uri)
 
         # this updates the TOC entries by adding a 'url' component
         # based on the document's URI and the path of the TOC subcomponent
-        uri = uri or document.doc.frbr_uri
+        uri = uri or document.expression_uri.clone()
+        non_eid_portions = document.cobalt_class.non_eid_portions
 
         def add_url(item):
             uri.work_component = item['component']
             # if the item doesn't normally have an eid, use the type name as the portion, otherwise use the eid
-            uri.portion = item['type'] if item['type'] in document.doc.non_eid_portions else item.get('id')
+            uri.portion = item['type'] if item['type'] in non_eid_portions else item.get('id')
             item['url'] = self.published_doc_url(
                 document, self.request, frbr_uri=uri.expression_uri()
             )
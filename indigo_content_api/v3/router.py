@@ -2,7 +2,7 @@ from rest_framework.routers import DefaultRouter
 
 from indigo_content_api.v2.router import router_patterns as router_patterns_v2
 from indigo_content_api.v3.views import TaxonomyTopicWorkExpressionsView, WorkExpressionsViewSet, PlaceViewSet, \
-    PlaceWorkExpressionsView
+    PlaceWorkExpressionsView, ExpressionChangesView, PlaceExpressionChangesView
 
 
 router_patterns = router_patterns_v2 + [
@@ -11,6 +11,8 @@ router_patterns = router_patterns_v2 + [
     (r'places/(?P<frbr_uri_code>[^/.]+)/work-expressions', PlaceWorkExpressionsView, 'places-work-expressions'),
     (r'taxonomy-topics/(?P<slug>[^/.]+)/work-expressions', TaxonomyTopicWorkExpressionsView, 'taxonomy_topic-work-expressions'),
     ('work-expressions', WorkExpressionsViewSet, 'work_expression'),
+    (r'places/(?P<frbr_uri_code>[^/.]+)/work-expression-changes', PlaceExpressionChangesView, 'places-work-expression-changes'),
+    ('work-expression-changes', ExpressionChangesView, 'work_expression_change'),
 ]
 
 
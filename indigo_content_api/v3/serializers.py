@@ -1,4 +1,8 @@
-from indigo_content_api.v2.serializers import PublishedDocumentSerializer as PublishedDocumentSerializerV2
+from rest_framework import serializers
+
+from indigo_api.models import ExpressionChange
+from indigo_content_api.v2.serializers import PublishedDocumentSerializer as PublishedDocumentSerializerV2, \
+    PublishedDocUrlMixin
 
 
 class PublishedDocumentSerializerV3(PublishedDocumentSerializerV2):
@@ -9,3 +13,18 @@ class PublishedDocumentSerializerV3(PublishedDocumentSerializerV2):
         model = PublishedDocumentSerializerV2.Meta.model
         fields = tuple(x for x in PublishedDocumentSerializerV2.Meta.fields if x not in ['commencements'])
         read_only_fields = fields
+
+
+class ExpressionChangeSerializer(serializers.ModelSerializer, PublishedDocUrlMixin):
+    """ A change to a published work expression. """
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExpressionChange
+        fields = ('id', 'event', 'frbr_uri', 'expression_frbr_uri', 'place', 'created_at', 'url')
+        read_only_fields = fields
+
+    def get_url(self, instance) -> str:
+        """ URL of the expression, if it is still published. """
+        if instance.event in [ExpressionChange.PUBLISHED, ExpressionChange.UPDATED]:
+            return self.published_doc_url(None, self.context['request'], frbr_uri=instance.expression_frbr_uri)
@@ -1,14 +1,19 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import get_object_or_404
 from django.http import Http404
+from rest_framework.exceptions import NotFound
 from rest_framework.mixins import ListModelMixin
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.viewsets import GenericViewSet
 from rest_framework import mixins, viewsets
 
-from indigo_api.models import TaxonomyTopic, Work, Country
-from indigo_content_api.v2.views import PublishedDocumentDetailView as PublishedDocumentDetailViewV2, ContentAPIBase
+from indigo_api.models import TaxonomyTopic, Work, Country, ExpressionChange
+from indigo_content_api.v2.views import PublishedDocumentDetailView as PublishedDocumentDetailViewV2, ContentAPIBase, \
+    ExpressionListMixin
 
-from .serializers import PublishedDocumentSerializerV3
+from .serializers import PublishedDocumentSerializerV3, ExpressionChangeSerializer
 from ..v2.serializers import PlaceSerializer
 
 
@@ -29,7 +34,7 @@ class PlaceViewSet(ContentAPIBase, mixins.ListModelMixin, mixins.RetrieveModelMi
         return locality or country
 
 
-class PlaceWorkExpressionsView(ContentAPIBase, ListModelMixin, GenericViewSet):
+class PlaceWorkExpressionsView(ExpressionListMixin, ContentAPIBase, ListModelMixin, GenericViewSet):
     """ List of work expressions for a place. """
     filter_backends = PublishedDocumentDetailViewV3.filter_backends
     filterset_fields = PublishedDocumentDetailViewV3.filterset_fields
@@ -58,7 +63,7 @@ class PlaceWorkExpressionsView(ContentAPIBase, ListModelMixin, GenericViewSet):
         return super().filter_queryset(queryset)
 
 
-class WorkExpressionsViewSet(ContentAPIBase, ListModelMixin, GenericViewSet):
+class WorkExpressionsViewSet(ExpressionListMixin, ContentAPIBase, ListModelMixin, GenericViewSet):
     """ List of work expressions across all places. """
     filter_backends = PublishedDocumentDetailViewV3.filter_backends
     filterset_fields = PublishedDocumentDetailViewV3.filterset_fields
@@ -70,7 +75,7 @@ class WorkExpressionsViewSet(ContentAPIBase, ListModelMixin, GenericViewSet):
         return PublishedDocumentDetailViewV3.queryset
 
 
-class TaxonomyTopicWorkExpressionsView(ContentAPIBase, ListModelMixin, GenericViewSet):
+class TaxonomyTopicWorkExpressionsView(ExpressionListMixin, ContentAPIBase, ListModelMixin, GenericViewSet):
     """ List of work expressions for a taxonomy topic."""
     filter_backends = PublishedDocumentDetailViewV3.filter_backends
     filterset_fields = PublishedDocumentDetailViewV3.filterset_fields
@@ -97,3 +102,73 @@ class TaxonomyTopicWorkExpressionsView(ContentAPIBase, ListModelMixin, GenericVi
             works = Work.objects.filter(taxonomy_topics__path__startswith=self.taxonomy_topic.path).distinct("pk")
             queryset = queryset.filter(work__in=works)
         return super().filter_queryset(queryset)
+
+
+class ChangeFeedPagination(BasePagination):
+    """ Pages through a change feed in id order. The `since` parameter is the id of the last change the
+    consumer has seen, and the response includes the cursor to use for the next request.
+    """
+    page_size = 500
+    since_query_param = 'since'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.since = int(request.query_params.get(self.since_query_param) or 0)
+        except ValueError:
+            raise NotFound("Invalid cursor")
+
+        self.page = list(queryset.filter(id__gt=self.since).order_by('id')[:self.page_size])
+        return self.page
+
+    def get_paginated_response(self, data):
+        cursor = self.page[-1].id if self.page else self.since
+        # if this page is full, there may be more
+        next_url = None
+        if len(self.page) == self.page_size:
+            next_url = replace_query_param(self.request.build_absolute_uri(), self.since_query_param, cursor)
+        return Response({
+            'cursor': cursor,
+            'next': next_url,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['cursor', 'results'],
+            'properties': {
+                'cursor': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ExpressionChangesView(ContentAPIBase, ListModelMixin, GenericViewSet):
+    """ Ordered log of changes to published work expressions, across all places. Pass the `cursor` from the
+    previous response as `since` to get only newer changes.
+    """
+    queryset = ExpressionChange.objects.all()
+    serializer_class = ExpressionChangeSerializer
+    pagination_class = ChangeFeedPagination
+
+
+class PlaceExpressionChangesView(ExpressionChangesView):
+    """ Ordered log of changes to published work expressions for a place. Pass the `cursor` from the
+    previous response as `since` to get only newer changes.
+    """
+    def list(self, request, *args, **kwargs):
+        try:
+            country, locality = Country.get_country_locality(kwargs['frbr_uri_code'])
+        except ObjectDoesNotExist:
+            raise Http404()
+        self.place = locality or country
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # when drf-spectacular generates the schema, it doesn't have the place attribute
+        if not getattr(self, 'swagger_fake_view', False):
+            queryset = queryset.filter(place=self.place.place_code)
+        return queryset
@@ -1,8 +1,10 @@
+import argparse
 import sys
 
 from lxml import etree
 
 from .differ import AKNHTMLDiffer
+from .diff_pool import read_message, write_message
 from indigo.xmlutils import parse_html_str
 
 
@@ -14,18 +16,57 @@ def do_diff(html_one, html_two):
     return etree.tostring(diff, encoding='unicode')
 
 
+def run_worker(max_memory=None):
+    """ Diff pairs of HTML strings read from stdin, writing the diffs to stdout, until stdin is closed.
+    See indigo_lib.diff_pool.
+    """
+    if max_memory:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+
+    inf = sys.stdin.buffer
+    outf = sys.stdout.buffer
+    # stop anything else that's printed from corrupting the messages
+    sys.stdout = sys.stderr
+
+    while True:
+        message = read_message(inf)
+        if message is None:
+            break
+
+        try:
+            result = {'diff': do_diff(message['old'], message['new'])}
+        except MemoryError:
+            # the process may be in a bad state, let the pool replace it
+            write_message(outf, {'error': 'Out of memory'})
+            sys.exit(1)
+        except Exception as e:
+            result = {'error': f'{e.__class__.__name__}: {e}'}
+
+        write_message(outf, result)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        sys.stderr.write(
-            "Diffs two AKN HTML files and prints the diff to stdout.\n"
-            "Usage: python -m indigo_lib.diff_akn <file1.html> <file2.html>\n"
-        )
+    parser = argparse.ArgumentParser(
+        description="Diffs two AKN HTML files and prints the diff to stdout, or runs a diff worker "
+                    "(see indigo_lib.diff_pool).")
+    parser.add_argument('files', nargs='*', metavar='file.html')
+    parser.add_argument('--worker', action='store_true', help="Run as a diff worker")
+    parser.add_argument('--max-memory', type=int, help="Maximum bytes of memory for a worker")
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.max_memory)
+        sys.exit(0)
+
+    if len(args.files) != 2:
+        parser.print_usage(sys.stderr)
         sys.exit(1)
 
-    with open(sys.argv[1], "rt") as f:
+    with open(args.files[0], "rt") as f:
         html_one = f.read()
 
-    with open(sys.argv[2], "rt") as f:
+    with open(args.files[1], "rt") as f:
         html_two = f.read()
 
     print(do_diff(html_one, html_two))
@@ -0,0 +1,153 @@
+import json
+import logging
+import queue
+import struct
+import subprocess
+import threading
+
+log = logging.getLogger(__name__)
+
+# each message is a JSON object, prefixed with its length as an unsigned 64-bit int
+HEADER = struct.Struct('>Q')
+
+
+def write_message(f, message):
+    data = json.dumps(message).encode('utf-8')
+    f.write(HEADER.pack(len(data)) + data)
+    f.flush()
+
+
+def read_message(f):
+    """ Read a message, or return None if the stream has closed. """
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    size, = HEADER.unpack(header)
+    data = f.read(size)
+    if len(data) < size:
+        return None
+    return json.loads(data.decode('utf-8'))
+
+
+class DiffWorkerError(Exception):
+    pass
+
+
+class DiffWorker:
+    """ A long-lived `python -m indigo_lib.diff_akn --worker` process, which diffs pairs of HTML strings sent to it
+    over its stdin, and writes the diffs to its stdout.
+    """
+    def __init__(self, max_memory=None):
+        args = ['python', '-m', 'indigo_lib.diff_akn', '--worker']
+        if max_memory:
+            args.extend(['--max-memory', str(max_memory)])
+        self.proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.jobs = 0
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def diff(self, old_html, new_html, timeout=None):
+        """ Diff two HTML strings, killing the worker if it takes longer than `timeout` seconds.
+        """
+        self.jobs += 1
+        # killing the process closes its stdout, which ends the read below
+        timer = threading.Timer(timeout, self.proc.kill) if timeout else None
+        if timer:
+            timer.start()
+        try:
+            write_message(self.proc.stdin, {'old': old_html, 'new': new_html})
+            result = read_message(self.proc.stdout)
+        except OSError as e:
+            result = None
+            log.warning(f"Error communicating with diff worker: {e}")
+        finally:
+            if timer:
+                timer.cancel()
+
+        if result is None:
+            self.close()
+            raise DiffWorkerError(f"Diff worker died or timed out after {timeout} seconds")
+        if 'error' in result:
+            raise DiffWorkerError(result['error'])
+        return result['diff']
+
+    def close(self):
+        if self.alive:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+                self.proc.wait()
+
+
+class DiffWorkerPool:
+    """ A pool of up to `size` diff worker processes, which avoids the cost of starting a new Python process (and
+    importing lxml and xmldiff) for each diff, while still keeping diffs out of the calling process.
+
+    Each diff may take up to `timeout` seconds, after which its worker is killed. Each worker is limited to
+    `max_memory` bytes of address space, and is replaced after `max_jobs` diffs to limit memory growth.
+    """
+    def __init__(self, size=2, timeout=60, max_memory=None, max_jobs=100):
+        self.size = size
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.max_jobs = max_jobs
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def diff(self, old_html, new_html):
+        """ Diff two HTML strings in a worker process, returning a string with the HTML diff.
+        """
+        with self.slots:
+            worker = self.get_worker()
+            try:
+                return worker.diff(old_html, new_html, self.timeout)
+            finally:
+                self.release_worker(worker)
+
+    def get_worker(self):
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                return DiffWorker(self.max_memory)
+            if worker.alive:
+                return worker
+
+    def release_worker(self, worker):
+        if worker.alive and worker.jobs < self.max_jobs:
+            self.idle.put(worker)
+        else:
+            worker.close()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_diff_pool():
+    """ The diff worker pool for this process, configured from settings.INDIGO['DIFF_POOL'].
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from django.conf import settings
+                config = settings.INDIGO.get('DIFF_POOL', {})
+                _pool = DiffWorkerPool(
+                    size=config.get('SIZE', 2),
+                    timeout=config.get('TIMEOUT', 60),
+                    max_memory=config.get('MAX_MEMORY'),
+                    max_jobs=config.get('MAX_JOBS', 100),
+                )
+    return _pool
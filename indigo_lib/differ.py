@@ -1,7 +1,6 @@
 import asyncio
 import os
 import re
-import tempfile
 import logging
 
 import lxml.html
@@ -10,7 +9,8 @@ from xmldiff import formatting
 from xmldiff.diff import Differ
 from cobalt.schemas import AkomaNtoso30
 from docpipe.xmlutils import unwrap_element
-from indigo.xmlutils import parse_html_str
+from indigo.xmlutils import parse_html_str, compiled_xslt
+from indigo_lib.diff_pool import get_diff_pool, DiffWorkerError
 
 log = logging.getLogger(__name__)
 
@@ -37,9 +37,7 @@ class HTMLFormatter(formatting.XMLFormatter):
         )
 
     def render(self, result):
-        with open(self.xslt_filename) as f:
-            xslt = lxml.etree.fromstring(f.read())
-            transform = lxml.etree.XSLT(xslt)
+        transform = compiled_xslt(self.xslt_filename)
         result = transform(result)
 
         # XSLT doesn't let us add an element to an attribute, so here we move "classx" over onto "class"
@@ -126,7 +124,7 @@ class AKNHTMLDiffer:
     async def adiff_html_str(self, old_html, new_html):
         """ Diffs two HTML strings for a single element and returns a string HTML diff.
 
-        This runs asynchronously to avoid blocking.
+        This runs asynchronously in a pooled worker process to avoid blocking.
 
         :return: None if there are no differences, otherwise a string with an HTML diff.
         """
@@ -141,23 +139,12 @@ class AKNHTMLDiffer:
             # it was deleted
             return '<div class="del">' + old_html + '</div>'
 
-        with tempfile.NamedTemporaryFile() as f1, tempfile.NamedTemporaryFile() as f2:
-            f1.write(old_html.encode('utf-8'))
-            f1.flush()
-            f2.write(new_html.encode('utf-8'))
-            f2.flush()
-
-            # do the actual diff in a subprocess
-            log.debug("Running diff_akn on %s and %s", f1.name, f2.name)
-            proc = await asyncio.create_subprocess_exec(
-                "python", "-m", "indigo_lib.diff_akn", f1.name, f2.name,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-
-            stdout, stderr = await proc.communicate()
-            log.debug("diff_akn finished with return code %d", proc.returncode)
-            return stdout.decode('utf-8')
+        # do the actual diff in a worker process, without blocking
+        try:
+            return await asyncio.to_thread(get_diff_pool().diff, old_html, new_html)
+        except DiffWorkerError as e:
+            log.error(f"Error diffing HTML: {e}", exc_info=e)
+            return ''
 
     def diff_html(self, old_tree, new_tree):
         """ Compares two html trees, and returns a tree with annotated differences.
@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from indigo_lib.diff_pool import DiffWorkerPool, DiffWorkerError
+
+
+class DiffWorkerPoolTestCase(TestCase):
+    def setUp(self):
+        self.pool = DiffWorkerPool(size=1, timeout=30, max_jobs=2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_diff(self):
+        self.assertEqual(
+            '<p><span class="diff-pair"><del>a</del><ins>b</ins></span></p>',
+            self.pool.diff('<p>a</p>', '<p>b</p>'),
+        )
+
+    def test_reuses_and_recycles_workers(self):
+        self.pool.diff('<p>a</p>', '<p>b</p>')
+        worker = self.pool.idle.queue[0]
+        self.pool.diff('<p>a</p>', '<p>c</p>')
+        # the worker was used twice, so it is replaced
+        self.assertFalse(worker.alive)
+        self.assertEqual(0, self.pool.idle.qsize())
+
+        self.pool.diff('<p>a</p>', '<p>d</p>')
+        self.assertEqual(1, self.pool.idle.qsize())
+
+    def test_timeout(self):
+        self.pool.diff('<p>a</p>', '<p>b</p>')
+        self.pool.timeout = 0.001
+        html = '<div>' + ''.join(f'<p>paragraph {i} text</p>' for i in range(2000)) + '</div>'
+        with self.assertRaises(DiffWorkerError):
+            self.pool.diff(html, html.replace('text', 'words'))
+
+        # a new worker is used for the next diff
+        self.pool.timeout = 30
+        self.assertIn('<del>a</del>', self.pool.diff('<p>a</p>', '<p>b</p>'))
@@ -12,6 +12,12 @@ class BaseAuthority:
     def get_references(self, frbr_uri):
         raise NotImplementedError()
 
+    def get_references_many(self, frbr_uris):
+        """ Get the references for each of a list of FrbrUri objects. Returns a list of references for each
+        FRBR URI. Authorities should override this to do it more efficiently.
+        """
+        return [self.get_references(frbr_uri) for frbr_uri in frbr_uris]
+
 
 class Authorities:
     registry = {}
@@ -70,6 +76,10 @@ class InternalAuthority(BaseAuthority):
             return []
         return [self.make_reference(document)]
 
+    def get_references_many(self, frbr_uris):
+        documents = self.queryset.prefetch_related(None).select_related('language__language').for_frbr_uris(frbr_uris)
+        return [[self.make_reference(d)] if d else [] for d in documents]
+
     def make_reference(self, document):
         return AuthorityReference(
             url=reverse('work', kwargs={'frbr_uri': document.frbr_uri}),
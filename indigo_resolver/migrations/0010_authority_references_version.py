@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indigo_resolver', '0009_models_i18n'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authority',
+            name='references_version',
+            field=models.IntegerField(default=0, editable=False, help_text="Incremented whenever this authority's references change", verbose_name='references version'),
+        ),
+    ]
@@ -1,7 +1,11 @@
+import copy
 import re
+import threading
 
 from django.db import models
+from django.db.models import F, signals
 from django.core.validators import RegexValidator
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 
@@ -14,6 +18,38 @@ validate_slug = RegexValidator(
 )
 
 
+class ReferenceTables:
+    """ Process-local cache of each authority's references, as a dict from FRBR URI to a list of references.
+
+    Tables are keyed on the authority's references_version, which changes whenever its references change, so
+    a stale table is never used.
+    """
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, authority):
+        with self._lock:
+            entry = self._tables.get(authority.pk)
+        if entry and entry[0] == authority.references_version:
+            return entry[1]
+
+        table = {}
+        for ref in authority.references.all():
+            table.setdefault(ref.frbr_uri, []).append(ref)
+
+        with self._lock:
+            self._tables[authority.pk] = (authority.references_version, table)
+        return table
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+reference_tables = ReferenceTables()
+
+
 class Authority(models.Model):
     """ Authority that knows how to resolve
     FRBR URIs into real-world URLs.
@@ -23,22 +59,45 @@ class Authority(models.Model):
     not_found_url = models.URLField(_("not found URL"), help_text=_("URL of a 404 page (optional)"), null=True, blank=True)
     slug = models.CharField(_("slug"), null=False, blank=False, validators=[validate_slug], max_length=50, unique=True)
     priority = models.IntegerField(_("priority"), null=False, default=10, help_text=_("When multiple resolvers match, highest priority wins"))
+    references_version = models.IntegerField(_("references version"), default=0, editable=False,
+                                             help_text=_("Incremented whenever this authority's references change"))
 
     class Meta:
         verbose_name = _("authority")
         verbose_name_plural = _("authorities")
 
     def get_references(self, frbr_uri):
+        return self.get_references_many([frbr_uri])[0]
+
+    def get_references_many(self, frbr_uris):
+        """ Get the references for each of a list of FrbrUri objects, using the cached table of this authority's
+        references. Returns a list of references for each FRBR URI.
+        """
         # TODO: handle expression URIs and dates?
-        refs = self.references\
-            .filter(frbr_uri__in=[frbr_uri.work_uri(), frbr_uri.expression_uri()])\
-            .prefetch_related('authority')\
-            .all()
-        # default priorities
-        for r in refs:
-            if r.priority is None:
-                r.priority = self.priority
-        return refs
+        table = reference_tables.get(self)
+        results = []
+        for frbr_uri in frbr_uris:
+            refs = []
+            for uri in dict.fromkeys([frbr_uri.work_uri(), frbr_uri.expression_uri()]):
+                for ref in table.get(uri, []):
+                    # don't change the cached reference
+                    ref = copy.copy(ref)
+                    ref.authority = self
+                    # default priorities
+                    if ref.priority is None:
+                        ref.priority = self.priority
+                    refs.append(ref)
+            results.append(refs)
+        return results
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and 'update_fields' not in kwargs:
+            # references_version is only changed when references change; don't overwrite it with a stale value
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'references_version'
+            ]
+        super().save(*args, **kwargs)
 
     @property
     def reference_count(self):
@@ -77,3 +136,9 @@ class AuthorityReference(models.Model):
 
     def __str__(self):
         return '%s – "%s"' % (self.frbr_uri, self.title)
+
+
+@receiver(signals.post_save, sender=AuthorityReference)
+@receiver(signals.post_delete, sender=AuthorityReference)
+def authority_reference_changed(sender, instance, **kwargs):
+    Authority.objects.filter(pk=instance.authority_id).update(references_version=F('references_version') + 1)
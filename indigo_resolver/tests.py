@@ -1,3 +1,54 @@
+import json
+
 from django.test import TestCase
 
-# Create your tests here.
+from indigo_resolver.models import Authority, AuthorityReference
+
+
+class BatchResolveTest(TestCase):
+    fixtures = ['languages_data', 'countries', 'user', 'editor', 'taxonomy_topics', 'work', 'published']
+
+    def setUp(self):
+        self.authority = Authority.objects.create(name='Example', url='https://example.com', slug='example',
+                                                  priority=5)
+        AuthorityReference.objects.create(authority=self.authority, frbr_uri='/akn/za/act/1999/1',
+                                          title='Example Act', url='https://example.com/act/1999/1')
+
+    def test_batch_resolve(self):
+        response = self.client.post('/resolver/batch-resolve', json.dumps({
+            'frbr_uris': ['/akn/za/act/2014/10', '/akn/za/act/1999/1', '/akn/za/act/1990/99', 'garbage'],
+        }), content_type='application/json')
+        self.assertEqual(200, response.status_code)
+        results = response.json()['results']
+
+        self.assertEqual(['/akn/za/act/2014/10', '/akn/za/act/1999/1', '/akn/za/act/1990/99', 'garbage'],
+                         [r['frbr_uri'] for r in results])
+        self.assertEqual('/works/akn/za/act/2014/10/', results[0]['references'][0]['url'])
+        self.assertEqual(['https://example.com/act/1999/1'], [r['url'] for r in results[1]['references']])
+        self.assertEqual([], results[2]['references'])
+        self.assertIn('error', results[3])
+
+    def test_batch_resolve_get(self):
+        response = self.client.get('/resolver/example/batch-resolve?frbr_uri=/akn/za/act/1999/1&frbr_uri=/akn/za/act/2014/10')
+        self.assertEqual(200, response.status_code)
+        results = response.json()['results']
+        self.assertEqual(1, len(results[0]['references']))
+        self.assertEqual(0, len(results[1]['references']))
+
+    def test_batch_resolve_too_many(self):
+        response = self.client.post('/resolver/batch-resolve', json.dumps({
+            'frbr_uris': ['/akn/za/act/2014/10'] * 1001,
+        }), content_type='application/json')
+        self.assertEqual(400, response.status_code)
+
+    def test_reference_table_invalidated(self):
+        from cobalt.uri import FrbrUri
+        frbr_uri = FrbrUri.parse('/akn/za/act/1999/2')
+
+        self.assertEqual([], Authority.objects.get(pk=self.authority.pk).get_references(frbr_uri))
+        AuthorityReference.objects.create(authority=self.authority, frbr_uri='/akn/za/act/1999/2',
+                                          title='Another Act', url='https://example.com/act/1999/2')
+
+        refs = Authority.objects.get(pk=self.authority.pk).get_references(frbr_uri)
+        self.assertEqual(['https://example.com/act/1999/2'], [r.url for r in refs])
+        self.assertEqual(5, refs[0].priority)
@@ -4,5 +4,6 @@ import indigo_resolver.views
 
 
 urlpatterns = [
+    re_path(r'^((?P<authorities>[\w,.-]+)/)?batch-resolve$', indigo_resolver.views.BatchResolveView.as_view(), name='resolver_batch'),
     re_path(r'^((?P<authorities>[\w,.-]+)/)?resolve(?P<frbr_uri>/.*)$', indigo_resolver.views.ResolveView.as_view(), name='resolver'),
 ]
@@ -1,8 +1,11 @@
+import json
 from itertools import chain
 
-from django.http import HttpResponseBadRequest, Http404
+from django.http import HttpResponseBadRequest, Http404, JsonResponse
 from django.conf import settings
-from django.views.generic import TemplateView
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.generic import TemplateView, View
 from django.shortcuts import redirect
 from django.utils.translation import gettext as _
 
@@ -12,6 +15,46 @@ from indigo_api.models import Country
 from .authorities import authorities as registry
 
 
+def set_default_language(frbr_uri, languages=None):
+    """ Use the primary language of the FRBR URI's country if it doesn't have a language. The optional
+    `languages` dict caches languages for each country.
+    """
+    if not frbr_uri.language:
+        if languages is None or frbr_uri.country not in languages:
+            try:
+                language = Country.for_code(frbr_uri.country).primary_language.code
+            except Country.DoesNotExist:
+                language = 'eng'
+            if languages is None:
+                frbr_uri.language = language
+                return
+            languages[frbr_uri.country] = language
+        frbr_uri.language = languages[frbr_uri.country]
+
+
+def get_authorities(authorities):
+    """ The authorities named in a comma-separated string, or all authorities.
+    """
+    if authorities:
+        authorities = (registry.get(a) for a in authorities.split(','))
+        authorities = [a for a in authorities if a]
+        if not authorities:
+            raise Http404()
+        return authorities
+
+    return registry.all()
+
+
+def best_references(refs):
+    """ Sort references by priority, highest first. If there are multiple references with different priorities,
+    only the one with the highest priority is used.
+    """
+    refs = sorted(refs, key=lambda r: -r.priority)
+    if len(set(r.priority for r in refs)) > 1:
+        refs = refs[:1]
+    return refs
+
+
 class ResolveView(TemplateView):
     template_name = 'resolve.html'
 
@@ -22,12 +65,7 @@ class ResolveView(TemplateView):
         except ValueError:
             return HttpResponseBadRequest(_("Invalid FRBR URI"))
 
-        if not self.frbr_uri.language:
-            try:
-                country = Country.for_code(self.frbr_uri.country)
-                self.frbr_uri.language = country.primary_language.code
-            except Country.DoesNotExist:
-                self.frbr_uri.language = 'eng'
+        set_default_language(self.frbr_uri)
 
         self.authorities = self.get_authorities(authorities)
         self.references = self.get_references()
@@ -49,25 +87,10 @@ class ResolveView(TemplateView):
         return super(ResolveView, self).get(self, frbr_uri=frbr_uri, authorities=authorities, *args, **kwargs)
 
     def get_authorities(self, authorities):
-        if authorities:
-            authorities = (registry.get(a) for a in authorities.split(','))
-            authorities = [a for a in authorities if a]
-            if not authorities:
-                raise Http404()
-            return authorities
-
-        return registry.all()
+        return get_authorities(authorities)
 
     def get_references(self):
-        refs = list(chain(*(a.get_references(self.frbr_uri) for a in self.authorities)))
-        # sort by priority, highest first
-        refs.sort(key=lambda r: -r.priority)
-
-        # if we have multiple matches with different priorities, use the one with the highest priority
-        if len(set(r.priority for r in refs)) > 1:
-            refs = refs[:1]
-
-        return refs
+        return best_references(chain(*(a.get_references(self.frbr_uri) for a in self.authorities)))
 
     def get_context_data(self, **kwargs):
         kwargs['query'] = {
@@ -80,3 +103,62 @@ class ResolveView(TemplateView):
         kwargs['settings'] = settings
 
         return kwargs
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchResolveView(View):
+    """ Resolves many FRBR URIs at once, with a single lookup for each authority.
+
+    FRBR URIs are given as a JSON object in the body of a POST, such as ``{"frbr_uris": ["/akn/za/act/2009/1"]}``,
+    or as repeated ``frbr_uri`` parameters of a GET. The response has the references for each FRBR URI, in the
+    same order.
+    """
+    max_frbr_uris = 1000
+
+    def get(self, request, authorities=None, *args, **kwargs):
+        return self.resolve(request.GET.getlist('frbr_uri'), authorities)
+
+    def post(self, request, authorities=None, *args, **kwargs):
+        try:
+            frbr_uris = json.loads(request.body)['frbr_uris']
+        except (ValueError, KeyError, TypeError):
+            return HttpResponseBadRequest(_("Expected a JSON object with a list of frbr_uris"))
+        return self.resolve(frbr_uris, authorities)
+
+    def resolve(self, frbr_uris, authorities):
+        if not isinstance(frbr_uris, list) or len(frbr_uris) > self.max_frbr_uris:
+            return HttpResponseBadRequest(_("Expected a list of at most %(n)s FRBR URIs") % {'n': self.max_frbr_uris})
+
+        FrbrUri.default_language = None
+        parsed = {}
+        languages = {}
+        for frbr_uri in frbr_uris:
+            try:
+                parsed[frbr_uri] = FrbrUri.parse(frbr_uri)
+                set_default_language(parsed[frbr_uri], languages)
+            except (ValueError, TypeError, AttributeError):
+                pass
+
+        # one lookup per authority, for all the FRBR URIs
+        valid = list(parsed.keys())
+        refs = {frbr_uri: [] for frbr_uri in valid}
+        for authority in get_authorities(authorities):
+            for frbr_uri, authority_refs in zip(valid, authority.get_references_many([parsed[u] for u in valid])):
+                refs[frbr_uri].extend(authority_refs)
+
+        results = []
+        for frbr_uri in frbr_uris:
+            if frbr_uri in refs:
+                results.append({
+                    'frbr_uri': frbr_uri,
+                    'references': [{
+                        'url': r.url,
+                        'title': r.title,
+                        'authority': r.authority_name(),
+                        'priority': r.priority,
+                    } for r in best_references(refs[frbr_uri])],
+                })
+            else:
+                results.append({'frbr_uri': frbr_uri, 'error': _("Invalid FRBR URI")})
+
+        return JsonResponse({'results': results})